@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the Seed City parsers
+"""
+
+import argparse
+import gc
+import json
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import bs4
+
+import scrape_seed_city as scraper
+from http_cache import CACHE_DIR, ResponseCache
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "seed_city"
+RESULTS_PATH = Path("bench-results.json")
+REGRESSION_THRESHOLD = 0.10  # flag anything at least 10% slower than the baseline
+RECORD_COUNT = 10000
+# Text specific to one product; the memory benchmark gives every record its own value for these
+UNIQUE_FIELDS = {"strain_name", "description", "product_url", "image_url", "overview", "experience", "genetic_background"}
+
+
+def load_fixtures(directory: Path = FIXTURES_DIR) -> Tuple[List[str], List[str]]:
+    listings = [path.read_text(encoding="utf-8") for path in sorted(directory.glob("listing_*.html"))]
+    details = [path.read_text(encoding="utf-8") for path in sorted(directory.glob("detail_*.html"))]
+    if not listings or not details:
+        raise SystemExit(f"No listing_*.html / detail_*.html fixtures found in {directory}")
+    return listings, details
+
+
+def refresh_fixtures(count: int, cache_dir: Path = CACHE_DIR, directory: Path = FIXTURES_DIR) -> None:
+    """Replace the fixture corpus with real pages from the response cache."""
+    cache = ResponseCache(cache_dir, offline=True)
+    listings: List[str] = []
+    details: List[str] = []
+    try:
+        for key, body in cache.iter_pages():
+            bucket = listings if key.startswith(scraper.BASE_URL) else details
+            if len(bucket) < count:
+                bucket.append(body)
+    finally:
+        cache.close()
+    if not listings or not details:
+        raise SystemExit(f"The cache in {cache_dir} needs at least one listing and one detail page")
+
+    staging = directory.with_name(directory.name + ".new")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for prefix, pages in (("listing", listings), ("detail", details)):
+        for number, body in enumerate(pages, 1):
+            (staging / f"{prefix}_{number:02d}.html").write_text(body, encoding="utf-8")
+    shutil.rmtree(directory, ignore_errors=True)
+    staging.rename(directory)
+    print(f"Wrote {len(listings)} listing and {len(details)} detail fixtures to {directory}")
+
+
+def time_calls(func: Callable[[Any], Any], inputs: Sequence[Any], min_time: float, repeat: int = 3) -> float:
+    """Best-of-``repeat`` seconds per call, looping over ``inputs`` for at least ``min_time``."""
+    best = float("inf")
+    for _ in range(repeat):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            for value in inputs:
+                func(value)
+            calls += len(inputs)
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def measure_allocations(func: Callable[[Any], Any], inputs: Sequence[Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        baseline = tracemalloc.take_snapshot()
+        for value in inputs:
+            func(value)
+        gc.collect()  # bs4 trees are reference cycles; only count what really survives
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(max(0, stat.size_diff) for stat in after.compare_to(baseline, "filename"))
+    blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(baseline, "filename"))
+    return {
+        "alloc_peak_kb": round((peak - before) / 1024, 1),
+        "retained_kb_per_call": round(allocated / 1024 / len(inputs), 3),
+        "retained_blocks_per_call": round(blocks / len(inputs), 1),
+    }
+
+
+def benchmark(
+    func: Callable[[Any], Any],
+    inputs: Sequence[Any],
+    min_time: float,
+    unit: str = "call",
+) -> Dict[str, float]:
+    seconds = time_calls(func, inputs, min_time)
+    result: Dict[str, float] = {
+        f"usec_per_{unit}": round(seconds * 1e6, 3),
+        f"{unit}s_per_sec": round(1 / seconds, 1),
+    }
+    result.update(measure_allocations(func, inputs))
+    return result
+
+
+def parse_listing(html: str, backend: str) -> List[scraper.StrainRecord]:
+    return [scraper.parse_item(item) for item in scraper.make_soup(html, backend).select(scraper.LISTING_ITEM_SELECTOR)]
+
+
+def fresh_copy(name: str, value: Any, number: int) -> Any:
+    if not isinstance(value, str):
+        return value
+    return f"{value} {number}" if name in UNIQUE_FIELDS else value.encode("utf-8").decode("utf-8")
+
+
+def measure_record_memory(listings: List[str], details: List[str], count: int = RECORD_COUNT) -> Dict[str, float]:
+    """Memory held by ``count`` records with detail fields, as a crawl keeps them before writing.
+
+    The fixtures are parsed once; every record is then built from fresh copies of those
+    strings, so it owns its values the way records parsed from different pages do, and
+    product-specific text (``UNIQUE_FIELDS``) is made distinct per record.
+    """
+    listed = [record.as_dict() for html in listings for record in parse_listing(html, "html.parser")]
+    parsed_details = [scraper.parse_detail_page(html) for html in details]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        records = []
+        for number in range(count):
+            listing = listed[number % len(listed)]
+            record = scraper.StrainRecord(**{name: fresh_copy(name, listing[name], number) for name in scraper.BASE_FIELDS})
+            detail = parsed_details[number % len(parsed_details)]
+            record.extra.update((key, fresh_copy(key, value, number)) for key, value in detail.items())
+            records.append(record)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    retained -= before
+    return {
+        "records": count,
+        "retained_mb": round(retained / 1024 / 1024, 2),
+        "bytes_per_record": round(retained / count),
+    }
+
+
+def collect_inputs(listings: List[str], details: List[str]) -> Dict[str, list]:
+    items = [item for html in listings for item in scraper.make_soup(html, "html.parser").select(scraper.LISTING_ITEM_SELECTOR)]
+    options = [scraper.extract_text(option) for item in items for option in item.select("select option")]
+    prices = [
+        scraper.extract_text(item.select_one(selector))
+        for item in items
+        for selector in (".yagendoo_productPrice", ".yagendoo_productOldPrice")
+        if item.select_one(selector)
+    ]
+    labels = []
+    for html in details:
+        soup = scraper.make_soup(html, "html.parser")
+        labels.extend(header.get_text(strip=True) for header in soup.select("h3"))
+        labels.extend(td.get_text(" ", strip=True).rstrip(":") for td in soup.select("tr td:first-child"))
+    return {"items": items, "options": options, "prices": prices, "labels": [label for label in labels if label]}
+
+
+def check_backends(listings: List[str], details: List[str], backends: List[str]) -> Dict[str, int]:
+    """Fixtures on which each backend differs from the html.parser reference."""
+    pages = [(scraper.BASE_URL, html) for html in listings] + [(f"{scraper.SITE_ROOT}/detail", html) for html in details]
+    return {
+        backend: scraper.compare_parser_backends(pages, backend)
+        for backend in backends
+        if backend != scraper.REFERENCE_PARSER_BACKEND
+    }
+
+
+def run_benchmarks(min_time: float, backends: Optional[List[str]] = None, record_count: int = 0) -> Dict[str, Any]:
+    listings, details = load_fixtures()
+    backends = backends or list(scraper.PARSER_BACKENDS)
+    inputs = collect_inputs(listings, details)
+
+    pages: Dict[str, Dict[str, float]] = {}
+    for backend in backends:
+        if backend != "stream":  # stream reuses html.parser trees for listing pages
+            pages[f"listing[{backend}]"] = benchmark(lambda html: parse_listing(html, backend), listings, min_time, "page")
+        pages[f"detail[{backend}]"] = benchmark(
+            lambda html: scraper.parse_detail_page(html, backend), details, min_time, "page"
+        )
+
+    uncached_normalize_key = scraper.normalize_key.__wrapped__
+    functions = {
+        "parse_item": benchmark(scraper.parse_item, inputs["items"], min_time),
+        "parse_detail_page": benchmark(scraper.parse_detail_page, details, min_time),
+        "clean_pack_option": benchmark(scraper.clean_pack_option, inputs["options"], min_time),
+        "parse_price": benchmark(scraper.parse_price, inputs["prices"], min_time),
+        "normalize_key": benchmark(scraper.normalize_key, inputs["labels"], min_time),
+        "normalize_key[uncached]": benchmark(uncached_normalize_key, inputs["labels"], min_time),
+    }
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "bs4": bs4.__version__,
+            "default_backend": scraper.PARSER_BACKEND,
+            "fixtures": {"listing": len(listings), "detail": len(details)},
+            "min_time_sec": min_time,
+        },
+        "backend_mismatches": check_backends(listings, details, backends),
+        "pages": pages,
+        "functions": functions,
+    }
+    if record_count:
+        results["memory"] = measure_record_memory(listings, details, record_count)
+    return results
+
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    for group in ("pages", "functions"):
+        for name, metrics in current.get(group, {}).items():
+            previous = baseline.get(group, {}).get(name)
+            if not previous:
+                continue
+            for metric, value in metrics.items():
+                if not metric.startswith("usec_per_") or not previous.get(metric):
+                    continue
+                change = value / previous[metric] - 1
+                if change > threshold:
+                    regressions.append(f"{group}.{name}.{metric}: {previous[metric]} -> {value} (+{change:.0%})")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"Fixtures: {results['meta']['fixtures']}, bs4 {results['meta']['bs4']}")
+    for group in ("pages", "functions"):
+        print(f"\n{group.title()}:")
+        for name, metrics in results[group].items():
+            timing = next(f"{value:>10.1f} {key.replace('usec_per_', 'us/')}" for key, value in metrics.items() if key.startswith("usec_per_"))
+            print(f"  {name:<28}{timing}  peak {metrics['alloc_peak_kb']:>8.1f} KB  {metrics['retained_blocks_per_call']:>7.1f} blocks/call")
+    if "memory" in results:
+        memory = results["memory"]
+        print(f"\nRecords: {memory['records']:,} hold {memory['retained_mb']:.2f} MB ({memory['bytes_per_record']:,} bytes/record)")
+    for backend, mismatches in results["backend_mismatches"].items():
+        if mismatches:
+            print(f"\n⚠️  {backend} differs from {scraper.REFERENCE_PARSER_BACKEND} on {mismatches} fixture page(s)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Seed City parsers against the offline fixture corpus.")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH, help="write results JSON here (default: %(default)s)")
+    parser.add_argument("--compare", type=Path, help="baseline results JSON to check for regressions")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="relative slowdown that counts as a regression (default: %(default)s)",
+    )
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to run each measurement (default: %(default)s)")
+    parser.add_argument(
+        "--record-memory",
+        type=int,
+        nargs="?",
+        const=RECORD_COUNT,
+        default=0,
+        metavar="N",
+        help=f"also measure the memory held by N parsed records (default N: {RECORD_COUNT})",
+    )
+    parser.add_argument("--backend", action="append", choices=sorted(scraper.PARSER_BACKENDS), help="limit page benchmarks to these backends")
+    parser.add_argument(
+        "--refresh-fixtures",
+        type=int,
+        metavar="N",
+        help="replace the fixtures with up to N listing and N detail pages from the response cache, then exit",
+    )
+    args = parser.parse_args()
+
+    if args.refresh_fixtures:
+        refresh_fixtures(args.refresh_fixtures)
+        return 0
+
+    results = run_benchmarks(args.min_time, args.backend, args.record_memory)
+    print_report(results)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\n✅ Results saved to {args.output}")
+
+    if args.compare:
+        regressions = find_regressions(results, json.loads(args.compare.read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Append-only crawl journal so long Seed City crawls survive crashes and Ctrl-C
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+JOURNAL_PATH = Path("cannabis-strains.journal.jsonl")
+
+
+class CrawlJournal:
+    """JSON-lines log of parsed records and completed listing offsets.
+
+    Records (and ``update``s for products already in the CSV: listing prices in
+    price-refresh crawls, prices and detail fields of products the sitemap reports as
+    changed) for a listing page are appended first and the page's ``offset`` line is
+    written last, then the file is flushed and fsynced. On load, records that are not
+    followed by their page marker (the in-flight page of a crashed run) are cut off,
+    so a resumed crawl redoes exactly that page. A ``complete`` line marks a crawl
+    whose records only still need to be written out.
+    """
+
+    def __init__(self, path: Path = JOURNAL_PATH) -> None:
+        self.path = path
+        self.next_offset = 0
+        self.record_count = 0
+        self.urls: Set[str] = set()
+        self.updates: Dict[str, Dict[str, Any]] = {}
+        self.complete = False
+        self._handle = None
+        self._load()
+
+    @property
+    def resumed(self) -> bool:
+        return self.next_offset > 0 or self.record_count > 0 or self.complete
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        committed_size = 0
+        pending_urls: List[str] = []
+        pending_updates: Dict[str, Dict[str, Any]] = {}
+        with self.path.open("rb") as handle:
+            position = 0
+            for raw in handle:
+                position += len(raw)
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    logging.warning("Ignoring torn journal line at byte %s of %s", position - len(raw), self.path)
+                    break
+                kind = entry.get("kind")
+                if kind == "record":
+                    pending_urls.append(entry["record"].get("product_url", ""))
+                elif kind == "update":
+                    pending_updates[entry["url"]] = entry["fields"]
+                elif kind == "page":
+                    self.next_offset = entry["next_offset"]
+                elif kind == "complete":
+                    self.complete = True
+                if kind in ("page", "complete"):
+                    self.urls.update(pending_urls)
+                    self.record_count += len(pending_urls)
+                    self.updates.update(pending_updates)
+                    pending_urls = []
+                    pending_updates = {}
+                    committed_size = position
+
+        if committed_size < self.path.stat().st_size:
+            dropped = len(pending_urls) + len(pending_updates)
+            with self.path.open("r+b") as handle:
+                handle.truncate(committed_size)
+            logging.info("Discarded %s uncommitted journal records; their page will be fetched again.", dropped)
+        if self.resumed:
+            logging.info(
+                "Resuming crawl from %s: %s records and %s price updates journaled, next offset %s%s",
+                self.path,
+                self.record_count,
+                len(self.updates),
+                self.next_offset,
+                " (crawl already complete)" if self.complete else "",
+            )
+
+    def _append(self, entries: List[Dict[str, Any]]) -> None:
+        if self._handle is None:
+            self._handle = self.path.open("a", encoding="utf-8")
+        for entry in entries:
+            self._handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def commit_page(
+        self,
+        offset: int,
+        next_offset: int,
+        records: List[Dict[str, Any]],
+        updates: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        entries: List[Dict[str, Any]] = [{"kind": "record", "offset": offset, "record": record} for record in records]
+        entries.extend({"kind": "update", "url": url, "fields": fields} for url, fields in (updates or {}).items())
+        entries.append({"kind": "page", "offset": offset, "next_offset": next_offset})
+        self._append(entries)
+        self.next_offset = next_offset
+        self.record_count += len(records)
+        self.urls.update(record.get("product_url", "") for record in records)
+        self.updates.update(updates or {})
+
+    def mark_complete(
+        self,
+        records: Optional[List[Dict[str, Any]]] = None,
+        updates: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        entries: List[Dict[str, Any]] = [{"kind": "record", "record": record} for record in records or []]
+        entries.extend({"kind": "update", "url": url, "fields": fields} for url, fields in (updates or {}).items())
+        entries.append({"kind": "complete"})
+        self._append(entries)
+        self.record_count += len(records or [])
+        self.urls.update(record.get("product_url", "") for record in records or [])
+        self.updates.update(updates or {})
+        self.complete = True
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Stream committed records back in crawl order."""
+        self.close()
+        if not self.path.exists():
+            return
+        pending: List[Dict[str, Any]] = []
+        with self.path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                entry = json.loads(line)
+                kind = entry.get("kind")
+                if kind == "record":
+                    pending.append(entry["record"])
+                elif kind in ("page", "complete"):
+                    yield from pending
+                    pending = []
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def remove(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
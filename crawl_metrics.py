@@ -0,0 +1,270 @@
+"""
+In-process counters and latency histograms for the crawl, exported as JSON and Prometheus text
+"""
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_JSON_PATH = Path("crawl-metrics.json")
+METRICS_PROM_PATH = Path("crawl-metrics.prom")
+EXPORT_INTERVAL_SEC = 15.0
+# Seconds; wide enough for both sub-millisecond parses and slow, retried requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter, one value per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style), one series per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), count, sum]
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels: Any) -> Callable[[Callable], Callable]:
+        """Decorator observing the wall time of every call."""
+
+        def decorate(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, **labels)
+
+            return wrapper
+
+        return decorate
+
+    def samples(self) -> List[Tuple[LabelValues, List[int], int, float]]:
+        with self._lock:
+            return [(key, list(series[0]), series[1], series[2]) for key, series in sorted(self._series.items())]
+
+    def quantile(self, q: float, counts: List[int]) -> Optional[float]:
+        """Estimate a quantile from bucket counts, interpolating inside the bucket it falls in."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower  # beyond the last bound; report the bound
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.started = time.time()
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, description, labelnames)
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, description, labelnames, buckets)
+
+    def metrics(self) -> List[Any]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        payload: Dict[str, Any] = {"started": self.started, "timestamp": now, "elapsed_sec": round(now - self.started, 3), "metrics": {}}
+        for metric in self.metrics():
+            series = []
+            if isinstance(metric, Histogram):
+                for key, counts, count, total in metric.samples():
+                    series.append(
+                        {
+                            "labels": dict(zip(metric.labelnames, key)),
+                            "count": count,
+                            "sum": round(total, 6),
+                            "buckets": dict(zip([*map(str, metric.buckets), "+Inf"], counts)),
+                            "p50": metric.quantile(0.5, counts),
+                            "p95": metric.quantile(0.95, counts),
+                        }
+                    )
+            else:
+                series = [{"labels": dict(zip(metric.labelnames, key)), "value": value} for key, value in metric.samples()]
+            payload["metrics"][metric.name] = {"type": metric.kind, "description": metric.description, "series": series}
+        return payload
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for key, counts, count, total in metric.samples():
+                    cumulative = 0
+                    for bound, bucket_count in zip([*map(_format_number, metric.buckets), "+Inf"], counts):
+                        cumulative += bucket_count
+                        labels = _format_labels([*metric.labelnames, "le"], [*key, bound])
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{metric.name}_sum{labels} {_format_number(total)}")
+                    lines.append(f"{metric.name}_count{labels} {count}")
+            else:
+                for key, value in metric.samples():
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> List[str]:
+        """Human-readable totals: count, mean and p50/p95 per histogram series, value per counter series."""
+        lines = []
+        for metric in self.metrics():
+            if isinstance(metric, Histogram):
+                for key, counts, count, total in metric.samples():
+                    p50, p95 = metric.quantile(0.5, counts), metric.quantile(0.95, counts)
+                    lines.append(
+                        f"{metric.name}{_format_labels(metric.labelnames, key)}: {count} x, {total:.2f}s total, "
+                        f"mean {total / count * 1000:.1f} ms, p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+                    )
+            else:
+                for key, value in metric.samples():
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)}: {_format_number(round(value, 3))}")
+        return lines
+
+    def write(self, json_path: Optional[Path] = None, prom_path: Optional[Path] = None) -> None:
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.snapshot(), indent=2))
+        if prom_path:
+            _write_atomic(prom_path, self.prometheus_text())
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """Background thread rewriting the JSON and Prometheus files every ``interval`` seconds."""
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        json_path: Optional[Path] = METRICS_JSON_PATH,
+        prom_path: Optional[Path] = METRICS_PROM_PATH,
+        interval: float = EXPORT_INTERVAL_SEC,
+    ) -> None:
+        self.registry = registry
+        self.json_path = json_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def start(self) -> "MetricsExporter":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.registry.write(self.json_path, self.prom_path)
+
+    def stop(self) -> None:
+        """Stop the thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.registry.write(self.json_path, self.prom_path)
+
+
+METRICS = MetricsRegistry()
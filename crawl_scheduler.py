@@ -0,0 +1,140 @@
+"""
+Fair scheduling of crawl requests across hosts: per-host concurrency caps over one shared pool of threads
+"""
+
+import concurrent.futures
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+SCHEDULER_WORKERS = 16
+
+# (future, function, args, kwargs)
+Task = Tuple[Future, Callable[..., Any], Tuple[Any, ...], Dict[str, Any]]
+
+
+class CrawlScheduler:
+    """Worker threads serving one task queue per host in round-robin order.
+
+    Each host has a cap on its tasks running at once. A free worker takes the next task
+    from the first host after the one it last served that has queued work and room under
+    its cap, so a host with a long backlog cannot crowd out the others, and a slow or
+    throttled host never holds more than its own cap of workers.
+    """
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS) -> None:
+        self.completed: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[Task]] = {}
+        self._caps: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._order: List[str] = []
+        self._next = 0
+        self._closed = False
+        self._changed = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, name=f"crawl-{number}", daemon=True) for number in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def executor(self, host: str, concurrency: int) -> "HostExecutor":
+        """An executor queueing onto ``host``, which runs at most ``concurrency`` of its tasks at a time."""
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        with self._changed:
+            if host not in self._queues:
+                self._queues[host] = deque()
+                self._running[host] = 0
+                self.completed[host] = 0
+                self._order.append(host)
+            self._caps[host] = concurrency
+            self._changed.notify_all()
+        return HostExecutor(self, host)
+
+    def _submit(self, host: str, task: Task) -> None:
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            self._queues[host].append(task)
+            self._changed.notify()
+
+    def _take(self) -> Optional[Tuple[str, Task]]:
+        # Called with the lock held
+        for step in range(len(self._order)):
+            index = (self._next + step) % len(self._order)
+            host = self._order[index]
+            if self._queues[host] and self._running[host] < self._caps[host]:
+                self._next = index + 1
+                self._running[host] += 1
+                return host, self._queues[host].popleft()
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._changed:
+                picked = self._take()
+                while picked is None:
+                    if self._closed and not any(self._queues.values()):
+                        return
+                    self._changed.wait()
+                    picked = self._take()
+            host, (future, func, args, kwargs) = picked
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = func(*args, **kwargs)
+                    except BaseException as exc:  # noqa: BLE001 - handed to whoever waits on the future
+                        future.set_exception(exc)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._changed:
+                    self._running[host] -= 1
+                    self.completed[host] += 1
+                    # A slot under this host's cap opened up, which may be what a waiting worker needs
+                    self._changed.notify_all()
+
+    def shutdown(self) -> None:
+        """Run what is still queued, then stop the workers."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class HostExecutor(Executor):
+    """``Executor`` view of one host's queue in a ``CrawlScheduler``, usable wherever a ThreadPoolExecutor is.
+
+    ``shutdown`` affects only the tasks submitted through this view.
+    """
+
+    def __init__(self, scheduler: CrawlScheduler, host: str) -> None:
+        self.scheduler = scheduler
+        self.host = host
+        self._pending: Set[Future] = set()
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        self.scheduler._submit(self.host, (future, fn, args, kwargs))
+        return future
+
+    def _discard(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            futures = list(self._pending)
+        if cancel_futures:
+            for future in futures:
+                future.cancel()
+        if wait:
+            concurrent.futures.wait(futures)
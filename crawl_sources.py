@@ -0,0 +1,81 @@
+"""
+Source adapters: what the crawler needs to know about each site it pages through
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class CrawlSource(ABC):
+    """One paginated catalogue: where its listing pages are and how to read them.
+
+    ``iter_records`` drives any source the same way: it fetches listing pages by offset,
+    parses them into records, and fetches the detail page of each new one. Adapters
+    implement ``listing_request`` and ``parse_listing_page`` and may override the other
+    two. ``concurrency`` and ``requests_per_sec`` cap what the scheduler sends to the
+    source's host (None takes the crawl-wide settings).
+
+    Adapters are handed to parser processes with their bound methods, so they must pickle.
+    """
+
+    name = ""
+    page_size = 30
+
+    def __init__(
+        self,
+        site_root: str,
+        concurrency: Optional[int] = None,
+        requests_per_sec: Optional[float] = None,
+    ) -> None:
+        self.site_root = site_root
+        self.concurrency = concurrency
+        self.requests_per_sec = requests_per_sec
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.site_root).netloc
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.site_root!r})"
+
+    @abstractmethod
+    def listing_request(self, offset: int) -> Tuple[str, Dict[str, int]]:
+        """URL and query parameters of the listing page starting at ``offset``."""
+
+    def find_last_offset(self, html: str) -> Optional[int]:
+        """Offset of the last listing page as read off a listing page, or None when it does not say."""
+        return None
+
+    @abstractmethod
+    def parse_listing_page(self, html: str) -> List[Any]:
+        """The records on a listing page, in order."""
+
+    def parse_detail_page(self, html: str) -> Dict[str, str]:
+        """Extra fields from a product's own page."""
+        return {}
+
+
+SOURCES: Dict[str, type] = {}
+
+
+def register_source(cls: type) -> type:
+    """Class decorator making an adapter selectable by its ``name``."""
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} has no name")
+    SOURCES[cls.name] = cls
+    return cls
+
+
+def make_source(name: str, **kwargs: Any) -> CrawlSource:
+    try:
+        cls = SOURCES[name]
+    except KeyError:
+        raise ValueError(f"unknown source {name!r}; expected one of {', '.join(sorted(SOURCES))}") from None
+    return cls(**kwargs)
+
+
+def source_journal_path(path: Path, name: str) -> Path:
+    """Journal of source ``name`` in a multi-source crawl, next to the crawl's own journal."""
+    return path.with_name(f"{path.stem}.{name}{path.suffix}")
@@ -0,0 +1,73 @@
+"""
+Sharded layout of the dataset: shard CSVs plus a manifest of their hashes and row counts
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CSV_PATH = Path("cannabis-strains.csv")
+PARQUET_PATH = Path("cannabis-strains.parquet")
+SHARD_DIR = Path("cannabis-strains")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_ROWS = 1000
+
+
+def read_manifest(directory: Path = SHARD_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(directory: Path, manifest: Dict[str, Any]) -> None:
+    path = directory / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, **manifest}, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def dataset_files(path: Path) -> List[Path]:
+    """The CSV files making up the dataset at ``path``: a single CSV or a shard directory, in order."""
+    if path.is_dir():
+        manifest = read_manifest(path)
+        return [path / shard["path"] for shard in manifest["shards"]] if manifest else []
+    return [path] if path.exists() else []
+
+
+def current_dataset(csv_path: Path = CSV_PATH, shard_dir: Path = SHARD_DIR) -> Path:
+    """Whichever layout was written last: the single CSV or the shard directory."""
+    manifest = shard_dir / MANIFEST_NAME
+    if not manifest.exists():
+        return csv_path
+    if not csv_path.exists() or manifest.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns:
+        return shard_dir
+    return csv_path
+
+
+def current_parquet(dataset: Path, parquet_path: Path = PARQUET_PATH) -> Optional[Path]:
+    """The Parquet copy of ``dataset``, or None when it is missing or older than any of the dataset's files."""
+    if not parquet_path.exists():
+        return None
+    written = parquet_path.stat().st_mtime_ns
+    if any(file.stat().st_mtime_ns > written for file in dataset_files(dataset)):
+        return None
+    return parquet_path
+
+
+def dataset_fingerprint(path: Path) -> List[List[Any]]:
+    """Name, size and mtime of each file of the dataset, to notice it changing behind our back."""
+    fingerprint = []
+    for file in dataset_files(path):
+        info = file.stat()
+        fingerprint.append([file.name, info.st_size, info.st_mtime_ns])
+    return fingerprint
+
+
+def dataset_bytes(path: Path) -> int:
+    return sum(file.stat().st_size for file in dataset_files(path))
@@ -0,0 +1,419 @@
+"""
+Single-pass, bounded-memory statistics for the Cannabis Strains dataset
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import math
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from dataset_shards import read_manifest
+from profiling import stage
+
+STATS_PATH = Path("cannabis-strains.stats.json")  # statistics cache, keyed by the CSV's content hashes
+STATS_CACHE_VERSION = 1
+DIGEST_CHUNK_ROWS = 5000
+HASH_BLOCK_BYTES = 1024 * 1024
+PRICE_FIELD = "current_price_gbp"
+BREEDER_FIELD = "breeder"
+STRAIN_TYPE_FIELD = "indica_sativa"
+TOP_BREEDERS = 5
+HEAVY_HITTER_CAPACITY = 1024  # counts are exact while there are fewer distinct breeders than this
+
+# The tokens pandas.read_csv treats as missing, so the figures match the old pandas-based numbers
+MISSING_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def is_missing(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    return isinstance(value, str) and value in MISSING_VALUES
+
+
+def to_number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else float(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+class HeavyHitters:
+    """Space-Saving top-k counter: at most ``capacity`` keys, exact until that many distinct keys are seen."""
+
+    def __init__(self, capacity: int = HEAVY_HITTER_CAPACITY) -> None:
+        self.capacity = capacity
+        self.exact = True
+        self._counts: Dict[str, int] = {}
+        self._first_seen: Dict[str, int] = {}
+        self._seen = 0
+
+    def add(self, key: str, count: int = 1) -> None:
+        self._seen += 1
+        if key in self._counts:
+            self._counts[key] += count
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[key] = count
+            self._first_seen[key] = self._seen
+            return
+        # Replace the smallest counter; the newcomer inherits its count as an overestimate
+        self.exact = False
+        smallest = min(self._counts, key=self._counts.__getitem__)
+        floor = self._counts.pop(smallest)
+        del self._first_seen[smallest]
+        self._counts[key] = floor + count
+        self._first_seen[key] = self._seen
+
+    def items(self) -> List[Tuple[str, int]]:
+        """Counters in first-seen order, so merging them keeps tie-breaking stable."""
+        return sorted(self._counts.items(), key=lambda item: self._first_seen[item[0]])
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        ranked = sorted(self._counts.items(), key=lambda item: (-item[1], self._first_seen[item[0]]))
+        return ranked[:n]
+
+
+class DatasetStats:
+    """Accumulates the metadata figures one row at a time.
+
+    Rows can be CSV dicts (strings) or ``StrainRecord.as_dict()`` output, so the same
+    numbers come out of a crawl as out of re-reading the CSV. Memory grows with the
+    number of columns, distinct prices and distinct strain types, not with rows.
+    """
+
+    def __init__(self, columns: Iterable[str] = ()) -> None:
+        self.num_examples = 0
+        self.columns: Dict[str, None] = dict.fromkeys(columns)
+        self.present: Counter = Counter()
+        self.prices: Counter = Counter()
+        self.breeders = HeavyHitters()
+        self.strain_types: Counter = Counter()
+
+    @stage("stats")
+    def add(self, row: Mapping[str, Any]) -> None:
+        self.num_examples += 1
+        for name, value in row.items():
+            if name not in self.columns:
+                self.columns[name] = None
+            if not is_missing(value):
+                self.present[name] += 1
+
+        price = to_number(row.get(PRICE_FIELD))
+        if price is not None:
+            self.prices[price] += 1
+        breeder = row.get(BREEDER_FIELD)
+        if not is_missing(breeder):
+            self.breeders.add(breeder)
+        strain_type = row.get(STRAIN_TYPE_FIELD)
+        if not is_missing(strain_type):
+            self.strain_types[str(strain_type)] += 1
+
+    @property
+    def num_columns(self) -> int:
+        return len(self.columns)
+
+    def missing_by_column(self) -> Dict[str, int]:
+        return {name: self.num_examples - self.present[name] for name in self.columns}
+
+    def completeness_pct(self) -> float:
+        cells = self.num_examples * self.num_columns
+        if not cells:
+            return 0.0
+        return (cells - sum(self.missing_by_column().values())) / cells * 100
+
+    def price_stats(self) -> Dict[str, Optional[float]]:
+        if PRICE_FIELD not in self.columns:
+            return {}
+        if not self.prices:
+            return {"min_price_gbp": None, "max_price_gbp": None, "avg_price_gbp": None, "median_price_gbp": None}
+        count = sum(self.prices.values())
+        return {
+            "min_price_gbp": min(self.prices),
+            "max_price_gbp": max(self.prices),
+            "avg_price_gbp": math.fsum(price * times for price, times in self.prices.items()) / count,
+            "median_price_gbp": self._median(count),
+        }
+
+    def _median(self, count: int) -> float:
+        # Exact median from the value histogram: walk distinct prices until the middle rank(s)
+        lower_rank, upper_rank = (count - 1) // 2, count // 2
+        lower = upper = None
+        seen = 0
+        for price in sorted(self.prices):
+            seen += self.prices[price]
+            if lower is None and seen > lower_rank:
+                lower = price
+            if seen > upper_rank:
+                upper = price
+                break
+        return (lower + upper) / 2
+
+    def top_breeders(self, n: int = TOP_BREEDERS) -> List[Dict[str, Any]]:
+        if BREEDER_FIELD not in self.columns:
+            return []
+        return [{"name": name, "count": count} for name, count in self.breeders.most_common(n)]
+
+    def strain_type_counts(self) -> Dict[str, int]:
+        if STRAIN_TYPE_FIELD not in self.columns:
+            return {}
+        return dict(self.strain_types.most_common())
+
+    def merge(self, other: "DatasetStats") -> None:
+        """Fold in the statistics of rows that come after this object's rows."""
+        self.num_examples += other.num_examples
+        for name in other.columns:
+            self.columns.setdefault(name, None)
+        self.present.update(other.present)
+        self.prices.update(other.prices)
+        for breeder, count in other.breeders.items():
+            self.breeders.add(breeder, count)
+        self.breeders.exact = self.breeders.exact and other.breeders.exact
+        for strain_type, count in other.strain_types.items():
+            self.strain_types[strain_type] += count
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "num_examples": self.num_examples,
+            "columns": list(self.columns),
+            "present": dict(self.present),
+            "prices": [[price, count] for price, count in self.prices.items()],
+            "breeders": [[breeder, count] for breeder, count in self.breeders.items()],
+            "breeders_exact": self.breeders.exact,
+            "strain_types": [[strain_type, count] for strain_type, count in self.strain_types.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "DatasetStats":
+        stats = cls(state["columns"])
+        stats.num_examples = state["num_examples"]
+        stats.present.update(state["present"])
+        for price, count in state["prices"]:
+            stats.prices[price] += count
+        for breeder, count in state["breeders"]:
+            stats.breeders.add(breeder, count)
+        stats.breeders.exact = state["breeders_exact"]
+        for strain_type, count in state["strain_types"]:
+            stats.strain_types[strain_type] += count
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "num_examples": self.num_examples,
+            "num_columns": self.num_columns,
+            "completeness_pct": self.completeness_pct(),
+            "missing_by_column": self.missing_by_column(),
+            "price_stats": self.price_stats(),
+            "top_breeders": self.top_breeders(),
+            "strain_types": self.strain_type_counts(),
+        }
+
+
+# Aggregate name -> the single column it is computed from, and how to read it off a DatasetStats
+AGGREGATES = {
+    "price_stats": (PRICE_FIELD, DatasetStats.price_stats),
+    "top_breeders": (BREEDER_FIELD, DatasetStats.top_breeders),
+    "strain_types": (STRAIN_TYPE_FIELD, DatasetStats.strain_type_counts),
+}
+
+
+@stage("stats")
+def compute_csv_stats(path: Path) -> DatasetStats:
+    with path.open("r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.DictReader(csvfile)
+        stats = DatasetStats(reader.fieldnames or [])
+        for row in reader:
+            stats.add(row)
+    return stats
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@stage("stats")
+def column_digests(path: Path) -> Tuple[int, Dict[str, str]]:
+    """Row count and a SHA-256 per column, hashing columns a chunk of rows at a time."""
+    with path.open("r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        width = len(header)
+        digests = [hashlib.sha256() for _ in header]
+        rows = 0
+        while True:
+            chunk = list(itertools.islice(reader, DIGEST_CHUNK_ROWS))
+            if not chunk:
+                break
+            rows += len(chunk)
+            chunk = [row if len(row) == width else (row + [""] * width)[:width] for row in chunk]
+            for digest, column in zip(digests, zip(*chunk)):
+                digest.update(("\x1f".join(column) + "\x1f").encode("utf-8"))
+    return rows, {name: digest.hexdigest() for name, digest in zip(header, digests)}
+
+
+@stage("stats")
+def _partial_stats(path: Path, columns: Set[str]) -> DatasetStats:
+    """Statistics over just ``columns``; other columns are neither read into dicts nor checked."""
+    with path.open("r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        positions = [(name, index) for index, name in enumerate(header) if name in columns]
+        stats = DatasetStats(name for name, _ in positions)
+        for row in reader:
+            stats.add({name: row[index] if index < len(row) else None for name, index in positions})
+    return stats
+
+
+def _read_cache(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        cache = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("version") != STATS_CACHE_VERSION:
+        return None
+    return cache
+
+
+def _write_cache(path: Path, cache: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(cache, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _summary_from_cache(cache: Dict[str, Any], recomputed: List[str]) -> Dict[str, Any]:
+    rows = cache["num_examples"]
+    missing = {name: column["missing"] for name, column in cache["columns"].items()}
+    cells = rows * len(missing)
+    summary = {
+        "num_examples": rows,
+        "num_columns": len(missing),
+        "completeness_pct": (cells - sum(missing.values())) / cells * 100 if cells else 0.0,
+        "missing_by_column": missing,
+    }
+    summary.update({name: aggregate["value"] for name, aggregate in cache["aggregates"].items()})
+    summary["recomputed"] = recomputed
+    return summary
+
+
+def _file_fingerprint(csv_path: Path) -> Dict[str, Any]:
+    info = csv_path.stat()
+    return {"source": csv_path.name, "size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def save_stats(csv_path: Path, stats: DatasetStats, cache_path: Path = STATS_PATH) -> None:
+    """Cache statistics gathered while ``csv_path`` was written, e.g. by the scraper."""
+    rows, digests = column_digests(csv_path)
+    missing = stats.missing_by_column()
+    cache = {
+        "version": STATS_CACHE_VERSION,
+        **_file_fingerprint(csv_path),
+        "content_sha256": file_sha256(csv_path),
+        "num_examples": rows,
+        "columns": {name: {"sha256": digest, "missing": missing.get(name, rows)} for name, digest in digests.items()},
+        "aggregates": {
+            name: {"inputs": {column: digests.get(column)}, "value": compute(stats)}
+            for name, (column, compute) in AGGREGATES.items()
+        },
+    }
+    _write_cache(cache_path, cache)
+
+
+def _load_shard_stats(directory: Path, cache_path: Path) -> Dict[str, Any]:
+    """Merge cached per-shard statistics, computing them only for shards whose hash is new."""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No shard manifest in {directory}")
+    cache = _read_cache(cache_path)
+    cached = cache["shards"] if cache and cache.get("source") == directory.name and "shards" in cache else {}
+
+    combined = DatasetStats(manifest["columns"])
+    states: Dict[str, Any] = {}
+    recomputed: List[str] = []
+    for shard in manifest["shards"]:
+        state = cached.get(shard["sha256"])
+        if state is None:
+            state = compute_csv_stats(directory / shard["path"]).to_state()
+            recomputed.append(shard["path"])
+        states[shard["sha256"]] = state
+        combined.merge(DatasetStats.from_state(state))
+
+    if recomputed or set(states) != set(cached):
+        _write_cache(cache_path, {"version": STATS_CACHE_VERSION, "source": directory.name, "shards": states})
+    summary = combined.summary()
+    summary["recomputed"] = recomputed
+    return summary
+
+
+@stage("stats")
+def load_stats(csv_path: Path, cache_path: Path = STATS_PATH) -> Dict[str, Any]:
+    """Statistics summary for ``csv_path``, recomputing only what its changes invalidated.
+
+    For a shard directory, statistics are cached per shard hash from the manifest and
+    merged, so only changed shards are read. For a single CSV, an unchanged file (same size and mtime, or failing that the same SHA-256) is served
+    straight from the cache. Otherwise per-column SHA-256s are compared with the cached
+    ones, and only the missing-value counts and aggregates of changed columns are
+    recomputed. ``summary["recomputed"]`` lists what was.
+    """
+    if csv_path.is_dir():
+        return _load_shard_stats(csv_path, cache_path)
+    cache = _read_cache(cache_path)
+    fingerprint = _file_fingerprint(csv_path)
+    if cache and all(cache.get(key) == value for key, value in fingerprint.items()):
+        return _summary_from_cache(cache, [])
+
+    content_sha256 = file_sha256(csv_path)
+    if cache and cache.get("source") == csv_path.name and cache.get("content_sha256") == content_sha256:
+        cache.update(fingerprint)
+        _write_cache(cache_path, cache)
+        return _summary_from_cache(cache, [])
+
+    rows, digests = column_digests(csv_path)
+    if not cache or cache.get("source") != csv_path.name or cache.get("num_examples") != rows:
+        cache = {"columns": {}, "aggregates": {}}
+    cached_columns = cache["columns"]
+    changed = {name for name, digest in digests.items() if cached_columns.get(name, {}).get("sha256") != digest}
+    stale = [
+        name
+        for name, (column, _) in AGGREGATES.items()
+        if cache["aggregates"].get(name, {}).get("inputs") != {column: digests.get(column)}
+    ]
+    needed = changed | {AGGREGATES[name][0] for name in stale if AGGREGATES[name][0] in digests}
+    partial = _partial_stats(csv_path, needed) if needed else DatasetStats()
+    partial_missing = partial.missing_by_column()
+
+    columns = {}
+    for name, digest in digests.items():
+        missing = partial_missing[name] if name in changed else cached_columns[name]["missing"]
+        columns[name] = {"sha256": digest, "missing": missing}
+    aggregates = dict(cache["aggregates"])
+    for name in stale:
+        column, compute = AGGREGATES[name]
+        aggregates[name] = {"inputs": {column: digests.get(column)}, "value": compute(partial)}
+
+    cache = {
+        "version": STATS_CACHE_VERSION,
+        **fingerprint,
+        "content_sha256": content_sha256,
+        "num_examples": rows,
+        "columns": columns,
+        "aggregates": aggregates,
+    }
+    _write_cache(cache_path, cache)
+    recomputed = [f"missing:{name}" for name in digests if name in changed] + stale
+    return _summary_from_cache(cache, recomputed)
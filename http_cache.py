@@ -0,0 +1,210 @@
+"""
+Persistent, compressed HTTP response cache for the Seed City scraper
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+CACHE_DIR = Path(".http-cache")
+DEFAULT_TTL_SEC = 12 * 60 * 60  # daily runs revalidate everything fetched by the previous run
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    digest: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    size: int
+
+
+class ResponseCache:
+    """Response bodies stored gzip-compressed under their SHA-256, indexed by URL + params.
+
+    Entries younger than ``ttl_sec`` are served without touching the network. Older
+    entries are revalidated with ``If-None-Match``/``If-Modified-Since``. When the
+    compressed objects exceed ``max_bytes`` the least recently used entries are evicted.
+    In ``offline`` mode every lookup is served from disk regardless of age.
+    """
+
+    def __init__(
+        self,
+        root: Path = CACHE_DIR,
+        ttl_sec: float = DEFAULT_TTL_SEC,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        offline: bool = False,
+    ) -> None:
+        self.root = root
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._objects = root / "objects"
+        self._objects.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(root / "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+        self._db.commit()
+        row = self._db.execute("SELECT SUM(size) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()
+        self._total_bytes = row[0] or 0
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Mapping[str, object]] = None) -> str:
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def iter_pages(self) -> Iterator[Tuple[str, str]]:
+        """Yield ``(key, body)`` for every cached response, e.g. to replay parsers offline."""
+        with self._lock:
+            rows = self._db.execute("SELECT key, digest FROM entries ORDER BY key").fetchall()
+        for key, digest in rows:
+            body = self._read_object(digest)
+            if body is not None:
+                yield key, body
+
+    def lookup(self, url: str, params: Optional[Mapping[str, object]] = None) -> Optional[str]:
+        """Return the cached body if it can be used without asking the server."""
+        key = self.make_key(url, params)
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None or not (self.offline or time.time() - entry.fetched_at < self.ttl_sec):
+                if entry is None:
+                    self.misses += 1
+                return None
+            body = self._read_object(entry.digest)
+            if body is None:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return body
+
+    def conditional_headers(self, url: str, params: Optional[Mapping[str, object]] = None) -> Dict[str, str]:
+        with self._lock:
+            entry = self._entry(self.make_key(url, params))
+        headers: Dict[str, str] = {}
+        if entry:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def revalidate(self, url: str, params: Optional[Mapping[str, object]] = None) -> Optional[str]:
+        """Mark an entry fresh after a 304 and return its body."""
+        key = self.make_key(url, params)
+        with self._lock:
+            entry = self._entry(key)
+            body = self._read_object(entry.digest) if entry else None
+            if body is None:
+                if entry:
+                    self._drop(key)
+                return None
+            now = time.time()
+            self._db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+            self.revalidated += 1
+            return body
+
+    def store(
+        self,
+        url: str,
+        params: Optional[Mapping[str, object]],
+        body: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        key = self.make_key(url, params)
+        raw = body.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._object_path(digest)
+        with self._lock:
+            self._drop(key, commit=False)
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_bytes(gzip.compress(raw, compresslevel=6))
+                os.replace(tmp, path)
+            size = path.stat().st_size
+            if not self._db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                self._total_bytes += size
+            now = time.time()
+            self._db.execute(
+                "INSERT INTO entries (key, digest, etag, last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, digest, etag, last_modified, now, now, size),
+            )
+            self._db.commit()
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entry(self, key: str) -> Optional[CacheEntry]:
+        row = self._db.execute(
+            "SELECT key, digest, etag, last_modified, fetched_at, size FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def _object_path(self, digest: str) -> Path:
+        return self._objects / digest[:2] / f"{digest}.gz"
+
+    def _read_object(self, digest: str) -> Optional[str]:
+        try:
+            return gzip.decompress(self._object_path(digest).read_bytes()).decode("utf-8")
+        except (OSError, EOFError):
+            return None
+
+    def _drop(self, key: str, commit: bool = True) -> None:
+        row = self._db.execute("SELECT digest, size FROM entries WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return
+        digest, size = row
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        if not self._db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            self._object_path(digest).unlink(missing_ok=True)
+            self._total_bytes -= size
+        if commit:
+            self._db.commit()
+
+    def _evict(self) -> None:
+        target = self.max_bytes * 0.9  # leave headroom so eviction does not run on every store
+        keys = self._db.execute("SELECT key FROM entries ORDER BY accessed_at").fetchall()
+        for (key,) in keys:
+            if self._total_bytes <= target:
+                break
+            self._drop(key, commit=False)
+        self._db.commit()
@@ -0,0 +1,199 @@
+"""
+Delta-aware upload of the dataset files to the Hugging Face Hub
+"""
+
+import hashlib
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterable, List, Optional
+
+from huggingface_hub import CommitOperationAdd, CommitOperationDelete
+
+from dataset_shards import CSV_PATH, MANIFEST_NAME, PARQUET_PATH, SHARD_DIR, current_dataset, current_parquet, dataset_files
+from profiling import stage
+
+REPO_ID = "jonusnattapong/cannabis-strains-dataset"
+REPO_TYPE = "dataset"
+SUPPORT_FILES = [
+    "README_HF.md",
+    "dataset-metadata.json",
+    "scrape_seed_city.py",
+    "crawl_journal.py",
+    "crawl_metrics.py",
+    "crawl_scheduler.py",
+    "crawl_sources.py",
+    "http_cache.py",
+    "profiling.py",
+    "record_store.py",
+    "retry_policy.py",
+    "session_pool.py",
+    "sitemap_discovery.py",
+    "dataset_shards.py",
+    "dataset_stats.py",
+    "url_index.py",
+    "cannabis-strains.ipynb",
+]
+HASH_CHUNK_BYTES = 1024 * 1024
+LFS_THRESHOLD_BYTES = 10 * 1024 * 1024  # the Hub stores files from this size up in LFS
+
+
+@dataclass
+class LocalFile:
+    path: Path
+    path_in_repo: str
+    size: int
+    sha256: str
+    git_sha1: str  # git blob id, which the Hub reports for files not stored in LFS
+
+
+@stage("hash")
+def hash_file(path: Path, path_in_repo: Optional[str] = None) -> LocalFile:
+    """Hash ``path`` in chunks, both as an LFS object (SHA-256) and as a git blob (SHA-1)."""
+    size = path.stat().st_size
+    sha256 = hashlib.sha256()
+    git_sha1 = hashlib.sha1(f"blob {size}\0".encode())
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_BYTES), b""):
+            sha256.update(chunk)
+            git_sha1.update(chunk)
+    return LocalFile(path, path_in_repo or path.as_posix(), size, sha256.hexdigest(), git_sha1.hexdigest())
+
+
+def upload_files() -> List[str]:
+    """The current dataset (the CSV, or the shard manifest and its shards), its Parquet copy and the supporting files.
+
+    A Parquet file older than the dataset is left out, and so deleted from the Hub, rather
+    than served next to data it no longer matches.
+    """
+    dataset = current_dataset()
+    if dataset.is_dir():
+        files = [(dataset / MANIFEST_NAME).as_posix()] + [path.as_posix() for path in dataset_files(dataset)]
+    else:
+        files = [dataset.as_posix()]
+    parquet = current_parquet(dataset)
+    if parquet:
+        files.append(parquet.as_posix())
+    return files + SUPPORT_FILES
+
+
+def is_dataset_path(path_in_repo: str) -> bool:
+    return path_in_repo in (CSV_PATH.as_posix(), PARQUET_PATH.as_posix()) or path_in_repo.startswith(f"{SHARD_DIR.as_posix()}/")
+
+
+@dataclass
+class UploadPlan:
+    changed: List[LocalFile]
+    unchanged: List[LocalFile]
+    missing: List[str]
+    deleted: List[str]  # dataset files on the Hub that the current layout no longer has
+
+    @property
+    def bytes_to_send(self) -> int:
+        return sum(file.size for file in self.changed)
+
+    @property
+    def bytes_skipped(self) -> int:
+        return sum(file.size for file in self.unchanged)
+
+
+def matches_remote(local: LocalFile, remote: Any) -> bool:
+    if remote.lfs:
+        return remote.lfs["sha256"] == local.sha256
+    return remote.blob_id == local.git_sha1
+
+
+def plan_upload(api: Any, files: Iterable[str], repo_id: str = REPO_ID, repo_type: str = REPO_TYPE) -> UploadPlan:
+    """Split ``files`` into those whose content differs from the repo's copy and those that do not.
+
+    Dataset files on the Hub that are not being uploaded (old shards, or the single CSV
+    after switching to shards) are scheduled for deletion so loaders never see both.
+    """
+    local: List[LocalFile] = []
+    missing: List[str] = []
+    for name in files:
+        path = Path(name)
+        if path.is_file():
+            local.append(hash_file(path, name))
+        else:
+            missing.append(name)
+
+    remote = {}
+    if local:
+        remote = {info.path: info for info in api.get_paths_info(repo_id, [file.path_in_repo for file in local], repo_type=repo_type)}
+    changed = [file for file in local if file.path_in_repo not in remote or not matches_remote(file, remote[file.path_in_repo])]
+    unchanged = [file for file in local if file not in changed]
+    uploading = {file.path_in_repo for file in local}
+    deleted = [
+        path
+        for path in api.list_repo_files(repo_id, repo_type=repo_type)
+        if is_dataset_path(path) and path not in uploading
+    ]
+    return UploadPlan(changed, unchanged, missing, deleted)
+
+
+@stage("upload")
+def push_plan(api: Any, plan: UploadPlan, commit_message: str, repo_id: str = REPO_ID, repo_type: str = REPO_TYPE):
+    """Commit every changed file and deletion at once; returns None when there is nothing to do."""
+    if not plan.changed and not plan.deleted:
+        return None
+    # Passing paths (not bytes) lets huggingface_hub stream each file from disk in chunks
+    operations: List[Any] = [
+        CommitOperationAdd(path_in_repo=file.path_in_repo, path_or_fileobj=str(file.path)) for file in plan.changed
+    ]
+    operations.extend(CommitOperationDelete(path_in_repo=path) for path in plan.deleted)
+    return api.create_commit(repo_id=repo_id, repo_type=repo_type, operations=operations, commit_message=commit_message)
+
+
+class LocalHub:
+    """Directory-backed stand-in for the ``HfApi`` calls used here, for dry runs and testing.
+
+    Repos live under ``root/<repo_type>s/<repo_id>``; each ``create_commit`` copies the
+    added files in and is recorded in ``commits``.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.commits: List[SimpleNamespace] = []
+
+    def _repo(self, repo_id: str, repo_type: Optional[str]) -> Path:
+        return self.root / f"{repo_type or 'model'}s" / repo_id
+
+    def create_repo(self, repo_id: str, repo_type: Optional[str] = None, exist_ok: bool = False, **_: Any) -> str:
+        self._repo(repo_id, repo_type).mkdir(parents=True, exist_ok=exist_ok)
+        return str(self._repo(repo_id, repo_type))
+
+    def list_repo_files(self, repo_id: str, repo_type: Optional[str] = None, **_: Any) -> List[str]:
+        repo = self._repo(repo_id, repo_type)
+        return sorted(path.relative_to(repo).as_posix() for path in repo.rglob("*") if path.is_file())
+
+    def get_paths_info(self, repo_id: str, paths: List[str], repo_type: Optional[str] = None, **_: Any) -> List[SimpleNamespace]:
+        repo = self._repo(repo_id, repo_type)
+        infos = []
+        for name in paths:
+            if not (repo / name).is_file():
+                continue
+            stored = hash_file(repo / name, name)
+            lfs = {"size": stored.size, "sha256": stored.sha256} if stored.size >= LFS_THRESHOLD_BYTES else None
+            infos.append(SimpleNamespace(path=name, size=stored.size, blob_id=stored.git_sha1, lfs=lfs))
+        return infos
+
+    def create_commit(
+        self, repo_id: str, operations: Iterable[Any], commit_message: str, repo_type: Optional[str] = None, **_: Any
+    ) -> SimpleNamespace:
+        repo = self._repo(repo_id, repo_type)
+        paths = []
+        for operation in operations:
+            target = repo / operation.path_in_repo
+            if isinstance(operation, CommitOperationDelete):
+                target.unlink(missing_ok=True)
+                paths.append(operation.path_in_repo)
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(operation.path_or_fileobj, "rb") as source, target.open("wb") as destination:
+                shutil.copyfileobj(source, destination, HASH_CHUNK_BYTES)
+            paths.append(operation.path_in_repo)
+        commit = SimpleNamespace(commit_message=commit_message, paths=paths, commit_url=f"file://{repo}")
+        self.commits.append(commit)
+        return commit
@@ -0,0 +1,352 @@
+"""
+Low-overhead sampling profiler attributing CPU time and allocations to named stages
+"""
+
+import argparse
+import linecache
+import os
+import sys
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROFILE_DIR = Path("profiles")
+SAMPLE_INTERVAL_SEC = 0.02
+# tracemalloc slows allocation-heavy code (HTML parsing) down many times over, so allocations
+# are traced in short windows rather than for the whole run
+MEMORY_WINDOW_SEC = 0.5
+MEMORY_PERIOD_SEC = 20.0
+MEMORY_FRAMES = 16
+TOP_ALLOCATIONS = 25
+OTHER_STAGE = "other"
+
+# id() of the code object of every stage function -> stage name; registering costs nothing per call.
+# Keyed by id because hashing a code object hashes its bytecode and constants on every lookup.
+STAGE_CODES: Dict[int, str] = {}
+# Source file -> (first line, last line, stage) of those functions, for tracemalloc tracebacks
+STAGE_LINES: Dict[str, List[Tuple[int, int, str]]] = defaultdict(list)
+
+StackKey = Tuple[int, ...]  # ids of the code objects on a stack, innermost frame first
+
+# Allocations with these files anywhere on their stack are left out of the report: module
+# imports are paid once per process and would otherwise dominate it
+IGNORED_ALLOCATION_FILES = {
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    tracemalloc.__file__,
+    __file__,
+}
+
+
+def stage(name: str) -> Callable[[Callable], Callable]:
+    """Mark a function as part of stage ``name``; the function itself is returned unchanged.
+
+    Samples and allocations are attributed to the innermost stage function on the
+    stack, so ``sanitize_text`` called while parsing counts as ``sanitize``. Apply it
+    below any wrapping decorators so the marked code is the one that actually runs.
+    """
+
+    def register(func: Callable) -> Callable:
+        code = func.__code__
+        STAGE_CODES[id(code)] = name
+        last = max((line for _, _, line in code.co_lines() if line is not None), default=code.co_firstlineno)
+        STAGE_LINES[code.co_filename].append((code.co_firstlineno, last, name))
+        return func
+
+    return register
+
+
+def _stage_of_traceback(traceback: tracemalloc.Traceback) -> str:
+    for frame in reversed(traceback):  # oldest first, so walk from the allocating frame outwards
+        for first, last, name in STAGE_LINES.get(frame.filename, ()):
+            if first <= frame.lineno <= last:
+                return name
+    return OTHER_STAGE
+
+
+def _thread_cpu_clock(ident: int) -> Optional[int]:
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        return None
+
+
+class Profiler:
+    """Samples every thread's stack each ``interval`` seconds from a background thread.
+
+    Each sampled stack is charged the wall time since the previous sample and the CPU
+    time its thread used meanwhile (per-thread CPU clocks, where the platform has them),
+    so waiting threads show up only in the wall profile. Stacks are written in the
+    folded format read by flamegraph.pl, speedscope and inferno, weighted in
+    microseconds and rooted at their stage. With ``memory``, tracemalloc runs for
+    ``MEMORY_WINDOW_SEC`` out of every ``MEMORY_PERIOD_SEC`` (starting with the first);
+    allocations made in a window and still live when it closes are added up per stage
+    and allocation site. Work done inside ``ParsePool`` processes is not sampled.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output_dir: Path = PROFILE_DIR,
+        interval: float = SAMPLE_INTERVAL_SEC,
+        memory: bool = False,
+        memory_frames: int = MEMORY_FRAMES,
+        top: int = TOP_ALLOCATIONS,
+    ) -> None:
+        self.name = name
+        self.output_dir = output_dir
+        self.interval = interval
+        self.memory = memory
+        self.memory_frames = memory_frames
+        self.top = top
+        self.wall_ns: Dict[StackKey, int] = defaultdict(int)
+        self.cpu_ns: Dict[StackKey, int] = defaultdict(int)
+        self.samples = 0
+        self.sampling_ns = 0
+        self.cpu_available = hasattr(time, "pthread_getcpuclockid")
+        self._cpu_clocks: Dict[int, Optional[int]] = {}
+        self._cpu_seen: Dict[int, int] = {}
+        self._codes: Dict[int, CodeType] = {}  # keeps every sampled code object alive so its id stays unique
+        self._labels: Dict[int, str] = {}
+        self.windows = 0
+        self.window_sec = 0.0
+        self.allocated_by_stage: Dict[str, int] = defaultdict(int)
+        self.allocation_sites: Dict[Tuple[str, str, int], List[int]] = defaultdict(lambda: [0, 0])  # size, blocks
+        self._window_started: Optional[float] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+        self.report_path: Optional[Path] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def __enter__(self) -> "Profiler":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def start(self) -> "Profiler":
+        if self.memory and tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is already tracing; the profiler manages it itself")
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> Path:
+        """Stop sampling and write the profiles; returns the path of the text report."""
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+        if self._window_started is not None:
+            self._close_window()
+        return self.write()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        if self.memory:
+            self._open_window()
+        next_window = time.monotonic() + MEMORY_PERIOD_SEC
+        previous = time.perf_counter_ns()
+        while not self._stop.wait(self.interval):
+            started = time.perf_counter_ns()
+            cpu_started = time.thread_time_ns()
+            # Windows are checked first: under tracing, C-level loops elsewhere hold the GIL for
+            # long stretches, and every bytecode run here before closing the window prolongs it
+            if self.memory:
+                now = time.monotonic()
+                if self._window_started is not None and now - self._window_started >= MEMORY_WINDOW_SEC:
+                    self._close_window()
+                elif self._window_started is None and now >= next_window:
+                    self._open_window()
+                    next_window = now + MEMORY_PERIOD_SEC
+            # Weight by the real gap, which stretches when the GIL or a window holds the sampler up
+            self._sample(own, started - previous)
+            previous = started
+            self.sampling_ns += time.thread_time_ns() - cpu_started
+
+    def _sample(self, own: int, elapsed_ns: int) -> None:
+        self.samples += 1
+        frames = sys._current_frames()
+        # Thread idents are reused, so forget the CPU clocks of threads that have exited
+        for ident in [ident for ident in self._cpu_clocks if ident not in frames]:
+            del self._cpu_clocks[ident]
+            self._cpu_seen.pop(ident, None)
+        for ident, frame in frames.items():
+            if ident == own:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            key = tuple(map(id, codes))
+            if key not in self.wall_ns:
+                self._codes.update(zip(key, codes))
+            self.wall_ns[key] += elapsed_ns
+            cpu = self._cpu_delta(ident)
+            if cpu:
+                self.cpu_ns[key] += cpu
+
+    def _cpu_delta(self, ident: int) -> int:
+        if not self.cpu_available:
+            return 0
+        if ident not in self._cpu_clocks:
+            self._cpu_clocks[ident] = _thread_cpu_clock(ident)
+        clock = self._cpu_clocks[ident]
+        if clock is None:
+            return 0
+        try:
+            now = time.clock_gettime_ns(clock)
+        except OSError:  # the thread exited between listing and reading its clock
+            self._cpu_clocks[ident] = None
+            return 0
+        previous = self._cpu_seen.get(ident)
+        self._cpu_seen[ident] = now
+        # CPU used before the first sample of a thread happened outside the profile
+        return now - previous if previous is not None else 0
+
+    def _open_window(self) -> None:
+        tracemalloc.start(self.memory_frames)
+        self._window_started = time.monotonic()
+
+    def _close_window(self) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.windows += 1
+        self.window_sec += time.monotonic() - self._window_started
+        self._window_started = None
+        # Grouping first leaves one iteration per distinct stack (Snapshot.filter_traces would
+        # match every single trace in Python)
+        for stat in snapshot.statistics("traceback"):
+            if any(frame.filename in IGNORED_ALLOCATION_FILES for frame in stat.traceback):
+                continue
+            stage_name = _stage_of_traceback(stat.traceback)
+            frame = stat.traceback[-1]
+            self.allocated_by_stage[stage_name] += stat.size
+            site = self.allocation_sites[(stage_name, frame.filename, frame.lineno)]
+            site[0] += stat.size
+            site[1] += stat.count
+
+    def _label(self, code_id: int) -> str:
+        label = self._labels.get(code_id)
+        if label is None:
+            code = self._codes[code_id]
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code_id] = label
+        return label
+
+    @staticmethod
+    def stage_of(key: StackKey) -> str:
+        return next((STAGE_CODES[code_id] for code_id in key if code_id in STAGE_CODES), OTHER_STAGE)
+
+    def folded(self, weights: Dict[StackKey, int]) -> List[str]:
+        lines = []
+        for key, weight_ns in sorted(weights.items(), key=lambda item: -item[1]):
+            if weight_ns >= 1000:
+                frames = [f"[{self.stage_of(key)}]", *map(self._label, reversed(key))]
+                lines.append(";".join(frames) + f" {weight_ns // 1000}")
+        return lines
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"wall_sec": 0.0, "cpu_sec": 0.0})
+        for key, ns in self.wall_ns.items():
+            totals[self.stage_of(key)]["wall_sec"] += ns / 1e9
+        for key, ns in self.cpu_ns.items():
+            totals[self.stage_of(key)]["cpu_sec"] += ns / 1e9
+        return dict(totals)
+
+    def allocation_lines(self) -> List[str]:
+        lines = [
+            f"Allocations traced in {self.windows} window(s), {self.window_sec:.1f}s of {self._elapsed:.1f}s, "
+            "counting blocks still live when their window closed",
+            "",
+            "By stage:",
+        ]
+        for stage_name, size in sorted(self.allocated_by_stage.items(), key=lambda item: -item[1]):
+            lines.append(f"  {stage_name:<14} {size / 1024:>10.1f} KiB")
+        lines += ["", f"Top {self.top} allocation sites:"]
+        ranked = sorted(self.allocation_sites.items(), key=lambda item: -item[1][0])[: self.top]
+        for rank, ((stage_name, filename, lineno), (size, count)) in enumerate(ranked, 1):
+            source = linecache.getline(filename, lineno).strip()
+            lines.append(f"  #{rank:<3} {size / 1024:>10.1f} KiB {count:>8} blocks  [{stage_name}] {filename}:{lineno}")
+            if source:
+                lines.append(f"       {source}")
+        return lines
+
+    def report_lines(self) -> List[str]:
+        overhead = self.sampling_ns / 1e9 / self._elapsed * 100 if self._elapsed else 0.0
+        lines = [
+            f"Profile of {self.name}: {self._elapsed:.1f}s, {self.samples} samples every {self.interval * 1000:g} ms "
+            f"(profiler thread CPU {overhead:.2f}% of the run)",
+            "",
+            f"{'stage':<14} {'cpu s':>9} {'wall s':>9}  (wall sums every thread, waiting ones included)",
+        ]
+        totals = self.stage_totals()
+        for stage_name, total in sorted(totals.items(), key=lambda item: (-item[1]["cpu_sec"], -item[1]["wall_sec"])):
+            cpu = f"{total['cpu_sec']:>9.2f}" if self.cpu_available else f"{'n/a':>9}"
+            lines.append(f"{stage_name:<14} {cpu} {total['wall_sec']:>9.2f}")
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux and in bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+            lines += ["", f"Peak resident memory: {peak:.1f} MiB"]
+        if self.memory:
+            lines += [""] + self.allocation_lines()
+        return lines
+
+    def write(self) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        Path(f"{base}.wall.folded").write_text("\n".join(self.folded(self.wall_ns)) + "\n", encoding="utf-8")
+        if self.cpu_available:
+            Path(f"{base}.cpu.folded").write_text("\n".join(self.folded(self.cpu_ns)) + "\n", encoding="utf-8")
+        self.report_path = Path(f"{base}.txt")
+        self.report_path.write_text("\n".join(self.report_lines()) + "\n", encoding="utf-8")
+        return self.report_path
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        type=Path,
+        const=PROFILE_DIR,
+        metavar="DIR",
+        help=f"sample CPU and wall time per stage and write folded stacks and a report to DIR (default: {PROFILE_DIR})",
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=SAMPLE_INTERVAL_SEC,
+        help="seconds between stack samples (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help=f"also trace allocations for {MEMORY_WINDOW_SEC:g}s of every {MEMORY_PERIOD_SEC:g}s and report the top allocation sites per stage",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=TOP_ALLOCATIONS,
+        help="allocation sites listed in the report (default: %(default)s)",
+    )
+
+
+def profiler_from_args(args: argparse.Namespace, name: str) -> Optional[Profiler]:
+    """A ``Profiler`` for the arguments added by ``add_profile_arguments``, or None when profiling is off."""
+    if args.profile is None and not args.profile_memory:
+        return None
+    return Profiler(
+        name,
+        output_dir=args.profile or PROFILE_DIR,
+        interval=args.profile_interval,
+        memory=args.profile_memory,
+        top=args.profile_top,
+    )
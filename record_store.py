@@ -0,0 +1,174 @@
+"""
+SQLite store of scraped records, the system of record the CSV and Parquet files are exported from
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set
+
+from dataset_shards import dataset_fingerprint
+
+STORE_PATH = Path("cannabis-strains.sqlite3")
+KEY_FIELD = "product_url"
+BATCH_ROWS = 1000
+FETCH_ROWS = 1000
+
+
+class RecordStore:
+    """Records keyed by product URL, in first-seen order, with first/last-seen timestamps.
+
+    ``fields`` are stored as columns (untyped, so floats, strings and NULLs round-trip
+    as they were given) and the extra fields as one JSON object. ``upsert`` writes a
+    batch in a single transaction and rewrites a row only when one of its values
+    changed; every change bumps ``revision``, which exports compare against to skip
+    rewriting an unchanged dataset.
+    """
+
+    def __init__(self, fields: Sequence[str], path: Path = STORE_PATH) -> None:
+        if KEY_FIELD not in fields:
+            raise ValueError(f"fields must include {KEY_FIELD!r}")
+        self.path = path
+        self.fields = list(fields)
+        self._db = sqlite3.connect(str(path))
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                extra TEXT NOT NULL DEFAULT '{}',
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        present = {row[1] for row in self._db.execute("PRAGMA table_info(records)")}
+        for name in self.fields:
+            if name not in present:
+                self._db.execute(f"ALTER TABLE records ADD COLUMN {self._quote(name)}")
+        self._db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS records_key ON records ({self._quote(KEY_FIELD)})")
+        self._db.commit()
+
+        columns = [*self.fields, "extra"]
+        quoted = [self._quote(name) for name in columns]
+        differs = " OR ".join(f"records.{name} IS NOT excluded.{name}" for name in quoted)
+        self._upsert_sql = (
+            f"INSERT INTO records ({', '.join(quoted)}, first_seen, last_seen, updated_at) "
+            f"VALUES ({', '.join('?' * len(columns))}, ?, ?, ?) "
+            f"ON CONFLICT ({self._quote(KEY_FIELD)}) DO UPDATE SET "
+            f"{', '.join(f'{name} = excluded.{name}' for name in quoted)}, updated_at = excluded.updated_at "
+            f"WHERE {differs}"
+        )
+        self._select_sql = f"SELECT {', '.join(quoted)} FROM records ORDER BY id"
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    def urls(self) -> Set[str]:
+        return {url for (url,) in self._db.execute(f"SELECT {self._quote(KEY_FIELD)} FROM records")}
+
+    @property
+    def revision(self) -> int:
+        return self._meta("revision", 0)
+
+    def _meta(self, key: str, default: Any = None) -> Any:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def upsert(
+        self,
+        records: Iterable[Mapping[str, Any]],
+        seen: Iterable[str] = (),
+        updates: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    ) -> int:
+        """Insert or update ``records`` (``StrainRecord.to_state()`` dicts) in one transaction.
+
+        URLs in ``seen`` (products listed again but not re-parsed) only get ``last_seen``
+        bumped; ``updates`` maps URLs to new values for some of ``fields`` and, under
+        ``"extra"``, extra fields to merge in. Returns the number of rows inserted or
+        changed.
+        """
+        now = time.time()
+        changed = 0
+        touched: List[str] = list(seen)
+        with self._db:
+            batch: List[List[Any]] = []
+            for record in records:
+                touched.append(record[KEY_FIELD])
+                extra = json.dumps(record.get("extra") or {}, ensure_ascii=False, sort_keys=True)
+                batch.append([*(record.get(name) for name in self.fields), extra, now, now, now])
+                if len(batch) >= BATCH_ROWS:
+                    changed += self._db.executemany(self._upsert_sql, batch).rowcount
+                    batch = []
+            if batch:
+                changed += self._db.executemany(self._upsert_sql, batch).rowcount
+            for url, fields in (updates or {}).items():
+                changed += self._update(url, fields, now)
+            for start in range(0, len(touched), BATCH_ROWS):
+                self._db.executemany(
+                    f"UPDATE records SET last_seen = ? WHERE {self._quote(KEY_FIELD)} = ?",
+                    [(now, url) for url in touched[start : start + BATCH_ROWS]],
+                )
+            if changed:
+                self._set_meta("revision", self.revision + 1)
+        return changed
+
+    def _update(self, url: str, fields: Mapping[str, Any], now: float) -> int:
+        names = [name for name in fields if name in self.fields and name != KEY_FIELD]
+        values = [fields[name] for name in names]
+        if fields.get("extra"):
+            # Extra fields are merged into the stored ones rather than replacing them
+            row = self._db.execute(f"SELECT extra FROM records WHERE {self._quote(KEY_FIELD)} = ?", (url,)).fetchone()
+            if row:
+                names.append("extra")
+                values.append(json.dumps({**json.loads(row[0]), **fields["extra"]}, ensure_ascii=False, sort_keys=True))
+        if not names:
+            return 0
+        quoted = [self._quote(name) for name in names]
+        cursor = self._db.execute(
+            f"UPDATE records SET {', '.join(f'{name} = ?' for name in quoted)}, updated_at = ? "
+            f"WHERE {self._quote(KEY_FIELD)} = ? AND ({' OR '.join(f'{name} IS NOT ?' for name in quoted)})",
+            [*values, now, url, *values],
+        )
+        return cursor.rowcount
+
+    def iter_states(self) -> Iterator[Dict[str, Any]]:
+        """Stream every record back, as ``StrainRecord`` constructor arguments, in first-seen order."""
+        cursor = self._db.execute(self._select_sql)
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                return
+            for row in rows:
+                state = dict(zip(self.fields, row))
+                state["extra"] = json.loads(row[-1])
+                yield state
+
+    def timestamps(self, url: str) -> Optional[Dict[str, float]]:
+        row = self._db.execute(
+            f"SELECT first_seen, last_seen, updated_at FROM records WHERE {self._quote(KEY_FIELD)} = ?", (url,)
+        ).fetchone()
+        return dict(zip(("first_seen", "last_seen", "updated_at"), row)) if row else None
+
+    def exported(self, target: Path) -> bool:
+        """Whether ``target`` was exported at the current revision and its files are untouched since."""
+        if not target.exists():
+            return False
+        stamp = json.dumps([self.revision, dataset_fingerprint(target)])
+        return self._meta(f"export:{target.as_posix()}") == stamp
+
+    def mark_exported(self, target: Path) -> None:
+        with self._db:
+            self._set_meta(f"export:{target.as_posix()}", json.dumps([self.revision, dataset_fingerprint(target)]))
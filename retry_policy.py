@@ -0,0 +1,240 @@
+"""
+Retry policy for crawl requests: failure classes, jittered backoff, a retry budget, a circuit breaker and dead URLs
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Optional, Set
+
+DEAD_URLS_PATH = Path("cannabis-strains.dead-urls.json")
+DEAD_URL_TTL_SEC = 30 * 24 * 3600  # relisted products come back, so dead URLs are re-checked after this
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SEC = 1.0
+BACKOFF_MAX_SEC = 60.0
+RETRY_BUDGET_RATIO = 0.2  # every first attempt earns this much retry allowance
+RETRY_BUDGET_MIN = 10.0  # allowance available from the start
+RETRY_BUDGET_MAX = 50.0
+BREAKER_WINDOW = 50  # most recent outcomes the failure rate is taken over
+BREAKER_MIN_OUTCOMES = 20
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_COOLDOWN_SEC = 30.0
+BREAKER_MAX_COOLDOWN_SEC = 600.0
+
+PERMANENT = "permanent"
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+
+THROTTLED_STATUSES = {403, 429, 503}  # 403 is how Cloudflare challenges surface
+TRANSIENT_CLIENT_STATUSES = {408, 409, 425}
+
+
+def classify(status: Optional[int]) -> str:
+    """Failure class of a non-200 response; ``status`` is None when the request raised."""
+    if status is None:
+        return TRANSIENT
+    if status in THROTTLED_STATUSES:
+        return THROTTLED
+    if 400 <= status < 500 and status not in TRANSIENT_CLIENT_STATUSES:
+        return PERMANENT  # 404/410 for delisted products; asking again gets the same answer
+    return TRANSIENT
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SEC, cap: float = BACKOFF_MAX_SEC) -> float:
+    """Delay before retry number ``attempt`` (1 for the first retry): exponential, capped, half of it jittered.
+
+    The jitter keeps workers that failed together from retrying together.
+    """
+    ceiling = min(cap, base * 2 ** (attempt - 1))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class RetryBudget:
+    """Token bucket that limits retries to a fraction of first attempts.
+
+    While requests mostly succeed the bucket stays full and single failures are retried
+    freely; when most requests fail it drains and failures are given up on at once
+    instead of multiplying the load on a struggling site.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, initial: float = RETRY_BUDGET_MIN, cap: float = RETRY_BUDGET_MAX) -> None:
+        self.ratio = ratio
+        self.cap = cap
+        self._tokens = min(initial, cap)
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Pauses every request once too many of the recent ones failed.
+
+    Open: callers of ``wait`` block for the cooldown. Then one caller goes through as a
+    probe while the rest keep waiting; a successful probe closes the breaker, a failed
+    one reopens it with the cooldown doubled (up to ``max_cooldown``).
+    """
+
+    def __init__(
+        self,
+        window: int = BREAKER_WINDOW,
+        min_outcomes: int = BREAKER_MIN_OUTCOMES,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        cooldown: float = BREAKER_COOLDOWN_SEC,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN_SEC,
+    ) -> None:
+        self.min_outcomes = min_outcomes
+        self.failure_rate = failure_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._cooldown = cooldown
+        self._open_until: Optional[float] = None
+        self._prober: Optional[int] = None  # thread sending the probe request
+        self._changed = threading.Condition()
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_until is not None
+
+    def wait(self) -> float:
+        """Block while the breaker is open; returns the seconds spent waiting."""
+        if self._open_until is None:
+            return 0.0
+        started = time.monotonic()
+        with self._changed:
+            while self._open_until is not None:
+                remaining = self._open_until - time.monotonic()
+                if remaining > 0:
+                    self._changed.wait(remaining)
+                elif self._prober is None:
+                    self._prober = threading.get_ident()
+                    break
+                else:
+                    self._changed.wait()
+        return time.monotonic() - started
+
+    def record(self, ok: bool) -> None:
+        with self._changed:
+            if self._prober == threading.get_ident():
+                self._prober = None
+                if ok:
+                    logging.info("Circuit breaker closed: probe request succeeded")
+                    self._open_until = None
+                    self._cooldown = self.base_cooldown
+                    self._outcomes.clear()
+                else:
+                    self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                    self._open("probe request failed")
+                self._changed.notify_all()
+                return
+            if self._open_until is not None:
+                return  # a request sent before the breaker opened
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_outcomes and failures >= self.failure_rate * len(self._outcomes):
+                self._open(f"{failures} of the last {len(self._outcomes)} requests failed")
+
+    def _open(self, reason: str) -> None:
+        self.opened += 1
+        self._open_until = time.monotonic() + self._cooldown
+        logging.warning("Circuit breaker open for %gs: %s", self._cooldown, reason)
+
+
+class DeadUrls:
+    """URLs that answered with a permanent failure, with when that was last confirmed.
+
+    Entries expire after ``ttl`` seconds so that a relisted product is fetched again.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = DEAD_URL_TTL_SEC) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.added: Set[str] = set()
+        self._entries: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        if path and path.exists():
+            try:
+                self._entries = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                logging.warning("Ignoring unreadable dead-URL list %s", path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        entry = self._entries.get(url)
+        return entry is not None and time.time() - entry["last_seen"] < self.ttl
+
+    def add(self, url: str, status: int) -> None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.setdefault(url, {"first_seen": now})
+            entry.update(status=status, last_seen=now)
+            self.added.add(url)
+
+    def discard(self, url: str) -> None:
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            payload = json.dumps(self._entries, indent=2, sort_keys=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class RetryPolicy:
+    """What the fetchers share: the attempt limit, the retry budget, the breaker and the dead URLs."""
+
+    def __init__(
+        self,
+        dead_urls: Optional[DeadUrls] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+        budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.dead_urls = dead_urls if dead_urls is not None else DeadUrls()
+        self.max_attempts = max_attempts
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = 0
+        self.budget_exhausted = 0
+
+    def should_retry(self, failure: str, attempt: int) -> bool:
+        """Whether to try again after ``attempt`` (1-based) attempts ending in ``failure``."""
+        if failure == PERMANENT or attempt >= self.max_attempts:
+            return False
+        if not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return False
+        self.retries += 1
+        return True
+
+    def record(self, attempt: int, failure: Optional[str] = None) -> None:
+        """Feed back the outcome of attempt number ``attempt``; ``failure`` is None on success."""
+        if attempt == 1:
+            self.budget.deposit()
+        # A 404 is the site answering normally, so for the breaker it counts as a success
+        self.breaker.record(failure is None or failure == PERMANENT)
@@ -1,24 +1,99 @@
+import argparse
 import csv
+import hashlib
+import itertools
+import json
 import logging
+import multiprocessing
+import os
 import re
+import sys
+import threading
 import time
-from dataclasses import dataclass, field
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from html.entities import html5
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Set, Tuple, Union
 from urllib.parse import urljoin
 
-import cloudscraper
-from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4 import BeautifulSoup, CData, Comment, Declaration, Doctype, NavigableString, ProcessingInstruction, Tag
+from bs4.builder import HTMLTreeBuilder
+
+from crawl_journal import JOURNAL_PATH, CrawlJournal
+from crawl_metrics import EXPORT_INTERVAL_SEC, METRICS, METRICS_JSON_PATH, METRICS_PROM_PATH, MetricsExporter
+from crawl_scheduler import SCHEDULER_WORKERS, CrawlScheduler
+from crawl_sources import SOURCES, CrawlSource, make_source, register_source, source_journal_path
+from dataset_shards import PARQUET_PATH, SHARD_DIR, SHARD_ROWS, current_dataset, dataset_files, read_manifest, write_manifest
+from dataset_stats import DatasetStats, file_sha256, save_stats
+from http_cache import CACHE_DIR, DEFAULT_MAX_BYTES, DEFAULT_TTL_SEC, ResponseCache
+from profiling import add_profile_arguments, profiler_from_args, stage
+from record_store import STORE_PATH, RecordStore
+from retry_policy import DEAD_URL_TTL_SEC, DEAD_URLS_PATH, MAX_ATTEMPTS, PERMANENT, TRANSIENT, DeadUrls, RetryPolicy, backoff_delay, classify
+from session_pool import SessionPool
+from sitemap_discovery import SITEMAP_CHUNK_BYTES, SITEMAP_STATE_PATH, SitemapSnapshot, iter_sitemaps, robots_sitemaps
+from url_index import CountingWriter, IndexWriter, load_urls
 
 
 BASE_URL = "https://www.seed-city.com/en/list-all-products"
 SITE_ROOT = "https://www.seed-city.com"
+LISTING_PATH = "/en/list-all-products"
+DEFAULT_SOURCES = ["seed-city"]
 PAGE_SIZE = 30
-REQUEST_PAUSE_SEC = 0.6  # be polite to the remote server
-DETAIL_REQUEST_PAUSE_SEC = 0.35
-MAX_EMPTY_PAGES = 3
+START_REQUESTS_PER_SEC = 2.5  # shared by every request to the host, adjusted by the rate controller
+MIN_REQUESTS_PER_SEC = 0.2
+MAX_REQUESTS_PER_SEC = 5.0
+RATE_LIMIT_BURST = 1
+RATE_INCREASE_STEP = 0.25  # additive increase after a window of fast 200s
+RATE_INCREASE_WINDOW = 10
+RATE_DECREASE_FACTOR = 0.5  # multiplicative decrease on throttling signals
+RATE_DECREASE_COOLDOWN_SEC = 2.0
+SLOW_RESPONSE_SEC = 3.0
+MAX_RETRY_AFTER_SEC = 300.0
+THROTTLE_STATUSES = {403, 429, 500, 502, 503, 504}  # 403 is how Cloudflare challenges surface
+DETAIL_WORKERS = 4
+PARSE_PROCESSES = 0  # 0 parses in the crawl process; >0 hands raw HTML to a pool of parser processes
+PARSE_QUEUE_SIZE = 16  # raw pages allowed to wait for a parser before fetchers block
+MAX_EMPTY_PAGES = 3  # only used when probing for the end of the catalogue
+MAX_PROBE_OFFSET = 10000
 FETCH_DETAIL_PAGES = True
+LISTING_ITEM_SELECTOR = "div.yagendoo_vm_browse_element"
+# VirtueMart's product view, for products found in the sitemap rather than on a listing page
+PRODUCT_VIEW_SELECTOR = ".productdetails-view"
+PRODUCT_IGNORED_SELECTOR = ".related-products"
+CATALOGUE_PATH = "/en/"  # sitemap pages outside the catalogue's language are skipped
+SITEMAP_TIMEOUT_SEC = 60
+
+# Parser backends. "html.parser" is the reference output. "stream" extracts detail
+# pages in a single tokenizer pass without building a tree (listing pages use
+# html.parser). lxml is not offered: it closes unclosed tags at a different point,
+# so on messy pages its fields differ from the reference.
+PARSER_BACKENDS = ("stream", "html.parser")
+REFERENCE_PARSER_BACKEND = "html.parser"
+PARSER_BACKEND = os.environ.get("SEED_CITY_PARSER", "stream")
 OUTPUT_PATH = Path("cannabis-strains.csv")
+PARQUET_COMPRESSION = "zstd"
+PARQUET_BATCH_ROWS = 10000  # rows per row group; bounds memory while converting
+MAX_SHARDS = 256  # distinct --shard-by values; each shard file stays open during the final pass
+
+BASE_FIELDS = [
+    "strain_name",
+    "breeder",
+    "description",
+    "current_price_gbp",
+    "original_price_gbp",
+    "discount_percent",
+    "pack_options",
+    "product_url",
+    "image_url",
+]
+
+# Fields a listing page carries that change over time; refreshed in place by --refresh-prices
+LISTING_PRICE_FIELDS = ["current_price_gbp", "original_price_gbp", "discount_percent", "pack_options"]
 
 SECTION_FIELD_MAP = {
     "section_overview": "overview",
@@ -94,13 +169,262 @@ EXTRA_FIELD_ORDER = [
     "seed_city_bonuses",
 ]
 
+FLOAT_FIELDS = ["current_price_gbp", "original_price_gbp", "discount_percent"]
+
+# Low-cardinality columns stored dictionary-encoded (pandas reads them back as categoricals)
+CATEGORICAL_FIELDS = [
+    "breeder",
+    "seed_type",
+    "flowering_period_type",
+    "indica_sativa",
+    "type_ratio",
+    "strain_type_summary",
+    "environment",
+    "strength",
+    "medical_strains",
+    "climate",
+    "thc",
+    "cbd",
+    "yield_indoor",
+    "yield_outdoor",
+    "height_indoor",
+    "height_outdoor",
+    "indoor_height_detail",
+    "indoor_flowering_time",
+    "outdoor_harvest_time",
+    "flowering_time",
+    "harvest_month",
+    "stock_availability",
+    "sale_item",
+    "most_popular_seeds",
+    "seed_city_bonuses",
+]
+
+RESULTS_COUNT_RE = re.compile(r"Results\s+\d+\s*-\s*\d+\s+of\s+(\d+)", re.IGNORECASE)
+PAGE_COUNT_RE = re.compile(r"Page\s+\d+\s+of\s+(\d+)", re.IGNORECASE)
+PAGE_LINK_RE = re.compile(r"href=[\"'][^\"']*?(?:limitstart=|/results,)(\d+)", re.IGNORECASE)
+TAG_RE = re.compile(r"<[^>]+>")
 CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
+REQUESTS = METRICS.counter("seedcity_requests_total", "HTTP requests sent, by page kind and status", ("kind", "status"))
+REQUEST_SECONDS = METRICS.histogram("seedcity_request_seconds", "Latency of single HTTP requests", ("kind",))
+RESPONSE_BYTES = METRICS.counter("seedcity_response_bytes_total", "Response body bytes received", ("kind",))
+RETRIES = METRICS.counter("seedcity_retries_total", "Request attempts after the first", ("kind",))
+FAILURES = METRICS.counter("seedcity_request_failures_total", "Failed request attempts by failure class", ("kind", "failure"))
+DEAD_URLS_SKIPPED = METRICS.counter("seedcity_dead_urls_skipped_total", "Detail pages not requested because they are known dead")
+CACHE_LOOKUPS = METRICS.counter("seedcity_cache_lookups_total", "Response cache lookups", ("kind", "result"))
+STAGE_SECONDS = METRICS.histogram("seedcity_stage_seconds", "Wall time per call of each crawl stage", ("stage",))
+SLEEP_SECONDS = METRICS.counter("seedcity_sleep_seconds_total", "Time spent deliberately waiting", ("reason",))
+RECORDS_TOTAL = METRICS.counter("seedcity_records_total", "Records crawled and written", ("event",))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; every request to the host takes one token."""
+
+    def __init__(self, rate: float, capacity: float = RATE_LIMIT_BURST) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            SLEEP_SECONDS.inc(wait, reason="rate_limit")
+            time.sleep(wait)
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.rate = rate
+
 
 @dataclass
+class RateDecision:
+    timestamp: float
+    old_rate: float
+    new_rate: float
+    reason: str
+
+
+class AdaptiveRateController:
+    """AIMD pacing for all requests to the host.
+
+    Fast 200 responses raise the rate additively; throttling statuses, Cloudflare
+    challenges and connection errors cut it multiplicatively. A ``Retry-After``
+    header pauses every worker until it has elapsed.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = START_REQUESTS_PER_SEC,
+        min_rate: float = MIN_REQUESTS_PER_SEC,
+        max_rate: float = MAX_REQUESTS_PER_SEC,
+        adaptive: bool = True,
+        history_size: int = 1000,
+    ) -> None:
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("expected 0 < min_rate <= max_rate")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.adaptive = adaptive
+        self.history: Deque[RateDecision] = deque(maxlen=history_size)
+        self._bucket = TokenBucket(min(max(initial_rate, min_rate), max_rate))
+        self._lock = threading.Lock()
+        self._good_streak = 0
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            SLEEP_SECONDS.inc(wait, reason="pause")
+            time.sleep(wait)
+        self._bucket.acquire()
+
+    def observe(self, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> None:
+        """Feed back one response; ``status`` is None when the request raised."""
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + min(retry_after, MAX_RETRY_AFTER_SEC))
+                self._record(self.rate, f"retry-after {retry_after:g}s (status {status})")
+
+            if status is None or status in THROTTLE_STATUSES:
+                self._good_streak = 0
+                if not self.adaptive or now - self._last_decrease < RATE_DECREASE_COOLDOWN_SEC:
+                    return
+                self._last_decrease = now
+                new_rate = max(self.min_rate, self.rate * RATE_DECREASE_FACTOR)
+                self._paused_until = max(self._paused_until, now + 1 / new_rate)
+                self._set_rate(new_rate, "connection error" if status is None else f"status {status}")
+                return
+
+            if status not in (200, 304) or latency >= SLOW_RESPONSE_SEC:
+                self._good_streak = 0
+                return
+
+            self._good_streak += 1
+            if self.adaptive and self._good_streak >= RATE_INCREASE_WINDOW and self.rate < self.max_rate:
+                self._good_streak = 0
+                self._set_rate(
+                    min(self.max_rate, self.rate + RATE_INCREASE_STEP),
+                    f"{RATE_INCREASE_WINDOW} fast responses",
+                )
+
+    def _set_rate(self, new_rate: float, reason: str) -> None:
+        old_rate = self.rate
+        self._bucket.set_rate(new_rate)
+        self._record(old_rate, reason)
+        logging.info("Request rate %.2f -> %.2f req/s (%s)", old_rate, new_rate, reason)
+
+    def _record(self, old_rate: float, reason: str) -> None:
+        self.history.append(RateDecision(time.time(), old_rate, self.rate, reason))
+
+    def write_history(self, path: Path) -> None:
+        payload = {
+            "current_rate": self.rate,
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "decisions": [asdict(decision) for decision in self.history],
+        }
+        path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+# Shared schema for the extra fields: each key gets a fixed slot, so records store only a
+# list of values. Keys are appended the first time they are seen and never removed.
+EXTRA_KEYS: List[str] = list(EXTRA_FIELD_ORDER)
+EXTRA_KEY_SLOTS: Dict[str, int] = {key: slot for slot, key in enumerate(EXTRA_KEYS)}
+EXTRA_KEYS_LOCK = threading.Lock()
+
+_ABSENT = object()
+
+
+def extra_key_slot(key: str) -> int:
+    slot = EXTRA_KEY_SLOTS.get(key)
+    if slot is None:
+        with EXTRA_KEYS_LOCK:
+            slot = EXTRA_KEY_SLOTS.get(key)
+            if slot is None:
+                slot = len(EXTRA_KEYS)
+                EXTRA_KEYS.append(sys.intern(key))
+                EXTRA_KEY_SLOTS[EXTRA_KEYS[slot]] = slot
+    return slot
+
+
+def intern_value(value: Any) -> Any:
+    """One shared copy per distinct string: categorical values and boilerplate text repeat across records."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class ExtraFields(MutableMapping):
+    """Mapping of extra field values held in a list indexed by ``EXTRA_KEYS`` slots.
+
+    Behaves like the dict it replaces, except that keys iterate in schema order rather
+    than insertion order. Pickles as a plain dict, so a worker process with a different
+    schema can hand records back.
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: Optional[Mapping[str, str]] = None) -> None:
+        self._values: List[Any] = []
+        if values:
+            self.update(values)
+
+    def __getitem__(self, key: str) -> str:
+        slot = EXTRA_KEY_SLOTS.get(key)
+        value = self._values[slot] if slot is not None and slot < len(self._values) else _ABSENT
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: str) -> None:
+        slot = extra_key_slot(key)
+        if slot >= len(self._values):
+            self._values.extend([_ABSENT] * (slot + 1 - len(self._values)))
+        self._values[slot] = intern_value(value)
+
+    def __delitem__(self, key: str) -> None:
+        self[key]  # raises KeyError when absent
+        self._values[EXTRA_KEY_SLOTS[key]] = _ABSENT
+
+    def __iter__(self) -> Iterator[str]:
+        return (EXTRA_KEYS[slot] for slot, value in enumerate(self._values) if value is not _ABSENT)
+
+    def __len__(self) -> int:
+        return sum(value is not _ABSENT for value in self._values)
+
+    def __repr__(self) -> str:
+        return f"ExtraFields({dict(self)!r})"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return ExtraFields, (dict(self),)
+
+
+@dataclass(slots=True)
 class StrainRecord:
     strain_name: str
     breeder: str
@@ -111,9 +435,19 @@ class StrainRecord:
     pack_options: str
     product_url: str
     image_url: str
-    extra: Dict[str, str] = field(default_factory=dict)
+    extra: ExtraFields = field(default_factory=ExtraFields)
+
+    def __post_init__(self) -> None:
+        self.breeder = intern_value(self.breeder)
+        if not isinstance(self.extra, ExtraFields):
+            self.extra = ExtraFields(self.extra)
 
     def as_dict(self) -> Dict[str, Optional[str]]:
+        """Base fields, then extra fields in the shared schema's order rather than the order they were set.
+
+        Only dict and journal key order sees this: CSV columns are ordered by ``order_fields``
+        and the record store sorts its JSON keys.
+        """
         base = {
             "strain_name": self.strain_name,
             "breeder": self.breeder,
@@ -133,6 +467,12 @@ class StrainRecord:
 
         return base
 
+    def to_state(self) -> Dict[str, Any]:
+        """Constructor arguments as plain JSON types, the form the crawl journal stores."""
+        state = {name: getattr(self, name) for name in BASE_FIELDS}
+        state["extra"] = dict(self.extra)
+        return state
+
 
 def parse_price(value: Optional[str]) -> Optional[float]:
     if not value:
@@ -152,6 +492,7 @@ def extract_text(tag: Optional[Tag]) -> str:
     return tag.get_text(" ", strip=True) if tag else ""
 
 
+@stage("sanitize")
 def clean_pack_option(option_text: str) -> str:
     label = option_text.split("(", 1)[0].strip()
     numbers = re.findall(r"(\d+(?:\.\d+)?)", option_text.replace(",", ""))
@@ -161,6 +502,7 @@ def clean_pack_option(option_text: str) -> str:
     return label
 
 
+@lru_cache(maxsize=4096)
 def normalize_key(label: str, prefix: str = "") -> str:
     slug = re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
     if prefix:
@@ -168,6 +510,7 @@ def normalize_key(label: str, prefix: str = "") -> str:
     return slug or "value"
 
 
+@stage("sanitize")
 def sanitize_text(value: str) -> str:
     if not value:
         return ""
@@ -175,7 +518,22 @@ def sanitize_text(value: str) -> str:
     return cleaned.strip()
 
 
-def parse_item(item: Tag) -> StrainRecord:
+def set_parser_backend(name: str) -> None:
+    global PARSER_BACKEND
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {name!r}; expected one of {sorted(PARSER_BACKENDS)}")
+    PARSER_BACKEND = name
+
+
+def make_soup(html: str, backend: Optional[str] = None) -> BeautifulSoup:
+    backend = backend or PARSER_BACKEND
+    return BeautifulSoup(html, REFERENCE_PARSER_BACKEND if backend == "stream" else backend)
+
+
+@STAGE_SECONDS.timed(stage="parse_item")
+@stage("listing parse")
+def parse_item(item: Tag, site_root: Optional[str] = None) -> StrainRecord:
+    site_root = site_root or SITE_ROOT
     thumb = item.select_one(".yagendoo_vm_browse_thumb")
     title_attr = thumb.get("title") if thumb else ""
     title_text = title_attr.strip() if title_attr else extract_text(item.select_one(".yagendoo_vm_browse_product_title"))
@@ -201,10 +559,10 @@ def parse_item(item: Tag) -> StrainRecord:
     image_url_raw = ""
     if image:
         image_url_raw = image.get("data-src") or image.get("src") or ""
-    image_url = urljoin(SITE_ROOT, image_url_raw)
+    image_url = urljoin(site_root, image_url_raw)
 
     product_href = thumb.get("href") if thumb else ""
-    product_url = urljoin(SITE_ROOT, product_href)
+    product_url = urljoin(site_root, product_href)
 
     strain_name = sanitize_text(strain_name)
     breeder = sanitize_text(breeder)
@@ -223,8 +581,106 @@ def parse_item(item: Tag) -> StrainRecord:
     )
 
 
-def parse_detail_page(html: str) -> Dict[str, str]:
-    soup = BeautifulSoup(html, "html.parser")
+@STAGE_SECONDS.timed(stage="parse_listing_page")
+@stage("listing parse")
+def parse_listing_page(html: str, backend: Optional[str] = None, site_root: Optional[str] = None) -> List[StrainRecord]:
+    return [parse_item(item, site_root) for item in make_soup(html, backend).select(LISTING_ITEM_SELECTOR)]
+
+
+def find_last_offset(html: str, page_size: int = PAGE_SIZE) -> Optional[int]:
+    """Offset of the last listing page, from the result count, page counter or pagination links."""
+    text = TAG_RE.sub(" ", html)
+    match = RESULTS_COUNT_RE.search(text)
+    if match:
+        return max(0, (int(match.group(1)) - 1) // page_size * page_size)
+    match = PAGE_COUNT_RE.search(text)
+    if match:
+        return max(0, (int(match.group(1)) - 1) * page_size)
+    starts = [int(start) for start in PAGE_LINK_RE.findall(html)]
+    if starts:
+        # VirtueMart's SEF links count results from 1 ("results,31-60"), limitstart from 0
+        return max(starts) // page_size * page_size
+    return None
+
+
+@stage("detail parse")
+def parse_product_page(
+    url: str, html: str, backend: Optional[str] = None, price_fields: Optional[Dict[str, Any]] = None
+) -> Optional[StrainRecord]:
+    """Record for a product found outside the listing, with the listing fields read off its own page.
+
+    Returns None for pages that are not a product view (categories, articles).
+    Passing a ``price_fields`` dict fills it with just the price fields the page
+    actually shows, for updating a product already in the dataset; pack sizes are
+    left to the listing, which is where they are read from reliably.
+    """
+    soup = make_soup(html, backend)
+    view = soup.select_one(PRODUCT_VIEW_SELECTOR)
+    if view is None:
+        return None
+    for ignored in view.select(PRODUCT_IGNORED_SELECTOR):
+        ignored.decompose()
+
+    strain_name = extract_text(view.select_one("h1"))
+    breeder = ""
+    if " - " in strain_name:
+        strain_name, breeder = [part.strip() for part in strain_name.rsplit(" - ", 1)]
+
+    description = extract_text(view.select_one(".product-short-description"))
+    if not description:
+        meta = soup.select_one('meta[name="description"]')
+        description = meta.get("content", "") if meta else ""
+
+    current_price = parse_price(extract_text(view.select_one(".PricesalesPrice")))
+    base_price = view.select_one(".PricebasePriceWithTax")
+    original_price = parse_price(extract_text(base_price))
+    discount = None
+    if current_price is not None and original_price and original_price > current_price:
+        # VirtueMart shows the discount as an amount; the listing (and the dataset) have it in percent
+        discount = float(round((1 - current_price / original_price) * 100))
+    else:
+        original_price = None
+    if price_fields is not None and current_price is not None:
+        price_fields["current_price_gbp"] = current_price
+        if base_price is not None:
+            # Only a page that shows the base price says whether the product is still discounted
+            price_fields["original_price_gbp"] = original_price
+            price_fields["discount_percent"] = discount
+
+    pack_options = []
+    pack_select = view.select_one(".addtocart-area select")
+    if pack_select:
+        raw_options = [extract_text(option) for option in pack_select.select("option")]
+        pack_options = [clean_pack_option(text) for text in raw_options if text]
+
+    image = view.select_one(".main-image img")
+    image_url_raw = (image.get("data-src") or image.get("src") or "") if image else ""
+    if not image_url_raw:
+        meta = soup.select_one('meta[property="og:image"]')
+        image_url_raw = meta.get("content", "") if meta else ""
+
+    record = StrainRecord(
+        strain_name=sanitize_text(strain_name),
+        breeder=sanitize_text(breeder),
+        description=sanitize_text(description),
+        current_price_gbp=current_price,
+        original_price_gbp=original_price,
+        discount_percent=discount,
+        pack_options=" | ".join(sanitize_text(option) for option in pack_options),
+        product_url=url,
+        image_url=urljoin(SITE_ROOT, image_url_raw) if image_url_raw else "",
+    )
+    record.extra.update(parse_detail_page(html, backend))
+    return record
+
+
+@STAGE_SECONDS.timed(stage="parse_detail_page")
+@stage("detail parse")
+def parse_detail_page(html: str, backend: Optional[str] = None) -> Dict[str, str]:
+    if (backend or PARSER_BACKEND) == "stream":
+        return extract_detail_fields(html)
+
+    soup = make_soup(html, backend)
     detail: Dict[str, str] = {}
 
     for header in soup.select("h3"):
@@ -283,6 +739,10 @@ def parse_detail_page(html: str) -> Dict[str, str]:
             key = normalize_key(label, prefix="detail_")
             detail.setdefault(key, value)
 
+    return normalize_detail_fields(detail)
+
+
+def normalize_detail_fields(detail: Dict[str, str]) -> Dict[str, str]:
     normalized: Dict[str, str] = {}
     for key, value in detail.items():
         if not value:
@@ -297,188 +757,1663 @@ def parse_detail_page(html: str) -> Dict[str, str]:
     return normalized
 
 
-def fetch_page(scraper: cloudscraper.CloudScraper, offset: int) -> Optional[str]:
-    params = {"limit": PAGE_SIZE, "limitstart": offset}
-    for attempt in range(5):
+class _StreamNode:
+    __slots__ = ("name", "parent", "order", "texts", "collector", "items", "tds")
+
+    def __init__(self, name: str, parent: Optional["_StreamNode"], order: int) -> None:
+        self.name = name
+        self.parent = parent
+        self.order = order
+        self.texts: Optional[List[str]] = None  # stripped strings, as get_text(strip=True) would see them
+        self.collector: Optional[_SectionCollector] = None  # open section of a child h3's siblings
+        self.items: Optional[List[_StreamNode]] = None  # li descendants of a ul/ol we need
+        self.tds: Optional[List[_StreamNode]] = None  # td descendants of a tr inside a table
+
+    @property
+    def is_empty_element(self) -> bool:
+        return self.name in DetailPageExtractor.VOID_ELEMENTS
+
+    def text(self, separator: str = " ") -> str:
+        return separator.join(self.texts or ())
+
+
+class _SectionCollector:
+    __slots__ = ("order", "key", "parts")
+
+    def __init__(self, order: int, key: str) -> None:
+        self.order = order
+        self.key = key
+        self.parts: List[object] = []  # strings, or p/div/ul/ol nodes read once they are closed
+
+    def collected(self) -> List[str]:
+        collected: List[str] = []
+        for part in self.parts:
+            if isinstance(part, str):
+                collected.append(part)
+            elif part.items is not None:
+                collected.extend(text for text in (li.text() for li in part.items) if text)
+            else:
+                text = part.text()
+                if text:
+                    collected.append(text)
+        return collected
+
+
+# Entity names as html.parser reports them, without the semicolon
+HTML_ENTITIES = {name.rstrip(";"): character for name, character in html5.items()}
+DECIMAL_REFERENCE_RE = re.compile("^([0-9]+)(.*)")
+HEX_REFERENCE_RE = re.compile("^([0-9a-f]+)(.*)")
+
+
+def numeric_reference(number: int) -> str:
+    """The character a numeric reference stands for, by the HTML spec's rules (as bs4 resolves it)."""
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= number <= 0x9F:
+        # References to C1 controls are taken as Windows-1252 bytes where that code page defines them
         try:
-            response = scraper.get(BASE_URL, params=params, timeout=30)
-            if response.status_code == 200:
-                return response.text
-            logging.warning("Non-200 status (%s) for offset %s", response.status_code, offset)
-        except Exception as exc:  # noqa: BLE001
-            logging.warning("Request error for offset %s (attempt %s/5): %s", offset, attempt + 1, exc)
-        time.sleep(1 + attempt)
-    return None
+            return bytes([number]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(number)
+
+
+class _TreeEvents(HTMLParser):
+    """The stdlib tokenizer, sending a ``DetailPageExtractor`` the events bs4's html.parser builder sends a soup.
+
+    As in bs4: void elements close as soon as they open and a later end tag for one is
+    dropped, character and entity references become text resolved the same way, and
+    comments, declarations and processing instructions arrive as strings of their own class.
+    """
+
+    def __init__(self, extractor: "DetailPageExtractor") -> None:
+        super().__init__(convert_charrefs=False)
+        self.extractor = extractor
+        self.closed_void_elements: List[str] = []
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        self.handle_starttag(tag, attrs, close_void=False)
+        self.handle_endtag(tag, check_closed=False)
+
+    def handle_starttag(self, tag: str, attrs, close_void: bool = True) -> None:
+        node = self.extractor.handle_starttag(tag, None, None, attrs)
+        if close_void and node.is_empty_element:
+            self.handle_endtag(tag, check_closed=False)
+            self.closed_void_elements.append(tag)
+
+    def handle_endtag(self, tag: str, check_closed: bool = True) -> None:
+        if check_closed and tag in self.closed_void_elements:
+            self.closed_void_elements.remove(tag)
+        else:
+            self.extractor.handle_endtag(tag)
+
+    def handle_data(self, data: str) -> None:
+        self.extractor.handle_data(data)
+
+    def handle_charref(self, name: str) -> None:
+        digits, base, pattern = (name[1:], 16, HEX_REFERENCE_RE) if name[:1] in ("x", "X") else (name, 10, DECIMAL_REFERENCE_RE)
+        try:
+            number = int(digits, base)
+        except ValueError:
+            # An unterminated reference: the leading digits are the reference, the rest is text
+            match = pattern.search(digits)
+            if match:
+                self.handle_data(numeric_reference(int(match.group(1), base)) + match.group(2))
+            else:
+                self.handle_data(digits)
+        else:
+            self.handle_data(numeric_reference(number))
+
+    def handle_entityref(self, name: str) -> None:
+        self.handle_data(HTML_ENTITIES.get(name, f"&{name}"))
+
+    def _string(self, data: str, container: type) -> None:
+        self.extractor.endData()
+        self.extractor.handle_data(data)
+        self.extractor.endData(container)
+
+    def handle_comment(self, data: str) -> None:
+        self._string(data, Comment)
+
+    def handle_decl(self, decl: str) -> None:
+        self._string(decl[len("DOCTYPE ") :], Doctype)
+
+    def unknown_decl(self, data: str) -> None:
+        if data.upper().startswith("CDATA["):
+            self._string(data[len("CDATA[") :], CData)
+        else:
+            self._string(data, Declaration)
+
+    def handle_pi(self, data: str) -> None:
+        self._string(data, ProcessingInstruction)
+
+
+class DetailPageExtractor:
+    """Single-pass detail page extractor that never builds a DOM.
+
+    The stdlib html.parser tokenizer drives this object through the same tree-builder
+    callbacks bs4 gives a ``BeautifulSoup`` object, so tags open and close exactly as
+    they do in the reference tree. Only what ``parse_detail_page`` reads is kept:
+    h3 titles, the siblings after mapped h3 sections, the first list after a
+    "Strain Summary" heading and two-cell table rows. Sections, summary items and
+    rows whose keys are not in the field maps are dropped as soon as their key is known.
+    """
+
+    VOID_ELEMENTS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS or ())
+    STRING_CONTAINERS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+
+    def __init__(self) -> None:
+        self._root = _StreamNode("[document]", None, -1)
+        self._stack: List[_StreamNode] = [self._root]
+        self._open_counts: Dict[str, int] = {}
+        self._data: List[str] = []
+        self._order = 0
+        self._capturing: List[_StreamNode] = []
+        self._list_sinks: List[_StreamNode] = []
+        self._rows: List[_StreamNode] = []
+        self._containers: List[_StreamNode] = []
+        self._open_tables = 0
+        self._summary_waiters: List[_StreamNode] = []
+        self._summary_lists: Dict[int, _StreamNode] = {}
+        self._summary_headers: List[int] = []
+        self._sections: List[Tuple[int, str, str]] = []
+        self._detail_rows: List[Tuple[int, str, str]] = []
+
+    def feed(self, html: str) -> Dict[str, str]:
+        parser = _TreeEvents(self)
+        parser.feed(html)
+        parser.close()
+        self.endData()
+        while len(self._stack) > 1:
+            self._pop()
+        if self._root.collector:
+            self._close_section(self._root.collector)
+        return self._result()
+
+    # Tree-builder callbacks, as sent by _TreeEvents.
+    def handle_starttag(self, name: str, namespace, nsprefix, attrs, sourceline=None, sourcepos=None, **_):
+        self.endData()
+        parent = self._stack[-1]
+        node = _StreamNode(name, parent, self._order)
+        self._order += 1
+
+        if parent.collector:
+            if name == "h3":
+                self._close_section(parent.collector)
+                parent.collector = None
+            elif name in ("p", "div"):
+                self._capture(node)
+                parent.collector.parts.append(node)
+            elif name in ("ul", "ol"):
+                self._collect_items(node)
+                parent.collector.parts.append(node)
+
+        if name == "h3":
+            self._capture(node)
+            self._summary_waiters.append(node)
+        elif name == "ul" and self._summary_waiters:
+            # find_next("ul") from every pending heading lands on this list.
+            for header in self._summary_waiters:
+                self._summary_lists[header.order] = node
+            self._summary_waiters = []
+            if node.items is None:
+                self._collect_items(node)
+        elif name == "li" and self._list_sinks:
+            for sink in self._list_sinks:
+                sink.items.append(node)
+            self._capture(node)
+        elif name == "table":
+            self._open_tables += 1
+        elif name == "tr" and self._open_tables:
+            node.tds = []
+            self._rows.append(node)
+        elif name == "td" and self._rows:
+            for row in self._rows:
+                row.tds.append(node)
+            self._capture(node)
+
+        self._stack.append(node)
+        self._open_counts[name] = self._open_counts.get(name, 0) + 1
+        if name in self.STRING_CONTAINERS:
+            self._containers.append(node)
+        return node
+
+    def handle_endtag(self, name: str, nsprefix=None) -> None:
+        self.endData()
+        if not self._open_counts.get(name):
+            return
+        while len(self._stack) > 1:
+            if self._pop().name == name:
+                break
 
+    def handle_data(self, data: str) -> None:
+        self._data.append(data)
+
+    def endData(self, containerClass=None) -> None:
+        if not self._data:
+            return
+        text = "".join(self._data).strip()
+        self._data = []
+        if not text:
+            return
+        # get_text() only reads plain strings and CDATA; sibling scans take any string.
+        if containerClass is CData or (containerClass is None and not self._containers):
+            for node in self._capturing:
+                node.texts.append(text)
+        collector = self._stack[-1].collector
+        if collector:
+            collector.parts.append(text)
+
+    # Internal bookkeeping.
+    def _capture(self, node: _StreamNode) -> None:
+        node.texts = []
+        self._capturing.append(node)
+
+    def _collect_items(self, node: _StreamNode) -> None:
+        node.items = []
+        self._list_sinks.append(node)
+
+    def _pop(self) -> _StreamNode:
+        node = self._stack.pop()
+        self._open_counts[node.name] -= 1
+        if node.texts is not None:
+            self._capturing.remove(node)
+        if node.items is not None:
+            self._list_sinks.remove(node)
+        if self._containers and self._containers[-1] is node:
+            self._containers.pop()
+        if node.collector:
+            self._close_section(node.collector)
+            node.collector = None
+
+        if node.name == "h3":
+            self._close_header(node)
+        elif node.name == "table":
+            self._open_tables -= 1
+        elif node.tds is not None:
+            self._rows.remove(node)
+            self._close_row(node)
+        return node
+
+    def _close_header(self, header: _StreamNode) -> None:
+        title = header.text("")
+        key = normalize_key(title, prefix="section_")
+        if title and key in SECTION_FIELD_MAP:
+            header.parent.collector = _SectionCollector(header.order, key)
 
-def fetch_detail(scraper: cloudscraper.CloudScraper, url: str) -> Optional[str]:
-    if not url:
+        if title.lower().startswith("strain summary"):
+            # Its list may still be ahead of us; keep waiting for the next ul.
+            self._summary_headers.append(header.order)
+            return
+        self._summary_lists.pop(header.order, None)
+        if header in self._summary_waiters:
+            self._summary_waiters.remove(header)
+
+    def _close_section(self, collector: _SectionCollector) -> None:
+        collected = collector.collected()
+        if collected:
+            self._sections.append((collector.order, collector.key, "\n".join(collected)))
+
+    def _close_row(self, row: _StreamNode) -> None:
+        if len(row.tds) != 2:
+            return
+        label = row.tds[0].text().rstrip(":")
+        if len(label) < 2 or label.startswith("£"):
+            return
+        key = normalize_key(label, prefix="detail_")
+        if key not in DETAIL_FIELD_MAP:
+            return
+        value = row.tds[1].text()
+        if value:
+            self._detail_rows.append((row.order, key, value))
+
+    def _result(self) -> Dict[str, str]:
+        # Replay in the reference order: each h3's section then its summary, then table rows.
+        detail: Dict[str, str] = {}
+        sections: Dict[int, Tuple[str, str]] = {order: (key, value) for order, key, value in self._sections}
+        for order in sorted(set(sections) | set(self._summary_headers)):
+            if order in sections:
+                key, value = sections[order]
+                if key not in detail:
+                    detail[key] = value
+            ul = self._summary_lists.get(order)
+            if order not in self._summary_headers or ul is None:
+                continue
+            for text in (li.text() for li in ul.items):
+                if ":" in text:
+                    label, value = [part.strip() for part in text.split(":", 1)]
+                    if label and value:
+                        key = normalize_key(label, prefix="summary_")
+                        if key in SUMMARY_FIELD_MAP:
+                            detail.setdefault(key, value)
+        for _, key, value in sorted(self._detail_rows):
+            detail.setdefault(key, value)
+        return normalize_detail_fields(detail)
+
+
+def extract_detail_fields(html: str) -> Dict[str, str]:
+    return DetailPageExtractor().feed(html)
+
+
+def parse_page_fields(url: str, html: str, backend: str) -> List[Dict[str, Optional[str]]]:
+    if url.startswith(BASE_URL):
+        return [record.as_dict() for record in parse_listing_page(html, backend)]
+    return [parse_detail_page(html, backend)]
+
+
+def compare_parser_backends(
+    pages: Iterable[Tuple[str, str]],
+    candidate: str,
+    reference: str = REFERENCE_PARSER_BACKEND,
+) -> int:
+    """Parse saved pages with both backends and report every field that differs."""
+    checked = 0
+    mismatches = 0
+    for url, html in pages:
+        checked += 1
+        expected = parse_page_fields(url, html, reference)
+        actual = parse_page_fields(url, html, candidate)
+        if expected == actual:
+            continue
+        mismatches += 1
+        if len(expected) != len(actual):
+            logging.warning("%s: %s parsed %s items, %s parsed %s", url, reference, len(expected), candidate, len(actual))
+            continue
+        for position, (want, got) in enumerate(zip(expected, actual)):
+            for key in sorted(set(want) | set(got)):
+                if want.get(key) != got.get(key):
+                    logging.warning(
+                        "%s [item %s] %s: %s=%r %s=%r", url, position, key, reference, want.get(key), candidate, got.get(key)
+                    )
+    logging.info("Compared %s pages with %s and %s: %s differ", checked, reference, candidate, mismatches)
+    return mismatches
+
+
+def run_timed(func: Callable[[str], Any], html: str) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = func(html)
+    return result, time.perf_counter() - started
+
+
+class ParsePool:
+    """Parser processes fed raw HTML through a bounded queue.
+
+    ``submit`` blocks while ``queue_size`` pages are already waiting or being parsed,
+    so fetcher threads slow to the parsers' pace instead of piling pages up in memory.
+    Workers are spawned rather than forked because the crawl process is multi-threaded.
+    """
+
+    def __init__(self, processes: int, queue_size: int = PARSE_QUEUE_SIZE, backend: Optional[str] = None) -> None:
+        self.processes = processes
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=set_parser_backend,
+            initargs=(backend or PARSER_BACKEND,),
+        )
+
+    def submit(self, func: Callable[[str], Any], html: str) -> Future:
+        self._slots.acquire()
+        try:
+            timed = self._executor.submit(run_timed, func, html)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Metrics recorded inside a worker stay there, so the parse time comes back with the result
+        future: Future = Future()
+
+        def finish(done: Future) -> None:
+            self._slots.release()
+            try:
+                result, seconds = done.result()
+            except BaseException as exc:
+                future.set_exception(exc)
+                return
+            STAGE_SECONDS.observe(seconds, stage=func.__name__)
+            future.set_result(result)
+
+        timed.add_done_callback(finish)
+        return future
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+@register_source
+class SeedCitySource(CrawlSource):
+    """Seed City's VirtueMart catalogue, the listing of every product ``limit`` at a time."""
+
+    name = "seed-city"
+    page_size = PAGE_SIZE
+
+    def __init__(self, site_root: Optional[str] = None, **kwargs: Any) -> None:
+        # SITE_ROOT is read here rather than bound as a default so it can be pointed elsewhere
+        super().__init__(site_root or SITE_ROOT, **kwargs)
+
+    def listing_request(self, offset: int) -> Tuple[str, Dict[str, int]]:
+        return urljoin(self.site_root, LISTING_PATH), {"limit": self.page_size, "limitstart": offset}
+
+    def find_last_offset(self, html: str) -> Optional[int]:
+        return find_last_offset(html, self.page_size)
+
+    def parse_listing_page(self, html: str) -> List[StrainRecord]:
+        return parse_listing_page(html, site_root=self.site_root)
+
+    def parse_detail_page(self, html: str) -> Dict[str, str]:
+        return parse_detail_page(html)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
         return None
-    for attempt in range(5):
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def page_kind(url: str) -> str:
+    return "listing" if url == BASE_URL else "detail"
+
+
+@stage("fetch")
+def paced_get(
+    scraper: SessionPool,
+    url: str,
+    limiter: Optional[AdaptiveRateController],
+    params: Optional[Dict[str, int]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    kind: Optional[str] = None,
+):
+    kind = kind or page_kind(url)
+    if limiter:
+        limiter.acquire()
+    started = time.monotonic()
+    try:
+        response = scraper.get(url, params=params, headers=headers, timeout=30)
+    except Exception:
+        REQUESTS.inc(kind=kind, status="error")
+        if limiter:
+            limiter.observe(None, time.monotonic() - started)
+        raise
+    REQUEST_SECONDS.observe(time.monotonic() - started, kind=kind)
+    REQUESTS.inc(kind=kind, status=response.status_code)
+    RESPONSE_BYTES.inc(len(response.content), kind=kind)
+    if limiter:
+        limiter.observe(
+            response.status_code,
+            time.monotonic() - started,
+            parse_retry_after(response.headers.get("Retry-After")),
+        )
+    return response
+
+
+def cached_get(
+    scraper: SessionPool,
+    url: str,
+    limiter: Optional[AdaptiveRateController],
+    cache: Optional[ResponseCache],
+    params: Optional[Dict[str, int]] = None,
+    kind: Optional[str] = None,
+) -> Tuple[int, str]:
+    headers = cache.conditional_headers(url, params) if cache else None
+    response = paced_get(scraper, url, limiter, params, headers, kind)
+    if cache and response.status_code == 304:
+        body = cache.revalidate(url, params)
+        if body is not None:
+            return 200, body
+        # The cached body went missing after the headers were read; the site is fine, so ask again unconditionally
+        response = paced_get(scraper, url, limiter, params, None, kind)
+    if cache and response.status_code == 200:
+        cache.store(url, params, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return response.status_code, response.text
+
+
+def fetch_with_retry(
+    scraper: SessionPool,
+    url: str,
+    limiter: Optional[AdaptiveRateController],
+    cache: Optional[ResponseCache],
+    retry: RetryPolicy,
+    params: Optional[Dict[str, int]] = None,
+    what: Optional[str] = None,
+    mark_dead: bool = False,
+    kind: Optional[str] = None,
+) -> Optional[str]:
+    """GET ``url`` under ``retry``; returns the body, or None once the policy gives up.
+
+    Permanent failures (404, 410, ...) are not retried and, with ``mark_dead``, go on the
+    dead-URL list. Throttled and transient ones are retried after a jittered exponential
+    backoff while the retry budget lasts. Every attempt first waits out an open circuit breaker.
+    """
+    kind = kind or page_kind(url)
+    what = what or url
+    for attempt in range(1, retry.max_attempts + 1):
+        waited = retry.breaker.wait()
+        if waited:
+            SLEEP_SECONDS.inc(waited, reason="circuit_open")
+        status: Optional[int] = None
         try:
-            response = scraper.get(url, timeout=30)
-            if response.status_code == 200:
-                return response.text
-            logging.warning("Detail request returned %s for %s", response.status_code, url)
+            status, text = cached_get(scraper, url, limiter, cache, params, kind)
+            failure = None if status == 200 else classify(status)
         except Exception as exc:  # noqa: BLE001
-            logging.warning("Detail fetch error (%s/5) for %s: %s", attempt + 1, url, exc)
-        time.sleep(1 + attempt)
+            failure = TRANSIENT
+            logging.warning("Request error for %s (attempt %s/%s): %s", what, attempt, retry.max_attempts, exc)
+        retry.record(attempt, failure)
+        if failure is None:
+            if mark_dead:
+                retry.dead_urls.discard(url)
+            return text
+
+        FAILURES.inc(kind=kind, failure=failure)
+        if status is not None:
+            logging.warning("Status %s (%s) for %s (attempt %s/%s)", status, failure, what, attempt, retry.max_attempts)
+        if failure == PERMANENT:
+            if mark_dead:
+                retry.dead_urls.add(url, status)
+            return None
+        if not retry.should_retry(failure, attempt):
+            if attempt < retry.max_attempts:
+                logging.warning("Retry budget exhausted; giving up on %s", what)
+            return None
+        RETRIES.inc(kind=kind)
+        delay = backoff_delay(attempt)
+        SLEEP_SECONDS.inc(delay, reason="retry_backoff")
+        time.sleep(delay)
     return None
 
 
-def collect_records(max_records: Optional[int] = None, existing_urls: Optional[Set[str]] = None) -> List[StrainRecord]:
-    scraper = cloudscraper.create_scraper()
+@STAGE_SECONDS.timed(stage="fetch_page")
+@stage("fetch")
+def fetch_page(
+    scraper: SessionPool,
+    offset: int,
+    limiter: Optional[AdaptiveRateController] = None,
+    cache: Optional[ResponseCache] = None,
+    retry: Optional[RetryPolicy] = None,
+    source: Optional[CrawlSource] = None,
+) -> Optional[str]:
+    source = source or SeedCitySource()
+    url, params = source.listing_request(offset)
+    if cache:
+        cached = cache.lookup(url, params)
+        CACHE_LOOKUPS.inc(kind="listing", result="miss" if cached is None else "hit")
+        if cached is not None or cache.offline:
+            return cached
+    what = f"{source.name} offset {offset}"
+    return fetch_with_retry(scraper, url, limiter, cache, retry or RetryPolicy(), params, what, kind="listing")
+
+
+@STAGE_SECONDS.timed(stage="fetch_detail")
+@stage("fetch")
+def fetch_detail(
+    scraper: SessionPool,
+    url: str,
+    limiter: Optional[AdaptiveRateController] = None,
+    cache: Optional[ResponseCache] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> Optional[str]:
+    if not url:
+        return None
+    if cache:
+        cached = cache.lookup(url)
+        CACHE_LOOKUPS.inc(kind="detail", result="miss" if cached is None else "hit")
+        if cached is not None or cache.offline:
+            return cached
+    retry = retry or RetryPolicy()
+    if url in retry.dead_urls:
+        DEAD_URLS_SKIPPED.inc()
+        logging.info("Skipping %s, which is on the dead-URL list", url)
+        return None
+    return fetch_with_retry(scraper, url, limiter, cache, retry, mark_dead=True)
+
+
+def fetch_details(
+    scraper: SessionPool,
+    records: List[StrainRecord],
+    limiter: Optional[AdaptiveRateController],
+    executor: Optional[Executor] = None,
+    cache: Optional[ResponseCache] = None,
+    parse_pool: Optional[ParsePool] = None,
+    retry: Optional[RetryPolicy] = None,
+    source: Optional[CrawlSource] = None,
+) -> None:
+    targets = [record for record in records if record.product_url]
+    parse = source.parse_detail_page if source else parse_detail_page
+
+    def load(record: StrainRecord) -> Union[None, str, Future]:
+        logging.info(f"Fetching details for: {record.strain_name}")
+        detail_html = fetch_detail(scraper, record.product_url, limiter, cache, retry)
+        if detail_html and parse_pool:
+            # Hand the page off and go fetch the next one; this blocks only when the parse queue is full.
+            return parse_pool.submit(parse, detail_html)
+        return detail_html
+
+    # executor.map yields in submission order, so records keep their listing order.
+    pages = executor.map(load, targets) if executor else map(load, targets)
+    for record, detail_page in zip(targets, pages):
+        if detail_page:
+            parsed_details = detail_page.result() if isinstance(detail_page, Future) else parse(detail_page)
+            record.extra.update(parsed_details)
+            logging.info(f"Found {len(parsed_details)} detail fields for: {record.strain_name}")
+        else:
+            logging.warning(f"Failed to fetch details for: {record.strain_name}")
+
+
+@STAGE_SECONDS.timed(stage="read_sitemap")
+def read_sitemap(
+    scraper: SessionPool,
+    limiter: Optional[AdaptiveRateController] = None,
+    location: Optional[str] = None,
+) -> Optional[Dict[str, Optional[str]]]:
+    """Catalogue pages and their lastmod from the site's sitemaps, or None when there are none to read.
+
+    Without a ``location``, the sitemaps announced in robots.txt are read, or else /sitemap.xml.
+    """
+
+    def get(url: str, stream: bool = False):
+        if limiter:
+            limiter.acquire()
+        started = time.monotonic()
+        response = scraper.get(url, stream=stream, timeout=SITEMAP_TIMEOUT_SEC)
+        REQUEST_SECONDS.observe(time.monotonic() - started, kind="sitemap")
+        REQUESTS.inc(kind="sitemap", status=response.status_code)
+        if limiter:
+            limiter.observe(response.status_code, time.monotonic() - started, parse_retry_after(response.headers.get("Retry-After")))
+        return response
+
+    def fetch(url: str) -> Iterator[bytes]:
+        logging.info("Reading sitemap %s", url)
+        with get(url, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(SITEMAP_CHUNK_BYTES):
+                RESPONSE_BYTES.inc(len(chunk), kind="sitemap")
+                yield chunk
+
+    prefix = urljoin(SITE_ROOT, CATALOGUE_PATH)
+    try:
+        locations = [location] if location else []
+        if not locations:
+            robots = get(urljoin(SITE_ROOT, "/robots.txt"))
+            if robots.status_code == 200:
+                locations = robots_sitemaps(robots.text)
+        entries = {
+            url: lastmod
+            for url, lastmod in iter_sitemaps(fetch, locations or [urljoin(SITE_ROOT, "/sitemap.xml")])
+            if url.startswith(prefix) and url != BASE_URL
+        }
+    except Exception as exc:  # noqa: BLE001
+        logging.warning("Could not read the sitemap, crawling the listing pages instead: %s", exc)
+        return None
+    if not entries:
+        logging.warning("The sitemap lists no catalogue pages; crawling the listing pages instead.")
+        return None
+    logging.info("Sitemap lists %s catalogue pages", len(entries))
+    return entries
+
+
+def discover_products(
+    scraper: SessionPool,
+    sitemap: SitemapSnapshot,
+    entries: Dict[str, Optional[str]],
+    existing_urls: Set[str],
+    limiter: Optional[AdaptiveRateController],
+    cache: Optional[ResponseCache] = None,
+    retry: Optional[RetryPolicy] = None,
+    workers: int = DETAIL_WORKERS,
+    max_records: Optional[int] = None,
+) -> Tuple[List[StrainRecord], Dict[str, Dict[str, Any]], Set[str]]:
+    """Fetch just the pages the sitemap reports as new or changed since ``sitemap`` was saved.
+
+    Returns the records of new products, updates (the price fields their pages show and
+    detail fields) for changed ones, and the pages that could not be fetched, which stay pending.
+    Pages that turn out not to be products are passed over.
+    """
+    retry = retry or RetryPolicy()
+    new, changed = sitemap.diff(entries)
+    new = [url for url in new if url not in existing_urls]
+    changed = [url for url in changed if url in existing_urls]
+    logging.info("Sitemap: %s new and %s changed catalogue pages since the last crawl", len(new), len(changed))
+
+    def load(url: str) -> Optional[str]:
+        if url in retry.dead_urls:
+            DEAD_URLS_SKIPPED.inc()
+            return None
+        logging.info("Fetching %s", url)
+        # Not fetch_detail: a changed page must be revalidated even while its cached copy is fresh
+        return fetch_with_retry(scraper, url, limiter, cache, retry, mark_dead=True)
+
     records: List[StrainRecord] = []
+    updates: Dict[str, Dict[str, Any]] = {}
+    pending: Set[str] = set()
+    targets = new + changed
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detail") as executor:
+        for url, html in zip(targets, executor.map(load, targets)):
+            if html is None:
+                if url not in retry.dead_urls:
+                    pending.add(url)
+                continue
+            price_fields: Dict[str, Any] = {}
+            record = parse_product_page(url, html, price_fields=price_fields)
+            if record is None or not is_valid_record(record):
+                continue
+            if url in existing_urls:
+                # Fields the page does not show keep the values the listing gave them
+                updates[url] = {**price_fields, "extra": dict(record.extra)}
+            elif max_records and len(records) >= max_records:
+                pending.add(url)
+            else:
+                records.append(record)
+    logging.info("Sitemap discovery: %s new products, %s changed, %s pages pending", len(records), len(updates), len(pending))
+    return records, updates, pending
+
+
+def iter_listing_pages(
+    scraper: SessionPool,
+    offset: int,
+    first_html: Optional[str],
+    last_offset: Optional[int],
+    limiter: Optional[AdaptiveRateController],
+    cache: Optional[ResponseCache] = None,
+    executor: Optional[Executor] = None,
+    prefetch: int = DETAIL_WORKERS,
+    retry: Optional[RetryPolicy] = None,
+    source: Optional[CrawlSource] = None,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    """Yield ``(offset, html)`` for each listing page in order, starting with the one already fetched.
+
+    With a known ``last_offset`` the remaining pages are fetched concurrently, at most
+    ``prefetch`` ahead of the consumer. Otherwise pages are fetched one at a time
+    until the caller stops on empty pages or ``MAX_PROBE_OFFSET`` is passed.
+    """
+    source = source or SeedCitySource()
+    page_size = source.page_size
+    yield offset, first_html
+    if last_offset is None:
+        while True:
+            offset += page_size
+            if offset > MAX_PROBE_OFFSET:
+                logging.warning("Reached offset safeguard (%s). Ending crawl; the catalogue may be truncated.", MAX_PROBE_OFFSET)
+                return
+            logging.info("Fetching products %s - %s", offset + 1, offset + page_size)
+            yield offset, fetch_page(scraper, offset, limiter, cache, retry, source)
+
+    offsets = iter(range(offset + page_size, last_offset + 1, page_size))
+    if not executor:
+        for offset in offsets:
+            logging.info("Fetching products %s - %s", offset + 1, offset + page_size)
+            yield offset, fetch_page(scraper, offset, limiter, cache, retry, source)
+        return
+
+    def submit(page_offset: int) -> Tuple[int, Future]:
+        logging.info("Fetching products %s - %s", page_offset + 1, page_offset + page_size)
+        return page_offset, executor.submit(fetch_page, scraper, page_offset, limiter, cache, retry, source)
+
+    pending: Deque[Tuple[int, Future]] = deque(submit(page_offset) for page_offset in itertools.islice(offsets, prefetch))
+    try:
+        while pending:
+            page_offset, future = pending.popleft()
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                pending.append(submit(next_offset))
+            yield page_offset, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def iter_records(
+    max_records: Optional[int] = None,
+    existing_urls: Optional[Set[str]] = None,
+    workers: int = DETAIL_WORKERS,
+    limiter: Optional[AdaptiveRateController] = None,
+    cache: Optional[ResponseCache] = None,
+    journal: Optional[CrawlJournal] = None,
+    parse_pool: Optional[ParsePool] = None,
+    price_updates: Optional[Dict[str, Dict[str, Any]]] = None,
+    store: Optional[RecordStore] = None,
+    retry: Optional[RetryPolicy] = None,
+    scraper: Optional[SessionPool] = None,
+    source: Optional[CrawlSource] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[StrainRecord]:
+    """Crawl the catalogue of ``source`` (Seed City by default), yielding each new record once its listing page is done.
+
+    With a journal, every finished listing page is committed to it before its
+    records are yielded, and the crawl resumes from the journal's last committed offset.
+    Passing a ``price_updates`` dict fills it with the current ``LISTING_PRICE_FIELDS``
+    of every product in ``existing_urls`` seen on a listing page, keyed by URL.
+    With a store, each page's new records, price updates and sightings of existing
+    products are upserted in one transaction.
+    Page and detail fetches run on ``executor`` when one is passed (it is shut down
+    afterwards), else on a thread pool of ``workers``.
+    """
+    if journal and price_updates is not None:
+        price_updates.update(journal.updates)
+    if journal and journal.complete:
+        logging.info("Journal %s already holds a complete crawl.", journal.path)
+        return
+
+    collected = 0
     seen_urls: Set[str] = existing_urls.copy() if existing_urls else set()
     empty_pages = 0
     offset = 0
+    previous = 0
+    if journal:
+        seen_urls.update(journal.urls)
+        offset = journal.next_offset
+        previous = journal.record_count
+        if max_records and previous >= max_records:
+            journal.mark_complete()
+            return
+
+    source = source or SeedCitySource()
+    page_size = source.page_size
+    owns_scraper = scraper is None
+    if scraper is None:
+        # One session per worker thread, all sharing a single Cloudflare clearance
+        scraper = SessionPool(workers, source.site_root)
+    limiter = limiter or AdaptiveRateController()
+    retry = retry or RetryPolicy()
+    if executor is None and workers > 1:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detail")
 
-    while True:
-        logging.info("Fetching products %s - %s", offset + 1, offset + PAGE_SIZE)
-        html = fetch_page(scraper, offset)
-        if not html:
-            empty_pages += 1
-            if empty_pages >= MAX_EMPTY_PAGES:
-                logging.info("Stopping after %s consecutive empty pages.", empty_pages)
-                break
-            offset += PAGE_SIZE
-            continue
-
-        soup = BeautifulSoup(html, "html.parser")
-        items = soup.select("div.yagendoo_vm_browse_element")
-        if not items:
-            empty_pages += 1
-            logging.info("No items found on page starting at %s.", offset)
-            if empty_pages >= MAX_EMPTY_PAGES:
-                logging.info("Reached maximum consecutive empty pages. Ending crawl.")
-                break
-            offset += PAGE_SIZE
-            time.sleep(REQUEST_PAUSE_SEC)
-            continue
-
-        empty_pages = 0
+    try:
+        logging.info("Fetching products %s - %s", offset + 1, offset + page_size)
+        first_html = fetch_page(scraper, offset, limiter, cache, retry, source)
+        last_offset = source.find_last_offset(first_html) if first_html else None
+        if last_offset is None:
+            logging.info("Catalogue size not found on the listing page; probing for its end.")
+        else:
+            logging.info("Catalogue ends at offset %s: %s listing pages to fetch", last_offset, max(0, last_offset - offset) // page_size + 1)
+
+        pages = iter_listing_pages(scraper, offset, first_html, last_offset, limiter, cache, executor, workers, retry, source)
+        for offset, html in pages:
+            if not html:
+                empty_pages += 1
+                if last_offset is None and empty_pages >= MAX_EMPTY_PAGES:
+                    logging.info("Stopping after %s consecutive empty pages.", empty_pages)
+                    break
+                continue
 
-        for item in items:
-            record = parse_item(item)
-            if record.product_url in seen_urls:
+            if parse_pool:
+                items = parse_pool.submit(source.parse_listing_page, html).result()
+            else:
+                items = source.parse_listing_page(html)
+            if not items:
+                empty_pages += 1
+                logging.info("No items found on page starting at %s.", offset)
+                if last_offset is None and empty_pages >= MAX_EMPTY_PAGES:
+                    logging.info("Reached maximum consecutive empty pages. Ending crawl.")
+                    break
                 continue
-            seen_urls.add(record.product_url)
-
-            if FETCH_DETAIL_PAGES and record.product_url:
-                logging.info(f"Fetching details for: {record.strain_name}")
-                detail_html = fetch_detail(scraper, record.product_url)
-                if detail_html:
-                    parsed_details = parse_detail_page(detail_html)
-                    record.extra.update(parsed_details)
-                    logging.info(f"Found {len(parsed_details)} detail fields for: {record.strain_name}")
+
+            empty_pages = 0
+
+            # Dedupe and validate in listing order first; only the survivors need detail pages.
+            page_records: List[StrainRecord] = []
+            page_updates: Dict[str, Dict[str, Any]] = {}
+            page_seen: List[str] = []
+            for record in items:
+                if existing_urls and record.product_url in existing_urls:
+                    page_seen.append(record.product_url)
+                if (
+                    price_updates is not None
+                    and existing_urls
+                    and record.product_url in existing_urls
+                    and record.product_url not in price_updates
+                    and record.product_url not in page_updates
+                ):
+                    page_updates[record.product_url] = {name: getattr(record, name) for name in LISTING_PRICE_FIELDS}
+                if record.product_url in seen_urls:
+                    continue
+                seen_urls.add(record.product_url)
+
+                if is_valid_record(record):
+                    page_records.append(record)
+                    if max_records and previous + collected + len(page_records) >= max_records:
+                        break
+
+            if FETCH_DETAIL_PAGES:
+                fetch_details(scraper, page_records, limiter, executor, cache, parse_pool, retry, source)
+            collected += len(page_records)
+            RECORDS_TOTAL.inc(len(page_records), event="new")
+            if price_updates is not None:
+                price_updates.update(page_updates)
+
+            # Check if we've reached the maximum number of records
+            reached_max = bool(max_records) and previous + collected >= max_records
+            if journal:
+                rows = [record.to_state() for record in page_records]
+                if reached_max:
+                    journal.mark_complete(rows, page_updates)
                 else:
-                    logging.warning(f"Failed to fetch details for: {record.strain_name}")
-                time.sleep(DETAIL_REQUEST_PAUSE_SEC)
+                    journal.commit_page(offset, offset + page_size, rows, page_updates)
+            if store is not None:
+                store.upsert((record.to_state() for record in page_records), page_seen, page_updates)
+            yield from page_records
+            if reached_max:
+                logging.info("Reached maximum records limit (%s). Ending crawl.", max_records)
+                pages.close()
+                return
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if owns_scraper:
+            close_sessions(scraper)
+
+    if journal:
+        journal.mark_complete()
+
+
+def close_sessions(scraper: SessionPool) -> None:
+    if scraper.solves:
+        logging.info("Cloudflare clearance solved %s times, %s challenged responses", scraper.solves, scraper.challenges)
+    scraper.close()
+
+
+def collect_records(
+    max_records: Optional[int] = None,
+    existing_urls: Optional[Set[str]] = None,
+    workers: int = DETAIL_WORKERS,
+    limiter: Optional[AdaptiveRateController] = None,
+    cache: Optional[ResponseCache] = None,
+    journal: Optional[CrawlJournal] = None,
+    parse_pool: Optional[ParsePool] = None,
+    price_updates: Optional[Dict[str, Dict[str, Any]]] = None,
+    store: Optional[RecordStore] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> List[StrainRecord]:
+    return list(iter_records(max_records, existing_urls, workers, limiter, cache, journal, parse_pool, price_updates, store, retry))
+
+
+def iter_existing_records(path: Path) -> Iterator[StrainRecord]:
+    files = dataset_files(path)
+    if not files:
+        return
 
-            if is_valid_record(record):
-                records.append(record)
+    count = 0
+    try:
+        for csv_path in files:
+            with csv_path.open("r", newline="", encoding="utf-8") as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    # Reconstruct StrainRecord from CSV row
+                    extra = {}
+                    for key, value in row.items():
+                        if key not in BASE_FIELDS:
+                            extra[key] = value
+                
+                    record = StrainRecord(
+                        strain_name=row.get("strain_name", ""),
+                        breeder=row.get("breeder", ""),
+                        description=row.get("description", ""),
+                        current_price_gbp=float(row["current_price_gbp"]) if row.get("current_price_gbp") else None,
+                        original_price_gbp=float(row["original_price_gbp"]) if row.get("original_price_gbp") else None,
+                        discount_percent=float(row["discount_percent"]) if row.get("discount_percent") else None,
+                        pack_options=row.get("pack_options", ""),
+                        product_url=row.get("product_url", ""),
+                        image_url=row.get("image_url", ""),
+                        extra=extra
+                    )
+                    count += 1
+                    yield record
+        logging.info("Loaded %s existing records from %s", count, path.resolve())
+    except Exception as exc:
+        logging.warning("Failed to read existing CSV after %s records: %s", count, exc)
 
-                # Check if we've reached the maximum number of records
-                if max_records and len(records) >= max_records:
-                    logging.info("Reached maximum records limit (%s). Ending crawl.", max_records)
-                    return records
 
-        offset += PAGE_SIZE
-        time.sleep(REQUEST_PAUSE_SEC)
+def apply_price_updates(
+    records: Iterable[StrainRecord], updates: Dict[str, Dict[str, Any]]
+) -> Iterator[StrainRecord]:
+    changed = 0
+    for record in records:
+        fields = updates.get(record.product_url)
+        if fields:
+            extra = fields.get("extra") or {}
+            if any(getattr(record, name) != value for name, value in fields.items() if name != "extra") or any(
+                record.extra.get(key) != value for key, value in extra.items()
+            ):
+                changed += 1
+            for name, value in fields.items():
+                if name != "extra":
+                    setattr(record, name, value)
+            # Detail fields, from products the sitemap reported as changed
+            record.extra.update(extra)
+        yield record
+    logging.info("Refreshed existing products: %s of %s updated products changed", changed, len(updates))
 
-        if offset > 10000:
-            logging.info("Reached offset safeguard (10000). Ending crawl.")
-            break
 
-    return records
+def read_existing_records(path: Path) -> List[StrainRecord]:
+    return list(iter_existing_records(path))
 
 
-def read_existing_records(path: Path) -> List[StrainRecord]:
-    if not path.exists():
-        return []
-    
-    records = []
-    try:
-        with path.open("r", newline="", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                # Reconstruct StrainRecord from CSV row
-                extra = {}
-                base_fields = [
-                    "strain_name", "breeder", "description", "current_price_gbp", 
-                    "original_price_gbp", "discount_percent", "pack_options", 
-                    "product_url", "image_url"
-                ]
-                for key, value in row.items():
-                    if key not in base_fields:
-                        extra[key] = value
-                
-                record = StrainRecord(
-                    strain_name=row.get("strain_name", ""),
-                    breeder=row.get("breeder", ""),
-                    description=row.get("description", ""),
-                    current_price_gbp=float(row["current_price_gbp"]) if row.get("current_price_gbp") else None,
-                    original_price_gbp=float(row["original_price_gbp"]) if row.get("original_price_gbp") else None,
-                    discount_percent=float(row["discount_percent"]) if row.get("discount_percent") else None,
-                    pack_options=row.get("pack_options", ""),
-                    product_url=row.get("product_url", ""),
-                    image_url=row.get("image_url", ""),
-                    extra=extra
-                )
-                records.append(record)
-        logging.info("Loaded %s existing records from %s", len(records), path.resolve())
-    except Exception as exc:
-        logging.warning("Failed to read existing CSV: %s", exc)
-        return []
-    
-    return records
+def read_existing_urls(path: Path) -> Set[str]:
+    # Served from the sidecar index the writers keep next to the dataset; rebuilt if the CSV changed under it
+    return load_urls(path)
+
 
+def order_fields(columns: Iterable[str]) -> List[str]:
+    extra_fields_set = set(columns) - set(BASE_FIELDS)
+    preferred_extras = [field for field in EXTRA_FIELD_ORDER if field in extra_fields_set]
+    fallback_extras = sorted(extra_fields_set - set(preferred_extras))
+    return BASE_FIELDS + preferred_extras + fallback_extras
+
+
+class StreamingCsvWriter:
+    """CSV writer that keeps only the column list in memory.
+
+    Rows are spooled next to the destination as they arrive, with columns in
+    first-seen order; an extra key that shows up mid-stream simply becomes a new
+    spool column. ``close()`` orders the final header with ``order_fields`` and
+    copies the spool into place row by row, then atomically replaces ``path``.
+    """
+
+    def __init__(self, path: Path, stats: Optional[DatasetStats] = None) -> None:
+        self.path = path
+        self.count = 0
+        self.stats = stats
+        self._columns: List[str] = list(BASE_FIELDS)
+        self._positions: Dict[str, int] = {name: index for index, name in enumerate(self._columns)}
+        self._spool_path = path.with_name(f"{path.name}.spool")
+        self._spool = self._spool_path.open("w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._spool)
+
+    def write(self, record: StrainRecord) -> None:
+        row = record.as_dict()
+        if self.stats:
+            self.stats.add(row)
+        for key in row:
+            if key not in self._positions:
+                self._positions[key] = len(self._columns)
+                self._columns.append(key)
+        values: List[object] = [""] * len(self._columns)
+        for key, value in row.items():
+            values[self._positions[key]] = "" if value is None else value
+        self._writer.writerow(values)
+        self.count += 1
+
+    def abort(self) -> None:
+        self._spool.close()
+        self._spool_path.unlink(missing_ok=True)
+
+    def close(self) -> int:
+        self._spool.close()
+        if not self.count:
+            self._spool_path.unlink(missing_ok=True)
+            return 0
+
+        ordered_fields = order_fields(self._columns)
+        positions = [self._positions[name] for name in ordered_fields]
+        url_position = self._positions["product_url"]
+        width = len(self._columns)
+        partial_path = self.path.with_name(f"{self.path.name}.partial")
+        url_index = IndexWriter(self.path)
+        try:
+            with self._spool_path.open("r", newline="", encoding="utf-8") as spool, partial_path.open("wb") as csvfile:
+                output = CountingWriter(csvfile)
+                writer = csv.writer(output)
+                writer.writerow(ordered_fields)
+                for row in csv.reader(spool):
+                    # Rows spooled before a column first appeared are shorter than the final width.
+                    row.extend([""] * (width - len(row)))
+                    url_index.add(0, output.position, row[url_position])
+                    writer.writerow([row[index] for index in positions])
+            os.replace(partial_path, self.path)
+        except BaseException:
+            url_index.abort()
+            raise
+        finally:
+            self._spool_path.unlink(missing_ok=True)
+            partial_path.unlink(missing_ok=True)
+        url_index.commit()
+        return self.count
+
+
+class ShardedCsvWriter(StreamingCsvWriter):
+    """StreamingCsvWriter whose final pass splits the rows into shard CSVs under ``path``.
+
+    Rows go to shard ``part-NNNNN.csv`` by position (``shard_rows`` per shard) or to
+    ``<shard_by>-<slug>.csv`` by the value of the ``shard_by`` column. Values whose slugs
+    coincide get a hash of the value appended, so each keeps a shard of its own. Sharding
+    by a column the rows do not have, or with more than ``MAX_SHARDS`` distinct values,
+    raises ValueError before any shard is written. Every shard has the full header. A
+    shard whose content is unchanged on disk is left untouched, so it keeps its file,
+    mtime and hash; shards no longer in the layout are removed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        shard_rows: Optional[int] = SHARD_ROWS,
+        shard_by: Optional[str] = None,
+        stats: Optional[DatasetStats] = None,
+    ) -> None:
+        super().__init__(path, stats)
+        self.shard_rows = shard_rows
+        self.shard_by = shard_by
+        self.rewritten = 0
+
+    def _value_names(self) -> Dict[str, str]:
+        """Shard file name for each distinct value of the ``shard_by`` column, from a first pass over the spool."""
+        position = self._positions.get(self.shard_by)
+        if position is None:
+            raise ValueError(f"Cannot shard by {self.shard_by!r}: the rows have no such column")
+        values: Set[str] = set()
+        with self._spool_path.open("r", newline="", encoding="utf-8") as spool:
+            for row in csv.reader(spool):
+                values.add(row[position] if position < len(row) else "")
+                if len(values) > MAX_SHARDS:
+                    raise ValueError(f"Cannot shard by {self.shard_by!r}: it has more than {MAX_SHARDS} distinct values")
+        slugs = {value: normalize_key(value) if value else "none" for value in values}
+        uses = Counter(slugs.values())
+        prefix = normalize_key(self.shard_by)
+        names = {}
+        for value, slug in slugs.items():
+            if uses[slug] > 1:
+                slug = f"{slug}-{hashlib.sha1(value.encode('utf-8')).hexdigest()[:8]}"
+            names[value] = f"{prefix}-{slug}.csv"
+        return names
+
+    def _shard_name(self, number: int, row: List[str], value_names: Optional[Dict[str, str]]) -> str:
+        if value_names is not None:
+            return value_names[row[self._positions[self.shard_by]]]
+        return f"part-{number // self.shard_rows:05d}.csv"
+
+    def close(self) -> int:
+        self._spool.close()
+        if not self.count:
+            self._spool_path.unlink(missing_ok=True)
+            return 0
+
+        ordered_fields = order_fields(self._columns)
+        positions = [self._positions[name] for name in ordered_fields]
+        url_position = self._positions["product_url"]
+        width = len(self._columns)
+        self.path.mkdir(parents=True, exist_ok=True)
+        previous = {shard["path"] for shard in (read_manifest(self.path) or {}).get("shards", [])}
+        shards: Dict[str, Dict[str, Any]] = {}
+        url_index = IndexWriter(self.path)
+        try:
+            value_names = self._value_names() if self.shard_by else None
+            with self._spool_path.open("r", newline="", encoding="utf-8") as spool:
+                for number, row in enumerate(csv.reader(spool)):
+                    row.extend([""] * (width - len(row)))
+                    name = self._shard_name(number, row, value_names)
+                    shard = shards.get(name)
+                    if shard is None:
+                        partial_path = self.path / f"{name}.partial"
+                        handle = partial_path.open("wb")
+                        output = CountingWriter(handle)
+                        shard = shards[name] = {
+                            "number": len(shards),
+                            "partial": partial_path,
+                            "handle": handle,
+                            "output": output,
+                            "writer": csv.writer(output),
+                            "rows": 0,
+                        }
+                        shard["writer"].writerow(ordered_fields)
+                    url_index.add(shard["number"], shard["output"].position, row[url_position])
+                    shard["writer"].writerow([row[index] for index in positions])
+                    shard["rows"] += 1
+            for shard in shards.values():
+                shard["handle"].close()
+
+            entries = []
+            for name, shard in shards.items():
+                digest = file_sha256(shard["partial"])
+                target = self.path / name
+                if target.exists() and target.stat().st_size == shard["partial"].stat().st_size and file_sha256(target) == digest:
+                    shard["partial"].unlink()
+                else:
+                    os.replace(shard["partial"], target)
+                    self.rewritten += 1
+                entries.append({"path": name, "rows": shard["rows"], "sha256": digest, "bytes": target.stat().st_size})
+            for stale in previous - set(shards):
+                (self.path / stale).unlink(missing_ok=True)
+            write_manifest(
+                self.path,
+                {
+                    "shard_by": self.shard_by or "rows",
+                    "shard_rows": None if self.shard_by else self.shard_rows,
+                    "num_rows": self.count,
+                    "columns": ordered_fields,
+                    "shards": entries,
+                },
+            )
+        except BaseException:
+            url_index.abort()
+            raise
+        finally:
+            self._spool_path.unlink(missing_ok=True)
+            for shard in shards.values():
+                shard["handle"].close()
+                shard["partial"].unlink(missing_ok=True)
+        url_index.commit()
+        return self.count
+
+
+@STAGE_SECONDS.timed(stage="write_csv")
+@stage("write")
+def write_csv(
+    records: Iterable[StrainRecord],
+    path: Path,
+    stats: Optional[DatasetStats] = None,
+    shard_rows: Optional[int] = None,
+    shard_by: Optional[str] = None,
+) -> None:
+    if shard_rows or shard_by:
+        writer: StreamingCsvWriter = ShardedCsvWriter(path, shard_rows, shard_by, stats)
+    else:
+        writer = StreamingCsvWriter(path, stats)
+    try:
+        for record in records:
+            writer.write(record)
+    except BaseException:
+        writer.abort()
+        raise
 
-def write_csv(records: List[StrainRecord], path: Path) -> None:
-    if not records:
+    if not writer.close():
         logging.warning("No records to write.")
         return
+    RECORDS_TOTAL.inc(writer.count, event="written")
+
+    if isinstance(writer, ShardedCsvWriter):
+        logging.info(
+            "Wrote %s records to %s (%s of %s shards changed)",
+            writer.count,
+            path.resolve(),
+            writer.rewritten,
+            len(read_manifest(path)["shards"]),
+        )
+        return
+    logging.info("Wrote %s records to %s", writer.count, path.resolve())
 
-    base_fields = [
-        "strain_name",
-        "breeder",
-        "description",
-        "current_price_gbp",
-        "original_price_gbp",
-        "discount_percent",
-        "pack_options",
-        "product_url",
-        "image_url",
-    ]
-    extra_fields_set: Set[str] = set()
-    for record in records:
-        extra_fields_set.update(record.extra.keys())
-    preferred_extras = [field for field in EXTRA_FIELD_ORDER if field in extra_fields_set]
-    fallback_extras = sorted(extra_fields_set - set(preferred_extras))
-    ordered_fields = base_fields + preferred_extras + fallback_extras
 
-    with path.open("w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=ordered_fields)
-        writer.writeheader()
-        for record in records:
-            writer.writerow(record.as_dict())
+def to_float(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
 
-    logging.info("Wrote %s records to %s", len(records), path.resolve())
 
+@stage("write")
+def write_parquet(source: Path, path: Path) -> None:
+    """Convert the finished CSV (or shards) to typed, compressed Parquet, one row group per batch."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logging.warning("Skipping %s: Parquet output needs the 'pyarrow' package", path)
+        return
+    files = dataset_files(source)
+    if not files:
+        return
+
+    def column_type(name: str):
+        if name in FLOAT_FIELDS:
+            return pa.float64()
+        if name in CATEGORICAL_FIELDS:
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.string()
+
+    def to_batch(rows: List[List[str]]):
+        columns = list(zip(*rows))
+        arrays = []
+        for name, values in zip(header, columns):
+            if name in FLOAT_FIELDS:
+                arrays.append(pa.array([to_float(value) for value in values], pa.float64()))
+                continue
+            array = pa.array([value or None for value in values], pa.string())
+            arrays.append(array.dictionary_encode() if name in CATEGORICAL_FIELDS else array)
+        return pa.Table.from_arrays(arrays, schema=schema)
 
-def main(max_records: Optional[int] = None) -> None:
-    # Read existing records
-    existing_records = read_existing_records(OUTPUT_PATH)
-    existing_urls = {record.product_url for record in existing_records if record.product_url}
+    partial_path = path.with_name(f"{path.name}.partial")
+    count = 0
+    try:
+        with files[0].open("r", newline="", encoding="utf-8") as csvfile:
+            header = next(csv.reader(csvfile), [])
+        schema = pa.schema([(name, column_type(name)) for name in header])
+        with pq.ParquetWriter(str(partial_path), schema, compression=PARQUET_COMPRESSION) as writer:
+            batch: List[List[str]] = []
+            for csv_path in files:
+                with csv_path.open("r", newline="", encoding="utf-8") as csvfile:
+                    reader = csv.reader(csvfile)
+                    next(reader, None)  # shards all carry the same header
+                    for row in reader:
+                        batch.append(row)
+                        if len(batch) >= PARQUET_BATCH_ROWS:
+                            writer.write_table(to_batch(batch))
+                            count += len(batch)
+                            batch = []
+            if batch:
+                writer.write_table(to_batch(batch))
+                count += len(batch)
+        os.replace(partial_path, path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+
+    logging.info(
+        "Wrote %s records to %s (%.1f MB vs %.1f MB CSV)",
+        count,
+        path.resolve(),
+        path.stat().st_size / 1024 / 1024,
+        sum(csv_path.stat().st_size for csv_path in files) / 1024 / 1024,
+    )
+
+
+@stage("write")
+def export_store(
+    store: RecordStore,
+    output_path: Path,
+    parquet_path: Optional[Path] = None,
+    shard_rows: Optional[int] = None,
+    shard_by: Optional[str] = None,
+) -> None:
+    """Write the CSV (or shards) and Parquet views of the store, skipping any that are already current."""
+    if store.exported(output_path):
+        logging.info("%s is up to date with %s", output_path, store.path)
+    else:
+        stats = DatasetStats()
+        write_csv((StrainRecord(**state) for state in store.iter_states()), output_path, stats, shard_rows, shard_by)
+        if stats.num_examples and output_path == OUTPUT_PATH:
+            save_stats(OUTPUT_PATH, stats)
+        if output_path.exists():
+            store.mark_exported(output_path)
+    if parquet_path and not store.exported(parquet_path):
+        write_parquet(output_path, parquet_path)
+        if parquet_path.exists():
+            store.mark_exported(parquet_path)
+
+
+def log_metrics_summary() -> None:
+    elapsed = time.time() - METRICS.started
+    logging.info("Run metrics after %.1fs:", elapsed)
+    for line in METRICS.summary_lines():
+        logging.info("  %s", line)
+    waited = SLEEP_SECONDS.total()
+    requested = sum(total for _, _, _, total in REQUEST_SECONDS.samples())
+    logging.info(
+        "Waited %.1fs on purpose (rate limit %.1fs, pauses %.1fs, retry backoff %.1fs) vs %.1fs in requests",
+        waited,
+        SLEEP_SECONDS.value(reason="rate_limit"),
+        SLEEP_SECONDS.value(reason="pause"),
+        SLEEP_SECONDS.value(reason="retry_backoff"),
+        requested,
+    )
+    new = RECORDS_TOTAL.value(event="new")
+    if new and elapsed > 0:
+        logging.info("Crawled %s new records, %.2f records/s", int(new), new / elapsed)
+
+
+def log_crawl_summary(limiter: AdaptiveRateController, retry: RetryPolicy, name: Optional[str] = None) -> None:
+    prefix = f"{name}: " if name else ""
+    logging.info("%sFinal request rate: %.2f req/s", prefix, limiter.rate)
+    logging.info(
+        "%sRetries: %s sent, %s refused by the budget; circuit breaker opened %s times; %s new dead URLs (%s known)",
+        prefix,
+        retry.retries,
+        retry.budget_exhausted,
+        retry.breaker.opened,
+        len(retry.dead_urls.added),
+        len(retry.dead_urls),
+    )
+
+
+def log_cache_summary(cache: Optional[ResponseCache]) -> None:
+    if cache:
+        logging.info(
+            "Response cache: %s hits, %s revalidated, %s misses, %.1f MB on disk",
+            cache.hits,
+            cache.revalidated,
+            cache.misses,
+            cache.total_bytes / 1024 / 1024,
+        )
+
+
+def crawl_source(
+    source: CrawlSource,
+    max_records: Optional[int],
+    existing_urls: Set[str],
+    workers: int,
+    limiter: AdaptiveRateController,
+    rate_log: Optional[Path],
+    cache: Optional[ResponseCache],
+    journal: CrawlJournal,
+    parse_pool: Optional[ParsePool],
+    refresh_prices: bool,
+    store: Optional[RecordStore],
+    retry: RetryPolicy,
+    sitemap: Optional[SitemapSnapshot],
+    sitemap_url: Optional[str],
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Crawl ``source`` into ``journal``; returns the updates for existing rows, or None when there are none to apply."""
+    scraper = SessionPool(workers, source.site_root)
+    # Updates come from --refresh-prices, or from sitemap discovery (possibly in the run being resumed)
+    price_updates: Optional[Dict[str, Dict[str, Any]]] = {} if refresh_prices or journal.updates else None
+    # Sitemap discovery reads Seed City's product pages; other sources always page through their listing
+    if not isinstance(source, SeedCitySource):
+        sitemap = None
+    try:
+        entries = None
+        # A price refresh needs every listing page anyway, and a resumed crawl finishes the way it started
+        if sitemap is not None and not refresh_prices and not journal.resumed and not (cache and cache.offline):
+            entries = read_sitemap(scraper, limiter, sitemap_url)
+        if entries is not None and sitemap.loaded and existing_urls:
+            records, updates, pending = discover_products(
+                scraper, sitemap, entries, existing_urls, limiter, cache, retry, workers, max_records
+            )
+            journal.mark_complete([record.to_state() for record in records], updates)
+            RECORDS_TOTAL.inc(len(records), event="new")
+            sitemap.save(entries, pending)
+            entries = None
+            if price_updates is None:
+                price_updates = {}
+
+        # Records are kept by the journal (and the store), not in memory
+        records = iter_records(
+            max_records, existing_urls, workers, limiter, cache, journal, parse_pool, price_updates, store, retry, scraper, source
+        )
+        for _ in records:
+            pass
+        if entries is not None and not max_records:
+            # After a full crawl every page the sitemap lists is accounted for; later runs only look at what changes
+            sitemap.save(entries)
+    finally:
+        close_sessions(scraper)
+        log_crawl_summary(limiter, retry)
+        retry.dead_urls.save()
+        log_cache_summary(cache)
+        if rate_log:
+            limiter.write_history(rate_log)
+    return price_updates
+
+
+def crawl_sources(
+    sources: List[CrawlSource],
+    journal_path: Path,
+    max_records: Optional[int],
+    existing_urls: Set[str],
+    workers: int,
+    total_workers: int,
+    limiter: AdaptiveRateController,
+    cache: Optional[ResponseCache],
+    parse_pool: Optional[ParsePool],
+    refresh_prices: bool,
+    retry: RetryPolicy,
+) -> List[CrawlJournal]:
+    """Crawl every source at once, each into its own journal next to ``journal_path``; returns the journals.
+
+    All requests run on one ``CrawlScheduler`` of ``total_workers`` threads, which takes
+    turns between hosts and caps each at the source's ``concurrency`` (``workers`` when
+    unset). Every source also gets its own rate controller (starting from its
+    ``requests_per_sec``, else ``limiter``'s rate, within ``limiter``'s bounds), retry
+    budget, circuit breaker and sessions, so a site that throttles or fails slows only its
+    own crawl. Dead URLs are shared. ``max_records`` applies to each source.
+
+    Records only go to the journals here: the store's SQLite connection belongs to the
+    calling thread, which loads the journals once every source has finished.
+    """
+    scheduler = CrawlScheduler(total_workers)
+    journals = [CrawlJournal(source_journal_path(journal_path, source.name)) for source in sources]
+    errors: List[BaseException] = []
+
+    def drive(source: CrawlSource, journal: CrawlJournal) -> None:
+        concurrency = source.concurrency or workers
+        source_limiter = AdaptiveRateController(
+            initial_rate=source.requests_per_sec or limiter.rate,
+            min_rate=limiter.min_rate,
+            max_rate=max(limiter.max_rate, source.requests_per_sec or 0),
+            adaptive=limiter.adaptive,
+        )
+        source_retry = RetryPolicy(retry.dead_urls, retry.max_attempts)
+        price_updates: Optional[Dict[str, Dict[str, Any]]] = {} if refresh_prices else None
+        scraper = SessionPool(concurrency, source.site_root)
+        executor = scheduler.executor(source.host, concurrency)
+        try:
+            records = iter_records(
+                max_records,
+                existing_urls,
+                concurrency,
+                source_limiter,
+                cache,
+                journal,
+                parse_pool,
+                price_updates,
+                None,
+                source_retry,
+                scraper,
+                source,
+                executor,
+            )
+            for _ in records:
+                pass
+        except BaseException as exc:  # noqa: BLE001 - re-raised by the calling thread
+            logging.exception("Crawl of %s failed", source.name)
+            errors.append(exc)
+        finally:
+            close_sessions(scraper)
+            log_crawl_summary(source_limiter, source_retry, source.name)
+
+    drivers = [
+        threading.Thread(target=drive, args=(source, journal), name=f"source-{source.name}", daemon=True)
+        for source, journal in zip(sources, journals)
+    ]
+    started = time.monotonic()
+    for driver in drivers:
+        driver.start()
+    # On Ctrl-C the daemon threads die with the process; every finished page is already journaled
+    for driver in drivers:
+        driver.join()
+    scheduler.shutdown()
+    logging.info(
+        "Crawled %s sources in %.1fs; fetches per host: %s",
+        len(sources),
+        time.monotonic() - started,
+        ", ".join(f"{host} {count}" for host, count in scheduler.completed.items()),
+    )
+    if errors:
+        # Finished sources stay journaled, so a rerun only redoes the failed ones
+        raise errors[0]
+    return journals
+
+
+def main(
+    max_records: Optional[int] = None,
+    workers: int = DETAIL_WORKERS,
+    limiter: Optional[AdaptiveRateController] = None,
+    rate_log: Optional[Path] = None,
+    cache: Optional[ResponseCache] = None,
+    journal: Optional[CrawlJournal] = None,
+    parse_pool: Optional[ParsePool] = None,
+    refresh_prices: bool = False,
+    parquet_path: Optional[Path] = None,
+    shard_rows: Optional[int] = None,
+    shard_by: Optional[str] = None,
+    store: Optional[RecordStore] = None,
+    retry: Optional[RetryPolicy] = None,
+    sitemap: Optional[SitemapSnapshot] = None,
+    sitemap_url: Optional[str] = None,
+    sources: Optional[List[CrawlSource]] = None,
+    total_workers: int = SCHEDULER_WORKERS,
+) -> None:
+    output_path = SHARD_DIR if shard_rows or shard_by else OUTPUT_PATH
+    # Existing rows come from whichever layout was written last, so switching layouts keeps them
+    source_path = current_dataset(OUTPUT_PATH, SHARD_DIR)
+
+    if store is not None:
+        if not len(store) and dataset_files(source_path):
+            imported = store.upsert(record.to_state() for record in iter_existing_records(source_path))
+            logging.info("Imported %s existing records into %s", imported, store.path)
+        existing_urls = store.urls()
+    else:
+        # Only the URLs of existing records are needed up front, read from the URL index;
+        # the rows themselves are streamed through at write time
+        existing_urls = read_existing_urls(source_path)
     
-    # Collect new records, skipping existing URLs
-    new_records = collect_records(max_records, existing_urls)
+    # Collect new records into the journal, skipping existing URLs
+    journal = journal or CrawlJournal()
+    limiter = limiter or AdaptiveRateController()
+    retry = retry or RetryPolicy()
+    sources = sources or [SeedCitySource()]
+    journals = [journal]
+    if len(sources) > 1:
+        try:
+            journals = crawl_sources(
+                sources, journal.path, max_records, existing_urls, workers, total_workers, limiter, cache, parse_pool, refresh_prices, retry
+            )
+        finally:
+            retry.dead_urls.save()
+            log_cache_summary(cache)
+        price_updates = None
+        if refresh_prices or any(source_journal.updates for source_journal in journals):
+            price_updates = {}
+            for source_journal in journals:
+                price_updates.update(source_journal.updates)
+    else:
+        price_updates = crawl_source(
+            sources[0], max_records, existing_urls, workers, limiter, rate_log, cache, journal, parse_pool, refresh_prices, store, retry, sitemap, sitemap_url
+        )
+
+    if store is not None:
+        # Pages were upserted as they finished; replaying the journal covers a crash between
+        # a page's journal commit and its upsert, and is a no-op otherwise
+        for source_journal in journals:
+            store.upsert(source_journal.iter_records(), updates=source_journal.updates)
+            source_journal.remove()
+        export_store(store, output_path, parquet_path, shard_rows, shard_by)
+        return
     
-    # Combine existing and new records
-    all_records = existing_records + new_records
+    # Stream existing then journaled records; a crash after the last write may have left both holding a URL
+    new_records = (
+        StrainRecord(**row)
+        for source_journal in journals
+        for row in source_journal.iter_records()
+        if row.get("product_url") not in existing_urls
+    )
     
-    # Write all records to CSV
-    write_csv(all_records, OUTPUT_PATH)
+    existing_records = iter_existing_records(source_path)
+    if price_updates is not None:
+        existing_records = apply_price_updates(existing_records, price_updates)
+
+    # Write all records to CSV, collecting the metadata statistics on the way through
+    stats = DatasetStats()
+    write_csv(itertools.chain(existing_records, new_records), output_path, stats, shard_rows, shard_by)
+    for source_journal in journals:
+        source_journal.remove()
+    if stats.num_examples and output_path == OUTPUT_PATH:
+        # Shard statistics are cached per shard by dataset_stats.load_stats instead
+        save_stats(OUTPUT_PATH, stats)
+    if parquet_path:
+        write_parquet(output_path, parquet_path)
 
 
 def is_valid_record(record: StrainRecord) -> bool:
@@ -490,12 +2425,274 @@ def is_valid_record(record: StrainRecord) -> bool:
 
 
 if __name__ == "__main__":
-    import sys
-    max_records = None
-    if len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="Scrape cannabis strain listings from Seed City.")
+    parser.add_argument("max_records", nargs="?", type=int, default=None, help="stop after this many new records")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DETAIL_WORKERS,
+        help="concurrent detail-page fetches (1 fetches serially; default: %(default)s)",
+    )
+    parser.add_argument(
+        "--start-rps",
+        type=float,
+        default=START_REQUESTS_PER_SEC,
+        help="initial requests per second across all workers (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=MAX_REQUESTS_PER_SEC,
+        help="ceiling the rate controller may climb to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--min-rps",
+        type=float,
+        default=MIN_REQUESTS_PER_SEC,
+        help="floor the rate controller backs off to (default: %(default)s)",
+    )
+    parser.add_argument("--fixed-rate", action="store_true", help="keep --start-rps; only honour Retry-After")
+    parser.add_argument("--rate-log", type=Path, help="write the rate controller's decisions to this JSON file")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=CACHE_DIR,
+        help="directory of the on-disk response cache (default: %(default)s)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="always download pages, bypassing the cache")
+    parser.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=DEFAULT_TTL_SEC / 3600,
+        help="serve cached pages younger than this without revalidating (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024 / 1024,
+        help="evict least recently used pages beyond this size (default: %(default)s)",
+    )
+    parser.add_argument("--offline", action="store_true", help="parse cached pages only; never hit the network")
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=JOURNAL_PATH,
+        help="crawl journal used to resume an interrupted run (default: %(default)s)",
+    )
+    parser.add_argument("--restart", action="store_true", help="discard an existing journal and crawl from offset 0")
+    parser.add_argument(
+        "--parser",
+        choices=sorted(PARSER_BACKENDS),
+        default=PARSER_BACKEND,
+        help="HTML parser backend for detail pages; listing pages always use html.parser "
+        "(default: %(default)s, or $SEED_CITY_PARSER)",
+    )
+    parser.add_argument(
+        "--compare-parsers",
+        metavar="BACKEND",
+        choices=sorted(PARSER_BACKENDS),
+        help="parse every cached page with BACKEND and the html.parser reference, report differing fields and exit",
+    )
+    parser.add_argument(
+        "--refresh-prices",
+        action="store_true",
+        help="also update prices, discounts and pack options of existing rows from the listing pages",
+    )
+    parser.add_argument(
+        "--parquet",
+        type=Path,
+        default=PARQUET_PATH,
+        help="also write the dataset as Parquet here, needs pyarrow (default: %(default)s)",
+    )
+    parser.add_argument("--no-parquet", action="store_true", help="write the CSV only")
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=STORE_PATH,
+        help="SQLite record store the CSV and Parquet files are exported from (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help="read and rewrite the CSV directly, without the record store",
+    )
+    shard_group = parser.add_mutually_exclusive_group()
+    shard_group.add_argument(
+        "--shard-rows",
+        type=int,
+        metavar="N",
+        help=f"write {SHARD_DIR}/part-NNNNN.csv shards of N rows plus a manifest instead of one CSV",
+    )
+    shard_group.add_argument(
+        "--shard-by",
+        metavar="COLUMN",
+        choices=CATEGORICAL_FIELDS,
+        help=f"write one {SHARD_DIR}/ shard per value of COLUMN, a low-cardinality column such as breeder, plus a manifest",
+    )
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=PARSE_PROCESSES,
+        help="parse pages in this many worker processes while fetching continues (default: %(default)s, in-process)",
+    )
+    parser.add_argument(
+        "--parse-queue",
+        type=int,
+        default=PARSE_QUEUE_SIZE,
+        help="raw pages that may wait for a parser process before fetchers block (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=MAX_ATTEMPTS,
+        help="attempts per page for throttled or failing requests, budget permitting (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dead-urls",
+        type=Path,
+        default=DEAD_URLS_PATH,
+        help="product URLs that answered 404/410 and are skipped for %s days (default: %%(default)s)" % (DEAD_URL_TTL_SEC // 86400),
+    )
+    parser.add_argument("--recheck-dead", action="store_true", help="request the URLs on the dead-URL list again")
+    parser.add_argument(
+        "--sitemap",
+        metavar="URL",
+        help="sitemap (or sitemap index) to discover new and changed products from (default: from robots.txt, or /sitemap.xml)",
+    )
+    parser.add_argument(
+        "--sitemap-state",
+        type=Path,
+        default=SITEMAP_STATE_PATH,
+        help="the sitemap as of the last crawl, which new and changed products are found against (default: %(default)s)",
+    )
+    parser.add_argument("--no-sitemap", action="store_true", help="always page through the whole catalogue listing")
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        metavar="NAME",
+        choices=sorted(SOURCES),
+        default=DEFAULT_SOURCES,
+        help="sites to crawl, several at once on a shared scheduler (choices: %(choices)s; default: %(default)s)",
+    )
+    parser.add_argument(
+        "--total-workers",
+        type=int,
+        default=SCHEDULER_WORKERS,
+        help="threads shared by all sources when crawling several; each host also stays within --workers (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=Path,
+        default=METRICS_JSON_PATH,
+        help="JSON snapshot of the crawl metrics, rewritten periodically (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=Path,
+        default=METRICS_PROM_PATH,
+        help="Prometheus text-format metrics file, e.g. for the node_exporter textfile collector (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=EXPORT_INTERVAL_SEC,
+        help="seconds between metrics file exports (default: %(default)s)",
+    )
+    parser.add_argument("--no-metrics", action="store_true", help="do not write the metrics files")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if not 0 < args.min_rps <= args.max_rps:
+        parser.error("expected 0 < --min-rps <= --max-rps")
+    if args.shard_rows is not None and args.shard_rows < 1:
+        parser.error("--shard-rows must be at least 1")
+    if args.parse_processes < 0 or args.parse_queue < 1:
+        parser.error("expected --parse-processes >= 0 and --parse-queue >= 1")
+    if args.offline and args.no_cache:
+        parser.error("--offline needs the cache")
+    if args.max_attempts < 1:
+        parser.error("--max-attempts must be at least 1")
+    if len(set(args.sources)) < len(args.sources):
+        parser.error("--sources lists a source twice")
+    if args.total_workers < 1:
+        parser.error("--total-workers must be at least 1")
+    if args.metrics_interval <= 0:
+        parser.error("--metrics-interval must be positive")
+    if args.profile_interval <= 0:
+        parser.error("--profile-interval must be positive")
+    try:
+        set_parser_backend(args.parser)
+        if args.compare_parsers:
+            set_parser_backend(args.compare_parsers)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.compare_parsers:
+        page_cache = ResponseCache(args.cache_dir, offline=True)
         try:
-            max_records = int(sys.argv[1])
-        except ValueError:
-            logging.error("Invalid number for max_records: %s", sys.argv[1])
-            sys.exit(1)
-    main(max_records)
+            mismatches = compare_parser_backends(page_cache.iter_pages(), args.compare_parsers)
+        finally:
+            page_cache.close()
+        sys.exit(1 if mismatches else 0)
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            args.cache_dir,
+            ttl_sec=args.cache_ttl_hours * 3600,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            offline=args.offline,
+        )
+    controller = AdaptiveRateController(
+        initial_rate=args.start_rps,
+        min_rate=args.min_rps,
+        max_rate=args.max_rps,
+        adaptive=not args.fixed_rate,
+    )
+    if args.restart:
+        args.journal.unlink(missing_ok=True)
+        for name in args.sources:
+            source_journal_path(args.journal, name).unlink(missing_ok=True)
+    journal = CrawlJournal(args.journal)
+    parse_pool = ParsePool(args.parse_processes, args.parse_queue) if args.parse_processes else None
+    store = None if args.no_store else RecordStore(BASE_FIELDS, args.store)
+    dead_urls = DeadUrls(args.dead_urls, ttl=0 if args.recheck_dead else DEAD_URL_TTL_SEC)
+    retry = RetryPolicy(dead_urls, max_attempts=args.max_attempts)
+    exporter = None
+    if not args.no_metrics:
+        exporter = MetricsExporter(METRICS, args.metrics_json, args.metrics_prom, args.metrics_interval).start()
+    profiler = profiler_from_args(args, "scrape")
+    if profiler:
+        profiler.start()
+    try:
+        main(
+            args.max_records,
+            workers=args.workers,
+            limiter=controller,
+            rate_log=args.rate_log,
+            cache=cache,
+            journal=journal,
+            parse_pool=parse_pool,
+            refresh_prices=args.refresh_prices,
+            parquet_path=None if args.no_parquet else args.parquet,
+            shard_rows=args.shard_rows,
+            shard_by=args.shard_by,
+            store=store,
+            retry=retry,
+            sitemap=None if args.no_sitemap else SitemapSnapshot(args.sitemap_state),
+            sitemap_url=args.sitemap,
+            sources=[make_source(name) for name in args.sources],
+            total_workers=args.total_workers,
+        )
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+        if store is not None:
+            store.close()
+        journal.close()
+        if cache:
+            cache.close()
+        if exporter:
+            exporter.stop()
+        log_metrics_summary()
+        if profiler:
+            logging.info("Profile written to %s", profiler.stop())
@@ -0,0 +1,169 @@
+"""
+Pool of keep-alive HTTP sessions for concurrent fetchers, sharing one Cloudflare clearance
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Tuple
+
+import cloudscraper
+import requests
+
+CLEARANCE_COOKIE = "cf_clearance"
+CLEARANCE_TTL_SEC = 1800.0  # assumed lifetime when no clearance cookie (or no expiry) was issued
+REFRESH_MARGIN_SEC = 120.0  # solve again this long before the clearance expires
+SOLVE_TIMEOUT_SEC = 60.0
+SOLVE_BACKOFF_SEC = 30.0  # wait after a solve that was challenged again, doubled per failure
+SOLVE_MAX_BACKOFF_SEC = 600.0
+CHALLENGE_STATUSES = {403, 503}
+POOL_HOSTS = 4  # connection pools kept per adapter, one per host
+
+
+def is_challenge(response: requests.Response) -> bool:
+    """Whether ``response`` is a Cloudflare challenge page rather than an answer from the site."""
+    if response.status_code not in CHALLENGE_STATUSES:
+        return False
+    if response.headers.get("cf-mitigated") == "challenge":
+        return True
+    return response.headers.get("Server", "").startswith("cloudflare") and "/cdn-cgi/challenge-platform/" in response.text
+
+
+class SessionPool:
+    """Keep-alive sessions handed out to one thread at a time, all presenting the same clearance.
+
+    A dedicated solver session (a ``CloudScraper`` by default) passes the challenge for
+    ``solve_url``; its cookies and User-Agent are then copied into every pooled session
+    before its next use. The pooled sessions are plain ``requests`` sessions that mount the
+    solver's adapters, so they share its TLS settings and one set of keep-alive connections
+    sized to ``size``.
+
+    The clearance is solved again ``margin`` seconds before its cookie expires (halfway
+    through for short-lived ones), by whichever thread notices first while the others carry
+    on with the old one, or straight away when a response turns out to be a challenge.
+    Either way one thread solves and the rest reuse it.
+
+    A solve whose response is itself a challenge does not replace the clearance. No new
+    solve is attempted for ``SOLVE_BACKOFF_SEC`` (doubling with each failure in a row), and
+    meanwhile challenged responses are returned as they are for the caller's retry policy.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        solve_url: str,
+        factory: Callable[[], requests.Session] = cloudscraper.create_scraper,
+        ttl: float = CLEARANCE_TTL_SEC,
+        margin: float = REFRESH_MARGIN_SEC,
+    ) -> None:
+        self.size = size
+        self.solve_url = solve_url
+        self.ttl = ttl
+        self.margin = margin
+        self.solves = 0
+        self.failed_solves = 0
+        self.challenges = 0
+        self._solver = factory()
+        for adapter in set(self._solver.adapters.values()):
+            adapter.init_poolmanager(POOL_HOSTS, size)
+        self._sessions: "queue.Queue[Tuple[requests.Session, int]]" = queue.Queue()
+        for _ in range(size):
+            session = requests.Session()
+            for prefix, adapter in self._solver.adapters.items():
+                session.mount(prefix, adapter)
+            self._sessions.put((session, 0))
+        self._generation = 0  # bumped by every solve; 0 means not solved yet
+        self._cookies = requests.cookies.RequestsCookieJar()
+        self._headers: dict = {}
+        self._expires = 0.0
+        self._refresh_at = 0.0
+        self._backoff = SOLVE_BACKOFF_SEC
+        self._next_solve = 0.0  # no solve before this, after a failed one
+        self._solve_lock = threading.Lock()
+
+    @property
+    def expires(self) -> float:
+        """Epoch seconds at which the current clearance runs out."""
+        return self._expires
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        if not self._generation:
+            self.refresh(0)
+        elif time.time() >= max(self._refresh_at, self._next_solve) and self._solve_lock.acquire(blocking=False):
+            try:
+                self._solve("clearance expires in %.0fs" % (self._expires - time.time()))
+            finally:
+                self._solve_lock.release()
+        session, generation = self._sessions.get()
+        try:
+            generation = self._sync(session, generation)
+            response = session.request(method, url, **kwargs)
+            if is_challenge(response):
+                self.challenges += 1
+                self.refresh(generation)
+                if self._generation != generation:
+                    generation = self._sync(session, generation)
+                    response = session.request(method, url, **kwargs)
+        finally:
+            self._sessions.put((session, generation))
+        return response
+
+    def refresh(self, seen: int) -> None:
+        """Solve again unless another thread already did since clearance ``seen`` was handed out, or a solve just failed."""
+        with self._solve_lock:
+            if self._generation <= seen and time.time() >= self._next_solve:
+                self._solve("no clearance yet" if not seen else "challenged")
+
+    def _solve(self, reason: str) -> None:
+        # Without the old cookies Cloudflare challenges again instead of accepting the old clearance
+        self._solver.cookies.clear()
+        started = time.monotonic()
+        response = self._solver.get(self.solve_url, timeout=SOLVE_TIMEOUT_SEC)
+        if is_challenge(response):
+            # Keep the clearance we have: a new generation would only send every thread round again
+            self.failed_solves += 1
+            self._next_solve = time.time() + self._backoff
+            logging.warning(
+                "Cloudflare challenge for %s was not solved (status %s); not trying again for %.0fs",
+                self.solve_url,
+                response.status_code,
+                self._backoff,
+            )
+            self._backoff = min(SOLVE_MAX_BACKOFF_SEC, self._backoff * 2)
+            return
+        self._backoff = SOLVE_BACKOFF_SEC
+        cookies = self._solver.cookies.copy()
+        clearance = [cookie.expires for cookie in cookies if cookie.name == CLEARANCE_COOKIE and cookie.expires]
+        self._cookies = cookies
+        self._headers = dict(self._solver.headers)
+        now = time.time()
+        self._expires = min(clearance) if clearance else now + self.ttl
+        # A clearance shorter-lived than the margin is renewed halfway instead of on every request
+        self._refresh_at = self._expires - min(self.margin, (self._expires - now) / 2)
+        self._generation += 1
+        self.solves += 1
+        logging.info(
+            "Cloudflare clearance %s (%s) in %.1fs, valid for %.0fs",
+            self._generation,
+            reason,
+            time.monotonic() - started,
+            self._expires - time.time(),
+        )
+
+    def _sync(self, session: requests.Session, generation: int) -> int:
+        """Bring ``session`` up to the current clearance; returns the generation it now holds."""
+        current = self._generation
+        if generation != current:
+            session.headers.clear()
+            session.headers.update(self._headers)
+            session.cookies.update(self._cookies)
+        return current
+
+    def close(self) -> None:
+        while not self._sessions.empty():
+            self._sessions.get_nowait()[0].close()
+        self._solver.close()
@@ -0,0 +1,147 @@
+"""
+Product discovery from the site's XML sitemaps, diffed against the sitemap as of the previous crawl
+"""
+
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from profiling import stage
+
+SITEMAP_STATE_PATH = Path("cannabis-strains.sitemap.json")
+SITEMAP_CHUNK_BYTES = 64 * 1024
+MAX_SITEMAPS = 200  # child sitemaps followed from sitemap indexes, against index loops
+GZIP_MAGIC = b"\x1f\x8b"
+
+# (page URL, lastmod exactly as the sitemap wrote it)
+SitemapEntry = Tuple[str, Optional[str]]
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def robots_sitemaps(robots_txt: str) -> List[str]:
+    """Sitemap locations announced in a robots.txt."""
+    locations = []
+    for line in robots_txt.splitlines():
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sitemap" and value.strip():
+            locations.append(value.strip())
+    return locations
+
+
+@stage("discovery")
+def parse_sitemap(chunks: Iterable[bytes]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """Parse a sitemap or sitemap index from ``chunks`` of XML as they arrive; gzipped files are inflated on the way.
+
+    Yields ``(kind, loc, lastmod)`` for each entry as soon as it closes, ``kind`` being
+    ``"url"`` for pages and ``"sitemap"`` for the children of an index. Finished entries
+    are dropped from the tree, so memory stays flat however large the file is.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    inflate: Optional[Callable[[bytes], bytes]] = None
+    root: Optional[ET.Element] = None
+
+    def events() -> Iterator[Tuple[str, ET.Element]]:
+        nonlocal inflate
+        for chunk in chunks:
+            if inflate is None:
+                inflate = zlib.decompressobj(wbits=31).decompress if chunk[:2] == GZIP_MAGIC else bytes
+            parser.feed(inflate(chunk))
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    for event, element in events():
+        if event == "start":
+            if root is None:
+                root = element
+            continue
+        kind = local_name(element.tag)
+        if kind not in ("url", "sitemap"):
+            continue
+        loc = lastmod = None
+        for child in element:
+            name = local_name(child.tag)
+            if name == "loc":
+                loc = (child.text or "").strip()
+            elif name == "lastmod":
+                lastmod = (child.text or "").strip() or None
+        if loc:
+            yield kind, loc, lastmod
+        root.clear()
+
+
+def iter_sitemaps(fetch: Callable[[str], Iterable[bytes]], locations: Iterable[str], max_sitemaps: int = MAX_SITEMAPS) -> Iterator[SitemapEntry]:
+    """Every page in the sitemaps at ``locations``, following sitemap indexes breadth first.
+
+    ``fetch`` returns the body of a sitemap as an iterable of byte chunks.
+    """
+    pending: Deque[str] = deque(locations)
+    seen: Set[str] = set()
+    while pending:
+        location = pending.popleft()
+        if location in seen:
+            continue
+        if len(seen) >= max_sitemaps:
+            logging.warning("Stopped after %s sitemaps; %s more were not read", max_sitemaps, len(pending) + 1)
+            return
+        seen.add(location)
+        for kind, loc, lastmod in parse_sitemap(fetch(location)):
+            if kind == "sitemap":
+                pending.append(loc)
+            else:
+                yield loc, lastmod
+
+
+class SitemapSnapshot:
+    """Pages and their lastmod values from the sitemap as of the last finished crawl.
+
+    A page missing from the snapshot is new since then; one whose lastmod differs has
+    changed. ``save`` is only called once everything the snapshot claims is in the
+    dataset, so pages that could not be crawled are left out and come up again next run.
+    """
+
+    def __init__(self, path: Path = SITEMAP_STATE_PATH) -> None:
+        self.path = path
+        self.entries: Dict[str, Optional[str]] = {}
+        self.taken: Optional[float] = None
+        if path.exists():
+            try:
+                state = json.loads(path.read_text(encoding="utf-8"))
+                self.entries = state["urls"]
+                self.taken = state["taken"]
+            except (ValueError, KeyError, TypeError):
+                logging.warning("Ignoring unreadable sitemap snapshot %s", path)
+                self.entries = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self.taken is not None
+
+    def diff(self, entries: Mapping[str, Optional[str]]) -> Tuple[List[str], List[str]]:
+        """Pages new since the snapshot, and pages whose lastmod moved on."""
+        new = [url for url in entries if url not in self.entries]
+        changed = [url for url, lastmod in entries.items() if url in self.entries and lastmod and lastmod != self.entries[url]]
+        return new, changed
+
+    def save(self, entries: Mapping[str, Optional[str]], pending: Iterable[str] = ()) -> None:
+        """Record ``entries`` as crawled, except ``pending`` pages, which keep their previous state."""
+        urls = dict(entries)
+        for url in pending:
+            if url in self.entries:
+                urls[url] = self.entries[url]
+            else:
+                urls.pop(url, None)
+        self.entries = urls
+        self.taken = time.time()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"taken": self.taken, "urls": urls}, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = ROOT / "fixtures" / "seed_city"
+
+# The scraper and its helpers are flat scripts at the repo root, not an installed package
+sys.path.insert(0, str(ROOT))
@@ -0,0 +1,49 @@
+"""Conditional requests through the response cache: a 304 whose body is gone is fetched again, not retried."""
+
+import requests
+
+from http_cache import ResponseCache
+from scrape_seed_city import cached_get
+
+URL = "https://example.test/en/strain"
+
+
+class StubScraper:
+    """Answers 304 to any conditional request and 200 with ``body`` otherwise, remembering the headers it got."""
+
+    def __init__(self, body):
+        self.body = body
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests.append(headers)
+        response = requests.Response()
+        response.url = url
+        if headers:
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = self.body.encode("utf-8")
+            response.headers["ETag"] = '"v2"'
+        return response
+
+
+def test_304_is_answered_from_the_cache(tmp_path):
+    cache = ResponseCache(tmp_path, ttl_sec=0)
+    cache.store(URL, None, "cached page", etag='"v1"')
+    scraper = StubScraper("new page")
+    assert cached_get(scraper, URL, None, cache) == (200, "cached page")
+    assert scraper.requests == [{"If-None-Match": '"v1"'}]
+
+
+def test_304_without_a_cached_body_fetches_again_unconditionally(tmp_path):
+    cache = ResponseCache(tmp_path, ttl_sec=0)
+    cache.store(URL, None, "cached page", etag='"v1"')
+    # The body is evicted between reading the validators and the 304 arriving
+    for path in (tmp_path / "objects").rglob("*.gz"):
+        path.unlink()
+    scraper = StubScraper("new page")
+    assert cached_get(scraper, URL, None, cache) == (200, "new page")
+    assert scraper.requests == [{"If-None-Match": '"v1"'}, None]
+    assert cache.conditional_headers(URL) == {"If-None-Match": '"v2"'}
@@ -0,0 +1,144 @@
+"""Crawling several sources at once: fair turns between hosts, per-host caps, and one merged dataset."""
+
+import csv
+import threading
+from concurrent.futures import wait
+
+import pytest
+
+import scrape_seed_city as scraper
+from crawl_journal import CrawlJournal
+from crawl_scheduler import CrawlScheduler
+from crawl_sources import CrawlSource
+from record_store import RecordStore
+from scrape_seed_city import BASE_FIELDS, OUTPUT_PATH, StrainRecord
+
+PRODUCTS = 7
+
+
+class StubSource(CrawlSource):
+    """A catalogue of ``PRODUCTS`` products, two to a listing page, served by ``fake_fetch``."""
+
+    name = "stub"
+    page_size = 2
+
+    def listing_request(self, offset):
+        return f"{self.site_root}/catalogue", {"start": offset}
+
+    def find_last_offset(self, html):
+        return (PRODUCTS - 1) // self.page_size * self.page_size
+
+    def parse_listing_page(self, html):
+        rows = (line.split("|") for line in html.splitlines())
+        return [StrainRecord(name, self.host, "", 10.0, None, None, "", url, "", {}) for name, url in rows]
+
+    def parse_detail_page(self, html):
+        return {"seen_at": html}
+
+
+class OtherStubSource(StubSource):
+    name = "other-stub"
+
+
+def fake_fetch(scraper, url, limiter, cache, retry, params=None, *args, **kwargs):
+    if params is None:
+        return url
+    start = params["start"]
+    return "\n".join(f"Strain {number}|{url}/strain-{number}" for number in range(start, min(start + 2, PRODUCTS)))
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = CrawlScheduler(workers=8)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_hosts_take_turns():
+    scheduler = CrawlScheduler(workers=1)
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def task(host, block=False):
+        order.append(host)
+        if block:
+            started.set()
+            release.wait()
+
+    big = scheduler.executor("big.test", 4)
+    small = scheduler.executor("small.test", 4)
+    futures = [big.submit(task, "big", block=True)]
+    # Queue everything while the only worker is busy, the big backlog first
+    started.wait()
+    futures += [big.submit(task, "big") for _ in range(20)]
+    futures += [small.submit(task, "small") for _ in range(3)]
+    release.set()
+    wait(futures)
+    scheduler.shutdown()
+    assert order[:7] == ["big", "small", "big", "small", "big", "small", "big"]
+
+
+def test_a_stuck_host_holds_only_its_cap(scheduler):
+    release = threading.Event()
+    lock = threading.Lock()
+    running = {"slow": 0}
+    most = {"slow": 0}
+
+    def stuck():
+        with lock:
+            running["slow"] += 1
+            most["slow"] = max(most["slow"], running["slow"])
+        release.wait()
+        with lock:
+            running["slow"] -= 1
+
+    slow = scheduler.executor("slow.test", 2)
+    fast = scheduler.executor("fast.test", 4)
+    stuck_futures = [slow.submit(stuck) for _ in range(10)]
+    done, not_done = wait([fast.submit(lambda number=number: number) for number in range(20)], timeout=10)
+    assert not not_done
+    assert most["slow"] == 2
+    release.set()
+    wait(stuck_futures)
+    assert scheduler.completed == {"slow.test": 10, "fast.test": 20}
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, "fetch_with_retry", fake_fetch)
+    return [StubSource("https://one.test", concurrency=2), OtherStubSource("https://two.test", concurrency=1)]
+
+
+def expected_urls():
+    return sorted(f"https://{host}.test/catalogue/strain-{number}" for host in ("one", "two") for number in range(PRODUCTS))
+
+
+def test_source_journals_are_merged_into_the_store(sources, tmp_path):
+    store = RecordStore(BASE_FIELDS, tmp_path / "store.sqlite3")
+    journal = CrawlJournal(tmp_path / "crawl.jsonl")
+    scraper.main(workers=2, journal=journal, store=store, sources=sources, total_workers=3)
+    states = list(store.iter_states())
+    assert sorted(state["product_url"] for state in states) == expected_urls()
+    assert all(state["extra"]["seen_at"] == state["product_url"] for state in states)
+    assert list(tmp_path.glob("crawl*.jsonl")) == []
+    assert OUTPUT_PATH.exists()
+
+
+def test_source_journals_are_merged_into_the_csv(sources, tmp_path):
+    journal = CrawlJournal(tmp_path / "crawl.jsonl")
+    scraper.main(workers=2, journal=journal, sources=sources, total_workers=3)
+    with OUTPUT_PATH.open(newline="", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert sorted(row["product_url"] for row in rows) == expected_urls()
+    assert {row["breeder"] for row in rows} == {"one.test", "two.test"}
+    assert list(tmp_path.glob("crawl*.jsonl")) == []
+
+
+def test_adapters_must_implement_the_listing_methods():
+    class Incomplete(CrawlSource):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete("https://incomplete.test")
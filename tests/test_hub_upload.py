@@ -0,0 +1,98 @@
+"""The upload planner against LocalHub: only changed files are sent, stale dataset files are deleted, in one commit."""
+
+import pytest
+
+import hub_upload
+from hub_upload import REPO_ID, REPO_TYPE, LocalHub, plan_upload, push_plan
+
+CSV = "cannabis-strains.csv"
+CARD = "README_HF.md"
+OLD_SHARD = "cannabis-strains/part-00000.csv"
+
+
+@pytest.fixture
+def hub(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    hub = LocalHub(tmp_path / "hub")
+    hub.create_repo(REPO_ID, repo_type=REPO_TYPE)
+    return hub
+
+
+def write(name, text):
+    with open(name, "w", encoding="utf-8", newline="") as handle:
+        handle.write(text)
+
+
+def publish(hub, files):
+    return push_plan(hub, plan_upload(hub, files), "publish")
+
+
+def names(files):
+    return sorted(file.path_in_repo for file in files)
+
+
+def test_first_upload_sends_everything(hub):
+    write(CSV, "strain_name\nA\n")
+    write(CARD, "# card\n")
+    plan = plan_upload(hub, [CSV, CARD, "missing.py"])
+    assert names(plan.changed) == [CARD, CSV]
+    assert plan.unchanged == [] and plan.deleted == []
+    assert plan.missing == ["missing.py"]
+    assert plan.bytes_to_send == len("strain_name\nA\n") + len("# card\n")
+    assert plan.bytes_skipped == 0
+
+
+def test_unchanged_files_are_skipped_and_changed_ones_sent(hub):
+    write(CSV, "strain_name\nA\n")
+    write(CARD, "# card\n")
+    publish(hub, [CSV, CARD])
+    write(CSV, "strain_name\nA\nB\n")
+
+    plan = plan_upload(hub, [CSV, CARD])
+    assert names(plan.changed) == [CSV]
+    assert names(plan.unchanged) == [CARD]
+    assert plan.bytes_to_send == len("strain_name\nA\nB\n")
+    assert plan.bytes_skipped == len("# card\n")
+
+
+def test_stale_dataset_files_are_deleted_in_the_same_commit(hub, tmp_path):
+    # The last upload used the sharded layout; this one switches back to a single CSV
+    (tmp_path / "cannabis-strains").mkdir()
+    write(OLD_SHARD, "strain_name\nA\n")
+    write(CARD, "# card\n")
+    publish(hub, [OLD_SHARD, CARD])
+    commits = len(hub.commits)
+    write(CSV, "strain_name\nA\nB\n")
+
+    plan = plan_upload(hub, [CSV, CARD])
+    assert plan.deleted == [OLD_SHARD]
+    commit = push_plan(hub, plan, "switch layout")
+    assert len(hub.commits) == commits + 1
+    assert sorted(commit.paths) == [CSV, OLD_SHARD]
+    assert hub.list_repo_files(REPO_ID, repo_type=REPO_TYPE) == [CARD, CSV]
+
+
+def test_support_files_are_never_deleted(hub):
+    write(CARD, "# card\n")
+    write("notes.txt", "kept\n")
+    publish(hub, [CARD, "notes.txt"])
+    assert plan_upload(hub, [CARD]).deleted == []
+
+
+def test_nothing_to_do_makes_no_commit(hub):
+    write(CSV, "strain_name\nA\n")
+    publish(hub, [CSV])
+    commits = len(hub.commits)
+    plan = plan_upload(hub, [CSV])
+    assert plan.changed == [] and plan.deleted == []
+    assert push_plan(hub, plan, "noop") is None
+    assert len(hub.commits) == commits
+
+
+def test_lfs_files_are_compared_by_sha256(hub, monkeypatch):
+    monkeypatch.setattr(hub_upload, "LFS_THRESHOLD_BYTES", 1)
+    write(CSV, "strain_name\nA\n")
+    publish(hub, [CSV])
+    assert names(plan_upload(hub, [CSV]).unchanged) == [CSV]
+    write(CSV, "strain_name\nB\n")
+    assert names(plan_upload(hub, [CSV]).changed) == [CSV]
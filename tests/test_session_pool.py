@@ -0,0 +1,123 @@
+"""SessionPool against a local stub of a challenge-protected site: one shared solve, renewal, re-solve, back-off."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from session_pool import CLEARANCE_COOKIE, SessionPool
+
+
+class StubSite(ThreadingHTTPServer):
+    """``/solve`` issues a clearance cookie; every other path answers 403 ``cf-mitigated: challenge`` without a live one."""
+
+    daemon_threads = True
+
+    def __init__(self, ttl):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.ttl = ttl
+        self.solvable = True
+        self.solves = 0
+        self.challenged = 0
+        self.tokens = {}  # token -> expiry
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def revoke(self):
+        with self.lock:
+            self.tokens.clear()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server
+        with site.lock:
+            if self.path == "/solve":
+                site.solves += 1
+                if site.solvable:
+                    token = f"token-{site.solves}"
+                    site.tokens[token] = time.time() + site.ttl
+                    self.answer(200, {"Set-Cookie": f"{CLEARANCE_COOKIE}={token}; Max-Age={site.ttl}; Path=/"})
+                    return
+            else:
+                cookies = dict(part.strip().split("=", 1) for part in self.headers.get("Cookie", "").split(";") if "=" in part)
+                if site.tokens.get(cookies.get(CLEARANCE_COOKIE), 0) > time.time():
+                    self.answer(200, {})
+                    return
+            site.challenged += 1
+        self.answer(403, {"cf-mitigated": "challenge"})
+
+    def answer(self, status, headers):
+        body = b"ok" if status == 200 else b"challenge"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def site(request):
+    site = StubSite(getattr(request, "param", 600))
+    thread = threading.Thread(target=site.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    site.shutdown()
+    site.server_close()
+
+
+@pytest.fixture
+def pool(site):
+    pool = SessionPool(4, f"{site.url}/solve", factory=requests.Session)
+    yield pool
+    pool.close()
+
+
+def test_one_solve_is_shared_by_all_threads(site, pool):
+    with ThreadPoolExecutor(8) as executor:
+        statuses = list(executor.map(lambda n: pool.get(f"{site.url}/page/{n}").status_code, range(40)))
+    assert statuses == [200] * 40
+    assert site.solves == pool.solves == 1
+    assert site.challenged == pool.challenges == 0
+
+
+@pytest.mark.parametrize("site", [2], indirect=True)
+def test_clearance_is_renewed_before_it_expires(site, pool):
+    assert pool.get(f"{site.url}/page/1").status_code == 200
+    # A two second clearance is renewed halfway, before the site would challenge it
+    time.sleep(1.2)
+    assert pool.get(f"{site.url}/page/2").status_code == 200
+    assert site.solves == pool.solves == 2
+    assert site.challenged == pool.challenges == 0
+
+
+def test_challenged_response_is_solved_again_and_resent(site, pool):
+    assert pool.get(f"{site.url}/page/1").status_code == 200
+    site.revoke()
+    with ThreadPoolExecutor(4) as executor:
+        statuses = list(executor.map(lambda n: pool.get(f"{site.url}/page/{n}").status_code, range(4)))
+    assert statuses == [200] * 4
+    assert site.solves == pool.solves == 2
+    assert pool.failed_solves == 0
+
+
+def test_failed_solve_backs_off(site, pool):
+    assert pool.get(f"{site.url}/page/1").status_code == 200
+    site.solvable = False
+    site.revoke()
+    statuses = [pool.get(f"{site.url}/page/{n}").status_code for n in range(10)]
+    assert statuses == [403] * 10
+    # One failed attempt, then no more solves until the back-off has passed
+    assert site.solves == 2
+    assert pool.solves == 1 and pool.failed_solves == 1
+    assert pool.challenges == 10
@@ -0,0 +1,56 @@
+"""Sharding by a column: every value gets its own shard, and unusable columns are refused before writing."""
+
+import csv
+
+import pytest
+
+import scrape_seed_city as scraper
+from scrape_seed_city import StrainRecord, write_csv
+
+
+def record(number, breeder, **extra):
+    return StrainRecord(f"Strain {number}", breeder, "", 10.0, None, None, "", f"https://example.test/{number}", "", extra)
+
+
+def shard_rows(directory):
+    manifest = scraper.read_manifest(directory)
+    rows = {}
+    for shard in manifest["shards"]:
+        with (directory / shard["path"]).open(newline="", encoding="utf-8") as handle:
+            rows[shard["path"]] = [row["breeder"] for row in csv.DictReader(handle)]
+    return rows
+
+
+def test_one_shard_per_value(tmp_path):
+    out = tmp_path / "shards"
+    write_csv([record(1, "Dutch Passion"), record(2, "Barney's Farm"), record(3, "Dutch Passion"), record(4, "")], out, shard_by="breeder")
+    assert shard_rows(out) == {
+        "breeder-dutch_passion.csv": ["Dutch Passion", "Dutch Passion"],
+        "breeder-barney_s_farm.csv": ["Barney's Farm"],
+        "breeder-none.csv": [""],
+    }
+
+
+def test_values_with_the_same_slug_are_not_merged(tmp_path):
+    out = tmp_path / "shards"
+    write_csv([record(1, "Seed Co"), record(2, "Seed-Co"), record(3, "seed co")], out, shard_by="breeder")
+    shards = shard_rows(out)
+    assert len(shards) == 3
+    assert sorted(rows for rows in shards.values()) == [["Seed Co"], ["Seed-Co"], ["seed co"]]
+    assert all(name.startswith("breeder-seed_co-") for name in shards)
+
+
+def test_unknown_column_is_refused(tmp_path):
+    out = tmp_path / "shards"
+    with pytest.raises(ValueError, match="no such column"):
+        write_csv([record(1, "A")], out, shard_by="no_such_column")
+    assert scraper.read_manifest(out) is None
+    assert list(out.iterdir()) == []
+
+
+def test_high_cardinality_column_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "MAX_SHARDS", 3)
+    out = tmp_path / "shards"
+    with pytest.raises(ValueError, match="more than 3 distinct values"):
+        write_csv([record(number, f"Breeder {number}") for number in range(4)], out, shard_by="breeder")
+    assert list(out.iterdir()) == []
@@ -0,0 +1,53 @@
+"""A product the sitemap reports as changed is updated only with what its own page shows."""
+
+import pytest
+
+import scrape_seed_city as scraper
+from conftest import FIXTURES
+from record_store import RecordStore
+from scrape_seed_city import BASE_FIELDS, SitemapSnapshot, StrainRecord, apply_price_updates, discover_products
+
+URL = f"{scraper.SITE_ROOT}/en/gorilla-glue-4-auto-fastbuds"
+
+
+def listing_record():
+    # As the listing had it: on sale, with pack sizes
+    return StrainRecord(
+        "Gorilla Glue #4 Auto", "FastBuds", "", 42.0, 52.5, 20.0, "1 Seed | 3 Seeds | 5 Seeds", URL, "", {"thc": "24%"}
+    )
+
+
+@pytest.fixture
+def updates(tmp_path, monkeypatch):
+    html = (FIXTURES / "detail_autoflower_sale.html").read_text(encoding="utf-8")
+    monkeypatch.setattr(scraper, "fetch_with_retry", lambda *args, **kwargs: html)
+    sitemap = SitemapSnapshot(tmp_path / "sitemap.json")
+    sitemap.save({URL: "2026-01-01"})
+    records, updates, pending = discover_products(None, sitemap, {URL: "2026-02-01"}, {URL}, None, workers=1)
+    assert records == [] and pending == set()
+    return updates
+
+
+def test_update_holds_only_the_fields_the_page_shows(updates):
+    # The page has the sale price but neither the base price nor the pack sizes
+    assert set(updates[URL]) == {"current_price_gbp", "extra"}
+    assert updates[URL]["current_price_gbp"] == 39.95
+
+
+def test_changed_product_keeps_its_listing_fields_in_the_csv(updates):
+    (record,) = apply_price_updates([listing_record()], updates)
+    assert record.current_price_gbp == 39.95
+    assert (record.original_price_gbp, record.discount_percent) == (52.5, 20.0)
+    assert record.pack_options == "1 Seed | 3 Seeds | 5 Seeds"
+    assert record.extra["thc"] == "26%"
+
+
+def test_changed_product_keeps_its_listing_fields_in_the_store(updates, tmp_path):
+    store = RecordStore(BASE_FIELDS, tmp_path / "store.sqlite")
+    store.upsert([listing_record().to_state()])
+    store.upsert([], updates=updates)
+    (state,) = store.iter_states()
+    assert state["current_price_gbp"] == 39.95
+    assert (state["original_price_gbp"], state["discount_percent"]) == (52.5, 20.0)
+    assert state["pack_options"] == "1 Seed | 3 Seeds | 5 Seeds"
+    assert state["extra"]["thc"] == "26%"
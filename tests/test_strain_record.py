@@ -0,0 +1,32 @@
+"""StrainRecord's extra fields come out in schema order, which must not change the CSV."""
+
+import csv
+
+import scrape_seed_city as scraper
+from scrape_seed_city import StrainRecord, order_fields, write_csv
+
+EXTRA = {"thc": "20%", "overview": "Tall and fast", "zz_unmapped": "x", "seed_type": "Feminized"}
+
+
+def record(extra):
+    return StrainRecord("Strain", "Breeder", "", 10.0, None, None, "", "https://example.test/1", "", extra)
+
+
+def test_extra_fields_iterate_in_schema_order():
+    forward = record(EXTRA)
+    backward = record(dict(reversed(list(EXTRA.items()))))
+    assert list(forward.extra) == list(backward.extra)
+    assert forward.as_dict() == backward.as_dict()
+    slots = [scraper.EXTRA_KEY_SLOTS[key] for key in forward.extra]
+    assert slots == sorted(slots)
+
+
+def test_csv_does_not_depend_on_insertion_order(tmp_path):
+    outputs = []
+    for name, extra in (("forward.csv", EXTRA), ("backward.csv", dict(reversed(list(EXTRA.items()))))):
+        write_csv([record(extra)], tmp_path / name)
+        outputs.append((tmp_path / name).read_bytes())
+    assert outputs[0] == outputs[1]
+    with (tmp_path / "forward.csv").open(newline="", encoding="utf-8") as handle:
+        header = next(csv.reader(handle))
+    assert header == order_fields(scraper.BASE_FIELDS + list(EXTRA))
@@ -3,46 +3,27 @@
 Update dataset metadata with correct statistics
 """
 
+import argparse
 import json
-import pandas as pd
 from pathlib import Path
 
-def main():
-    # Read current dataset
-    df = pd.read_csv('cannabis-strains.csv')
-
-    # Calculate statistics
-    num_examples = len(df)
-    num_columns = len(df.columns)
-    num_bytes = Path('cannabis-strains.csv').stat().st_size
-
-    # Count missing values
-    missing_data = df.isnull().sum()
-    total_missing = missing_data.sum()
-    completeness_pct = ((len(df) * len(df.columns) - total_missing) / (len(df) * len(df.columns))) * 100
+from dataset_shards import current_dataset, dataset_bytes
+from dataset_stats import load_stats
+from profiling import add_profile_arguments, profiler_from_args
 
-    # Get price statistics
-    price_stats = {}
-    if 'current_price_gbp' in df.columns:
-        prices = pd.to_numeric(df['current_price_gbp'], errors='coerce')
-        price_stats = {
-            "min_price_gbp": float(prices.min()) if not prices.isna().all() else None,
-            "max_price_gbp": float(prices.max()) if not prices.isna().all() else None,
-            "avg_price_gbp": float(prices.mean()) if not prices.isna().all() else None,
-            "median_price_gbp": float(prices.median()) if not prices.isna().all() else None
-        }
-
-    # Get breeder statistics
-    top_breeders = []
-    if 'breeder' in df.columns:
-        breeder_counts = df['breeder'].value_counts().head(5)
-        top_breeders = [{"name": breeder, "count": int(count)} for breeder, count in breeder_counts.items()]
-
-    # Get strain type distribution
-    strain_types = {}
-    if 'indica_sativa' in df.columns:
-        type_counts = df['indica_sativa'].value_counts()
-        strain_types = {str(k): int(v) for k, v in type_counts.items()}
+def main():
+    # Statistics come from the cache when the dataset (or a column of it) is unchanged
+    # The dataset is cannabis-strains.csv, or cannabis-strains/ shards listed in its manifest
+    dataset_path = current_dataset()
+    stats = load_stats(dataset_path)
+    num_examples = stats['num_examples']
+    num_columns = stats['num_columns']
+    num_bytes = dataset_bytes(dataset_path)
+    completeness_pct = stats['completeness_pct']
+    price_stats = stats['price_stats']
+    top_breeders = stats['top_breeders']
+    strain_types = stats['strain_types']
+    print(f"🧮 Recomputed: {', '.join(stats['recomputed'])}" if stats['recomputed'] else "♻️  Statistics unchanged, reused from cache")
 
     # Create description with statistics
     top_breeders_text = "\n".join([f"- {b['name']}: {b['count']} strains" for b in top_breeders[:3]])
@@ -88,7 +69,7 @@ Scraping is performed with `scrape_seed_city.py`, which handles pagination, poli
         ],
         "resources": [
             {
-                "path": "cannabis-strains.csv",
+                "path": dataset_path.as_posix(),
                 "description": f"Main dataset file containing {num_examples:,} scraped cannabis strain records",
                 "num_examples": num_examples,
                 "num_columns": num_columns
@@ -99,9 +80,11 @@ Scraping is performed with `scrape_seed_city.py`, which handles pagination, poli
         "last_updated": "2025-11-04"
     }
 
-    # Save updated metadata
-    with open('dataset-metadata.json', 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    # Save updated metadata, leaving the file untouched when nothing changed
+    metadata_json = json.dumps(metadata, indent=2, ensure_ascii=False)
+    metadata_path = Path('dataset-metadata.json')
+    if not metadata_path.exists() or metadata_path.read_text(encoding='utf-8') != metadata_json:
+        metadata_path.write_text(metadata_json, encoding='utf-8')
 
     print(f"✅ Updated metadata: {num_examples:,} examples, {num_bytes:,} bytes")
     print(f"📊 Completeness: {completeness_pct:.1f}%")
@@ -109,4 +92,13 @@ Scraping is performed with `scrape_seed_city.py`, which handles pagination, poli
     print(f"🏢 Top breeders: {', '.join([b['name'] for b in top_breeders[:3]])}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refresh dataset-metadata.json from the dataset statistics.")
+    add_profile_arguments(parser)
+    profiler = profiler_from_args(parser.parse_args(), "metadata")
+    if profiler:
+        profiler.start()
+    try:
+        main()
+    finally:
+        if profiler:
+            print(f"⏱️  Profile written to {profiler.stop()}")
\ No newline at end of file
@@ -3,26 +3,32 @@
 Upload Cannabis Strains dataset to Hugging Face Hub
 """
 
-import os
+import argparse
 from pathlib import Path
 from huggingface_hub import HfApi, login
 
-def main():
-    # Get token from user
-    token = input("Enter your Hugging Face token: ").strip()
-    if not token:
-        print("No token provided. Exiting.")
-        return
+from hub_upload import REPO_ID, LocalHub, plan_upload, push_plan, upload_files
+from profiling import add_profile_arguments, profiler_from_args
 
-    # Login to HF
-    login(token)
+def main(local_hub=None):
+    if local_hub:
+        # Directory-backed stand-in for the Hub, for dry runs
+        api = LocalHub(local_hub)
+    else:
+        # Get token from user
+        token = input("Enter your Hugging Face token: ").strip()
+        if not token:
+            print("No token provided. Exiting.")
+            return
 
-    # Initialize API
-    api = HfApi()
+        # Login to HF
+        login(token)
+
+        # Initialize API
+        api = HfApi()
 
     # Dataset info
-    repo_name = "cannabis-strains-dataset"
-    repo_id = f"jonusnattapong/{repo_name}"
+    repo_id = REPO_ID
 
     # Create repository
     print(f"Creating repository: {repo_id}")
@@ -33,30 +39,32 @@ def main():
         exist_ok=True
     )
 
-    # Files to upload
-    files_to_upload = [
-        "cannabis-strains.csv",
-        "README_HF.md",
-        "dataset-metadata.json",
-        "scrape_seed_city.py",
-        "cannabis-strains.ipynb"
-    ]
-
-    # Upload files
-    for file_path in files_to_upload:
-        if os.path.exists(file_path):
-            print(f"Uploading {file_path}...")
-            api.upload_file(
-                path_or_fileobj=file_path,
-                path_in_repo=file_path,
-                repo_id=repo_id,
-                repo_type="dataset"
-            )
-        else:
-            print(f"File {file_path} not found, skipping...")
+    # Upload the files that differ from the repo's copies in a single commit
+    plan = plan_upload(api, upload_files(), repo_id)
+    for file_path in plan.missing:
+        print(f"File {file_path} not found, skipping...")
+    for file in plan.unchanged:
+        print(f"{file.path_in_repo} unchanged, skipping...")
+    for file in plan.changed:
+        print(f"Uploading {file.path_in_repo}...")
+    for path_in_repo in plan.deleted:
+        print(f"Removing {path_in_repo} from the Hub...")
+    push_plan(api, plan, "Upload dataset")
 
+    print(f"Sent {plan.bytes_to_send:,} bytes, skipped {plan.bytes_skipped:,} bytes of unchanged files")
     print(f"\nDataset uploaded successfully!")
     print(f"View at: https://huggingface.co/datasets/{repo_id}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Upload the dataset files to the Hugging Face Hub.")
+    parser.add_argument("--local-hub", type=Path, help="upload into this directory instead of the Hub (dry run)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, "upload")
+    if profiler:
+        profiler.start()
+    try:
+        main(args.local_hub)
+    finally:
+        if profiler:
+            print(f"Profile written to {profiler.stop()}")
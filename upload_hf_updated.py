@@ -3,53 +3,34 @@
 Update dataset metadata and upload to Hugging Face Hub
 """
 
+import argparse
 import json
-import pandas as pd
 from pathlib import Path
 import os
 from huggingface_hub import HfApi, login
 
+from dataset_shards import current_dataset, dataset_bytes
+from dataset_stats import load_stats
+from hub_upload import REPO_ID, LocalHub, plan_upload, push_plan, upload_files
+from profiling import add_profile_arguments, profiler_from_args
+
 def update_metadata():
     """Update dataset metadata with current statistics"""
 
-    # Read current dataset
-    df = pd.read_csv('cannabis-strains.csv')
-
-    # Calculate statistics
-    num_examples = len(df)
-    num_columns = len(df.columns)
+    # Statistics come from the cache when the dataset (or a column of it) is unchanged
+    # The dataset is cannabis-strains.csv, or cannabis-strains/ shards listed in its manifest
+    dataset_path = current_dataset()
+    stats = load_stats(dataset_path)
+    num_examples = stats['num_examples']
+    num_columns = stats['num_columns']
 
     # Calculate file size
-    csv_path = Path('cannabis-strains.csv')
-    num_bytes = csv_path.stat().st_size
-
-    # Count missing values
-    missing_data = df.isnull().sum()
-    total_missing = missing_data.sum()
-    completeness_pct = ((len(df) * len(df.columns) - total_missing) / (len(df) * len(df.columns))) * 100
-
-    # Get price statistics
-    price_stats = {}
-    if 'current_price_gbp' in df.columns:
-        prices = pd.to_numeric(df['current_price_gbp'], errors='coerce')
-        price_stats = {
-            "min_price_gbp": float(prices.min()) if not prices.isna().all() else None,
-            "max_price_gbp": float(prices.max()) if not prices.isna().all() else None,
-            "avg_price_gbp": float(prices.mean()) if not prices.isna().all() else None,
-            "median_price_gbp": float(prices.median()) if not prices.isna().all() else None
-        }
-
-    # Get breeder statistics
-    top_breeders = []
-    if 'breeder' in df.columns:
-        breeder_counts = df['breeder'].value_counts().head(5)
-        top_breeders = [{"name": breeder, "count": int(count)} for breeder, count in breeder_counts.items()]
-
-    # Get strain type distribution
-    strain_types = {}
-    if 'indica_sativa' in df.columns:
-        type_counts = df['indica_sativa'].value_counts()
-        strain_types = {str(k): int(v) for k, v in type_counts.items()}
+    num_bytes = dataset_bytes(dataset_path)
+
+    completeness_pct = stats['completeness_pct']
+    price_stats = stats['price_stats']
+    top_breeders = stats['top_breeders']
+    strain_types = stats['strain_types']
 
     # Update metadata
     metadata = {
@@ -89,7 +70,7 @@ Scraping is performed with `scrape_seed_city.py`, which handles pagination, poli
         ],
         "resources": [
             {
-                "path": "cannabis-strains.csv",
+                "path": dataset_path.as_posix(),
                 "description": f"Main dataset file containing {num_examples:,} scraped cannabis strain records",
                 "num_examples": num_examples,
                 "num_columns": num_columns
@@ -100,33 +81,38 @@ Scraping is performed with `scrape_seed_city.py`, which handles pagination, poli
         "last_updated": "2025-11-04"
     }
 
-    # Save updated metadata
-    with open('dataset-metadata.json', 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    # Save updated metadata, leaving the file untouched when nothing changed
+    metadata_json = json.dumps(metadata, indent=2, ensure_ascii=False)
+    metadata_path = Path('dataset-metadata.json')
+    if not metadata_path.exists() or metadata_path.read_text(encoding='utf-8') != metadata_json:
+        metadata_path.write_text(metadata_json, encoding='utf-8')
 
     print(f"✅ Updated metadata: {num_examples} examples, {num_bytes} bytes")
     return metadata
 
-def upload_to_hf():
-    """Upload updated dataset to Hugging Face"""
+def upload_to_hf(local_hub=None):
+    """Upload the changed dataset files to Hugging Face in a single commit"""
 
-    # Get token from environment or user input
-    token = os.getenv('HF_TOKEN')
-    if not token:
-        token = input("Enter your Hugging Face token: ").strip()
+    if local_hub:
+        # Directory-backed stand-in for the Hub, for dry runs
+        api = LocalHub(local_hub)
+    else:
+        # Get token from environment or user input
+        token = os.getenv('HF_TOKEN')
         if not token:
-            print("No token provided. Exiting.")
-            return
+            token = input("Enter your Hugging Face token: ").strip()
+            if not token:
+                print("No token provided. Exiting.")
+                return
 
-    # Login to HF
-    login(token)
+        # Login to HF
+        login(token)
 
-    # Initialize API
-    api = HfApi()
+        # Initialize API
+        api = HfApi()
 
     # Dataset info
-    repo_name = "cannabis-strains-dataset"
-    repo_id = f"jonusnattapong/{repo_name}"
+    repo_id = REPO_ID
 
     # Create/update repository
     print(f"Creating/updating repository: {repo_id}")
@@ -137,36 +123,41 @@ def upload_to_hf():
         exist_ok=True
     )
 
-    # Files to upload
-    files_to_upload = [
-        "cannabis-strains.csv",
-        "README_HF.md",
-        "dataset-metadata.json",
-        "scrape_seed_city.py",
-        "cannabis-strains.ipynb"
-    ]
-
-    # Upload files
-    for file_path in files_to_upload:
-        if os.path.exists(file_path):
-            print(f"Uploading {file_path}...")
-            api.upload_file(
-                path_or_fileobj=file_path,
-                path_in_repo=file_path,
-                repo_id=repo_id,
-                repo_type="dataset"
-            )
-        else:
-            print(f"⚠️  File {file_path} not found, skipping...")
-
-    print("✅ Upload complete!")
+    # Compare local files with the repo's copies; only changed files are sent
+    plan = plan_upload(api, upload_files(), repo_id)
+    for file_path in plan.missing:
+        print(f"⚠️  File {file_path} not found, skipping...")
+    for file in plan.unchanged:
+        print(f"⏭️  {file.path_in_repo} unchanged, skipping...")
+    for file in plan.changed:
+        print(f"Uploading {file.path_in_repo}...")
+    for path_in_repo in plan.deleted:
+        print(f"Removing {path_in_repo} from the Hub...")
+
+    # All changed files go up in one commit
+    push_plan(api, plan, "Update dataset")
+
+    print(f"📦 Sent {len(plan.changed)} file(s), {plan.bytes_to_send:,} bytes; skipped {len(plan.unchanged)} unchanged, {plan.bytes_skipped:,} bytes")
+    print("✅ Upload complete!" if plan.changed else "✅ Hub copy already up to date!")
     print(f"🔗 View dataset: https://huggingface.co/datasets/{repo_id}")
 
 if __name__ == "__main__":
-    print("🔄 Updating dataset metadata...")
-    metadata = update_metadata()
-
-    print("\n📤 Uploading to Hugging Face Hub...")
-    upload_to_hf()
-
-    print("\n🎉 Dataset updated successfully!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refresh the dataset metadata and upload changed files to the Hub.")
+    parser.add_argument("--local-hub", type=Path, help="upload into this directory instead of the Hub (dry run)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, "upload")
+    if profiler:
+        profiler.start()
+
+    try:
+        print("🔄 Updating dataset metadata...")
+        metadata = update_metadata()
+
+        print("\n📤 Uploading to Hugging Face Hub...")
+        upload_to_hf(args.local_hub)
+
+        print("\n🎉 Dataset updated successfully!")
+    finally:
+        if profiler:
+            print(f"⏱️  Profile written to {profiler.stop()}")
\ No newline at end of file
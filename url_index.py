@@ -0,0 +1,163 @@
+"""
+Sidecar index of the product URLs in the dataset and the byte offset of each row
+"""
+
+import csv
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dataset_shards import dataset_files, dataset_fingerprint
+
+INDEX_VERSION = 1
+URL_COLUMN = "product_url"
+
+# (file number within the dataset, byte offset of the row, product URL)
+IndexEntry = Tuple[int, int, str]
+
+
+class CountingWriter:
+    """Text sink for ``csv.writer`` that writes UTF-8 to a binary handle and tracks the byte position."""
+
+    def __init__(self, handle: Any) -> None:
+        self.handle = handle
+        self.position = 0
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self.handle.write(data)
+        self.position += len(data)
+        return len(text)
+
+
+def index_path(dataset: Path) -> Path:
+    """``cannabis-strains.csv.urls`` for a CSV, ``cannabis-strains.urls`` for a shard directory."""
+    return dataset.with_name(f"{dataset.name}.urls")
+
+
+class IndexWriter:
+    """Streams entries to a scratch file while the dataset is written.
+
+    ``commit()`` runs once the dataset files are in place: it writes the index with a
+    header fingerprinting those files (name, size, mtime) and moves it into place.
+    """
+
+    def __init__(self, dataset: Path) -> None:
+        self.dataset = dataset
+        self.path = index_path(dataset)
+        self._body_path = self.path.with_name(f"{self.path.name}.body")
+        self._body = self._body_path.open("w", encoding="utf-8", newline="\n")
+
+    def add(self, number: int, offset: int, url: str) -> None:
+        if url and "\t" not in url and "\n" not in url:
+            self._body.write(f"{number}\t{offset}\t{url}\n")
+
+    def abort(self) -> None:
+        self._body.close()
+        self._body_path.unlink(missing_ok=True)
+
+    def commit(self) -> None:
+        self._body.close()
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            with tmp.open("w", encoding="utf-8", newline="\n") as handle, self._body_path.open("r", encoding="utf-8", newline="\n") as body:
+                handle.write(json.dumps({"version": INDEX_VERSION, "files": dataset_fingerprint(self.dataset)}) + "\n")
+                shutil.copyfileobj(body, handle)
+            os.replace(tmp, self.path)
+        finally:
+            self._body_path.unlink(missing_ok=True)
+            tmp.unlink(missing_ok=True)
+
+
+def write_index(dataset: Path, entries: Iterable[IndexEntry]) -> None:
+    writer = IndexWriter(dataset)
+    try:
+        for entry in entries:
+            writer.add(*entry)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+
+
+def iter_rows(csv_path: Path) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield ``(byte offset, row)`` for every data row of ``csv_path``."""
+    with csv_path.open("rb") as handle:
+        end = 0
+
+        def lines() -> Iterator[str]:
+            nonlocal end
+            for line in handle:
+                end += len(line)
+                yield line.decode("utf-8")
+
+        # csv.reader pulls exactly the lines of one row at a time, so a row starts where the previous one ended
+        reader = csv.reader(lines())
+        header = next(reader, [])
+        start = end
+        for values in reader:
+            yield start, dict(zip(header, values))
+            start = end
+
+
+def iter_entries(dataset: Path) -> Iterator[IndexEntry]:
+    for number, csv_path in enumerate(dataset_files(dataset)):
+        for offset, row in iter_rows(csv_path):
+            yield number, offset, row.get(URL_COLUMN, "")
+
+
+def _read_index(dataset: Path) -> Optional[Iterator[List[str]]]:
+    """Entry lines of the index, or None when it is missing or does not match the dataset files."""
+    try:
+        handle = index_path(dataset).open("r", encoding="utf-8", newline="\n")
+    except OSError:
+        return None
+    try:
+        header = json.loads(handle.readline())
+        current = dataset_fingerprint(dataset)
+    except (OSError, ValueError):
+        handle.close()
+        return None
+    if not isinstance(header, dict) or header.get("version") != INDEX_VERSION or header.get("files") != current:
+        handle.close()
+        return None
+
+    def entries() -> Iterator[List[str]]:
+        with handle:
+            for line in handle:
+                yield line.rstrip("\n").split("\t", 2)
+
+    return entries()
+
+
+def load_urls(dataset: Path) -> Set[str]:
+    """Product URLs in ``dataset``, from the index; a missing or stale index is rebuilt from the CSV."""
+    entries = _read_index(dataset)
+    if entries is not None:
+        return {url for _, _, url in entries}
+    if not dataset_files(dataset):
+        return set()
+    logging.info("Rebuilding the URL index for %s", dataset)
+    write_index(dataset, iter_entries(dataset))
+    return {url for _, _, url in _read_index(dataset) or ()}
+
+
+def find_row(dataset: Path, url: str) -> Optional[Dict[str, str]]:
+    """Read the single row for ``url`` by seeking to its offset, without parsing the rest of the dataset."""
+    entries = _read_index(dataset)
+    if entries is None:
+        load_urls(dataset)
+        entries = _read_index(dataset)
+    location = next(((int(number), int(offset)) for number, offset, indexed in entries or () if indexed == url), None)
+    if location is None:
+        return None
+    csv_path = dataset_files(dataset)[location[0]]
+    with csv_path.open("r", newline="", encoding="utf-8") as csvfile:
+        header = next(csv.reader(csvfile), [])
+    with csv_path.open("rb") as handle:
+        handle.seek(location[1])
+        values = next(csv.reader(line.decode("utf-8") for line in handle), [])
+    return dict(zip(header, values))